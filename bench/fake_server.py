@@ -0,0 +1,510 @@
+"""code_review.py 벤치마크용 로컬 GitHub REST/GraphQL + OpenAI chat completions 대역 서버
+
+실제 API 대신 합성 PR(diff, 봇 코멘트/리뷰 이력)을 제공하고, 응답 지연과 실패율을 설정할 수 있음.
+엔드포인트별 요청 수와 전송 바이트를 집계하여 벤치마크 결과에 사용.
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+BOT_SIGNATURE = "<!-- auto-review-bot -->"
+
+ISSUE_TYPES = ['보안', '논리', '성능', '품질']
+
+
+# 합성 PR 데이터 - 파일별 diff, 봇 코멘트/인라인 코멘트/리뷰 이력
+class Scenario:
+    def __init__(self, files=10, hunks_per_file=2, lines_per_hunk=12, bot_comments=100, seed=0):
+        rng = random.Random(seed)
+        self.head_sha = f"{rng.getrandbits(160):040x}"
+        self.base_sha = f"{rng.getrandbits(160):040x}"
+        self.files = {}
+        for i in range(files):
+            path = f"src/pkg{i % 50}/module_{i}.py"
+            self.files[path] = make_file_diff(path, hunks_per_file, lines_per_hunk, rng)
+        self.diff = "".join(self.files.values())
+
+        # 이전 실행들이 남긴 봇 활동 이력 (일반 코멘트, 리뷰 스레드, 리뷰)
+        paths = list(self.files)
+        self.next_id = 1000
+        self.comments = []
+        self.review_comments = []
+        self.reviews = []
+        for i in range(bot_comments):
+            self.comments.append(self.bot_item(f"이전 리뷰 요약 {i}", 'comment'))
+            review = self.bot_item(f"이전 리뷰 {i}", 'review')
+            review['state'] = rng.choice(['CHANGES_REQUESTED', 'COMMENTED', 'DISMISSED'])
+            self.reviews.append(review)
+            comment = self.bot_item(f"**품질**\n\n이전 인라인 코멘트 {i}", 'review_comment')
+            comment['path'] = paths[i % len(paths)] if paths else 'src/removed.py'
+            comment['line'] = rng.randint(1, 40)
+            comment['outdated'] = rng.random() < 0.3
+            comment['thread_id'] = f"PRRT_{comment['id']}"
+            comment['pull_request_review_id'] = review['id']
+            self.review_comments.append(comment)
+        self.lock = threading.Lock()
+
+    def bot_item(self, body, kind):
+        self.next_id += 1
+        return {
+            'id': self.next_id,
+            'kind': kind,
+            'body': f"{BOT_SIGNATURE}\n\n{body}",
+            'created_at': '2025-01-01T00:00:00Z',
+            'user': {'login': 'github-actions[bot]'}
+        }
+
+    # head 커밋 기준 파일 내용 (모든 파일이 같은 합성 내용)
+    def file_content(self, path):
+        return "\n".join(f"value_{n} = compute({n})" for n in range(1, 400)) + "\n"
+
+    # 리뷰 대상 파일을 워크스페이스 디렉터리에 기록 (상세 분석 컨텍스트용)
+    def write_workspace(self, root):
+        import os
+        for path in self.files:
+            full_path = os.path.join(root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as file:
+                file.write(self.file_content(path))
+
+
+def make_file_diff(path, hunks, lines_per_hunk, rng):
+    parts = [
+        f"diff --git a/{path} b/{path}\n",
+        f"index {rng.getrandbits(28):07x}..{rng.getrandbits(28):07x} 100644\n",
+        f"--- a/{path}\n",
+        f"+++ b/{path}\n"
+    ]
+    start = 1
+    for _ in range(hunks):
+        start += rng.randint(5, 30)
+        added = lines_per_hunk - 3
+        parts.append(f"@@ -{start},3 +{start},{3 + added} @@ def handler():\n")
+        parts.append(f" def handler_{start}(request):\n")
+        for n in range(added):
+            kind = rng.random()
+            if kind < 0.05:
+                line = f"    result = eval(request.args.get('expr_{n}'))"
+            elif kind < 0.1:
+                line = f"    os.system('rm -rf ' + request.args['path_{n}'])"
+            else:
+                line = f"    value_{n} = compute(request, {n}) + offset_{n}"
+            parts.append(f"+{line}\n")
+        parts.append("     return response\n")
+        parts.append(" \n")
+        start += lines_per_hunk
+    return "".join(parts)
+
+
+class FakeServer:
+    """GitHub/OpenAI 대역 서버 - latency(초)와 jitter만큼 응답을 지연하고, failure_rate 확률로 502 반환"""
+
+    def __init__(self, scenario, latency=0.0, jitter=0.0, failure_rate=0.0, llm_latency=None,
+                 host='127.0.0.1', port=0, seed=0):
+        self.scenario = scenario
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.llm_latency = latency if llm_latency is None else llm_latency
+        self.random = random.Random(seed)
+        self.counts = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(FakeHandler):
+            fake = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, route, received, sent):
+        with self.lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    def delay(self, llm=False):
+        base = self.llm_latency if llm else self.latency
+        wait = base + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def should_fail(self):
+        with self.lock:
+            return self.failure_rate > 0 and self.random.random() < self.failure_rate
+
+
+ROUTES = [
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+$'), 'repo'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+$'), 'pull'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/compare/[^/]+$'), 'compare'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/contents/(.+)$'), 'contents'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/issues/\d+/comments$'), 'list_comments'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+/comments$'), 'list_review_comments'),
+    ('GET', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+/reviews$'), 'list_reviews'),
+    ('POST', re.compile(r'^/graphql$'), 'graphql'),
+    ('DELETE', re.compile(r'^/repos/[^/]+/[^/]+/pulls/comments/(\d+)$'), 'delete_review_comment'),
+    ('PATCH', re.compile(r'^/repos/[^/]+/[^/]+/issues/comments/(\d+)$'), 'update_comment'),
+    ('PATCH', re.compile(r'^/repos/[^/]+/[^/]+/pulls/comments/(\d+)$'), 'update_review_comment'),
+    ('PUT', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+/reviews/(\d+)$'), 'update_review'),
+    ('PUT', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+/reviews/(\d+)/dismissals$'), 'dismiss_review'),
+    ('POST', re.compile(r'^/repos/[^/]+/[^/]+/pulls/\d+/reviews$'), 'create_review'),
+    ('POST', re.compile(r'^/repos/[^/]+/[^/]+/issues/\d+/comments$'), 'create_comment'),
+    ('POST', re.compile(r'^(?:/v1)?/chat/completions$'), 'chat_completions'),
+]
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.sent = 0
+
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            name, match = 'unknown', None
+
+        llm = name == 'chat_completions'
+        self.fake.delay(llm)
+        if name == 'unknown':
+            self.send_json({'message': 'Not Found'}, 404)
+        elif self.fake.should_fail():
+            self.send_json({'message': 'Injected failure'}, 502)
+        else:
+            payload = json.loads(body) if body else {}
+            getattr(self, f"handle_{name}")(match, parse_qs(parsed.query), payload)
+        self.fake.count(name, len(body), self.sent)
+
+    def send_body(self, data, status=200, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.sent += len(data)
+
+    def send_json(self, payload, status=200):
+        self.send_body(json.dumps(payload, ensure_ascii=False).encode('utf-8'), status,
+                       headers={'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+
+    @property
+    def scenario(self):
+        return self.fake.scenario
+
+    def paginate(self, items, query):
+        page = int((query.get('page') or ['1'])[0])
+        per_page = int((query.get('per_page') or ['30'])[0])
+        return items[(page - 1) * per_page:page * per_page]
+
+    # GitHub REST
+    def handle_repo(self, match, query, payload):
+        self.send_json({'full_name': 'bench/repo'})
+
+    def handle_pull(self, match, query, payload):
+        if 'diff' in (self.headers.get('Accept') or ''):
+            self.send_body(self.scenario.diff.encode('utf-8'), content_type='text/plain; charset=utf-8')
+        else:
+            self.send_json({'number': 1, 'head': {'sha': self.scenario.head_sha}, 'base': {'sha': self.scenario.base_sha}})
+
+    def handle_compare(self, match, query, payload):
+        self.send_body(self.scenario.diff.encode('utf-8'), content_type='text/plain; charset=utf-8')
+
+    def handle_contents(self, match, query, payload):
+        path = unquote(match.group(1))
+        if path not in self.scenario.files:
+            return self.send_json({'message': 'Not Found'}, 404)
+        self.send_body(self.scenario.file_content(path).encode('utf-8'), content_type='text/plain; charset=utf-8')
+
+    def handle_list_comments(self, match, query, payload):
+        with self.scenario.lock:
+            self.send_json(self.paginate([rest_item(c) for c in self.scenario.comments], query))
+
+    def handle_list_review_comments(self, match, query, payload):
+        with self.scenario.lock:
+            self.send_json(self.paginate([rest_item(c) for c in self.scenario.review_comments], query))
+
+    def handle_list_reviews(self, match, query, payload):
+        with self.scenario.lock:
+            self.send_json(self.paginate([rest_item(r) for r in self.scenario.reviews], query))
+
+    def handle_delete_review_comment(self, match, query, payload):
+        comment_id = int(match.group(1))
+        with self.scenario.lock:
+            before = len(self.scenario.review_comments)
+            self.scenario.review_comments = [c for c in self.scenario.review_comments if c['id'] != comment_id]
+            found = len(self.scenario.review_comments) < before
+        if found:
+            self.send_body(b'', 204)
+        else:
+            self.send_json({'message': 'Not Found'}, 404)
+
+    def handle_update_comment(self, match, query, payload):
+        comment = self.find_item(self.scenario.comments, int(match.group(1)))
+        if comment is None:
+            return self.send_json({'message': 'Not Found'}, 404)
+        comment['body'] = payload.get('body', comment['body'])
+        self.send_json(rest_item(comment))
+
+    def handle_update_review_comment(self, match, query, payload):
+        comment = self.find_item(self.scenario.review_comments, int(match.group(1)))
+        if comment is None:
+            return self.send_json({'message': 'Not Found'}, 404)
+        comment['body'] = payload.get('body', comment['body'])
+        self.send_json(rest_item(comment))
+
+    def handle_update_review(self, match, query, payload):
+        review = self.find_item(self.scenario.reviews, int(match.group(1)))
+        if review is None:
+            return self.send_json({'message': 'Not Found'}, 404)
+        review['body'] = payload.get('body', review['body'])
+        self.send_json(rest_item(review))
+
+    def handle_dismiss_review(self, match, query, payload):
+        review = self.find_item(self.scenario.reviews, int(match.group(1)))
+        if review is None:
+            return self.send_json({'message': 'Not Found'}, 404)
+        review['state'] = 'DISMISSED'
+        self.send_json(rest_item(review))
+
+    def handle_create_review(self, match, query, payload):
+        with self.scenario.lock:
+            review = self.scenario.bot_item('', 'review')
+            review['body'] = payload.get('body', '')
+            review['state'] = 'COMMENTED' if payload.get('event') == 'COMMENT' else 'CHANGES_REQUESTED'
+            self.scenario.reviews.append(review)
+            for comment in payload.get('comments', []):
+                item = self.scenario.bot_item('', 'review_comment')
+                item.update(body=comment.get('body', ''), path=comment.get('path'),
+                            line=comment.get('line') or comment.get('position'), outdated=False)
+                item['thread_id'] = f"PRRT_{item['id']}"
+                item['pull_request_review_id'] = review['id']
+                self.scenario.review_comments.append(item)
+        self.send_json(rest_item(review))
+
+    def handle_create_comment(self, match, query, payload):
+        with self.scenario.lock:
+            comment = self.scenario.bot_item('', 'comment')
+            comment['body'] = payload.get('body', '')
+            self.scenario.comments.append(comment)
+        self.send_json(rest_item(comment), 201)
+
+    def find_item(self, items, item_id):
+        with self.scenario.lock:
+            return next((item for item in items if item['id'] == item_id), None)
+
+    # GitHub GraphQL - PR 활동 조회(PR_ACTIVITY_QUERY), 리뷰 스레드 해결(resolveReviewThread)
+    def handle_graphql(self, match, query, payload):
+        variables = payload.get('variables') or {}
+        if 'resolveReviewThread' in payload.get('query', ''):
+            with self.scenario.lock:
+                item = next((c for c in self.scenario.review_comments if c['thread_id'] == variables.get('threadId')), None)
+                if item is not None:
+                    item['resolved'] = True
+            if item is None:
+                return self.send_json({'data': None, 'errors': [{'message': 'Could not resolve to a node'}]})
+            return self.send_json({'data': {'resolveReviewThread': {'thread': {'id': item['thread_id'], 'isResolved': True}}}})
+        with self.scenario.lock:
+            pull = {'headRefOid': self.scenario.head_sha, 'baseRefOid': self.scenario.base_sha}
+            if variables.get('withComments'):
+                pull['comments'] = graphql_page(self.scenario.comments, variables.get('commentsCursor'), graphql_comment)
+            if variables.get('withThreads'):
+                pull['reviewThreads'] = graphql_page(self.scenario.review_comments, variables.get('threadsCursor'), graphql_thread)
+            if variables.get('withReviews'):
+                pull['reviews'] = graphql_page(self.scenario.reviews, variables.get('reviewsCursor'), graphql_review)
+        self.send_json({'data': {'repository': {'pullRequest': pull}}})
+
+    # OpenAI chat completions - 응답 형식(json_schema 이름)에 맞춰 합성 리뷰/분석 결과 생성
+    def handle_chat_completions(self, match, query, payload):
+        prompt = payload['messages'][-1]['content']
+        response_format = payload.get('response_format') or {}
+        schema_name = (response_format.get('json_schema') or {}).get('name')
+        content = synthetic_completion(prompt, schema_name)
+        usage = {
+            'prompt_tokens': len(prompt) // 4 + 1,
+            'completion_tokens': len(content) // 4 + 1,
+            'total_tokens': (len(prompt) + len(content)) // 4 + 2
+        }
+
+        if not payload.get('stream'):
+            return self.send_json({
+                'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': payload.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage
+            })
+
+        # 스트리밍 응답 (SSE) - 수십 자 단위 델타, include_usage가 있으면 마지막에 사용량 청크
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(data):
+            chunk = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.sent += len(chunk)
+
+        base = {'id': 'chatcmpl-bench', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': payload.get('model')}
+        for i in range(0, len(content), 40):
+            event(json.dumps(dict(base, choices=[{'index': 0, 'delta': {'content': content[i:i + 40]}, 'finish_reason': None}]), ensure_ascii=False))
+        event(json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])))
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            event(json.dumps(dict(base, choices=[], usage=usage)))
+        event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def rest_item(item):
+    return {key: value for key, value in item.items() if key not in ('kind', 'outdated', 'resolved')}
+
+
+def graphql_page(items, cursor, convert, size=100):
+    start = int(cursor) if cursor else 0
+    page = items[start:start + size]
+    end = start + len(page)
+    return {
+        'pageInfo': {'hasNextPage': end < len(items), 'endCursor': str(end)},
+        'nodes': [convert(item) for item in page]
+    }
+
+
+def graphql_author(item):
+    return {'login': item['user']['login'].replace('[bot]', '')}
+
+
+def graphql_comment(item):
+    return {'databaseId': item['id'], 'body': item['body'], 'createdAt': item['created_at'], 'author': graphql_author(item)}
+
+
+def graphql_thread(item):
+    return {
+        'id': item['thread_id'],
+        'isResolved': item.get('resolved', False),
+        'comments': {'nodes': [{
+            'databaseId': item['id'], 'body': item['body'], 'path': item.get('path'), 'line': item.get('line'),
+            'outdated': item.get('outdated', False), 'createdAt': item['created_at'], 'author': graphql_author(item),
+            'pullRequestReview': {'databaseId': item['pull_request_review_id']} if item.get('pull_request_review_id') else None
+        }]}
+    }
+
+
+def graphql_review(item):
+    return {'databaseId': item['id'], 'body': item['body'], 'state': item.get('state'),
+            'submittedAt': item['created_at'], 'author': graphql_author(item)}
+
+
+DIFF_FILE_RE = re.compile(r'^diff --git a/(\S+) b/(\S+)$', re.MULTILINE)
+HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)', re.MULTILINE)
+ANALYSIS_ID_RE = re.compile(r'^- id: (\d+)', re.MULTILINE)
+DETAIL_LINE_RE = re.compile(r'^>>> (\d+):', re.MULTILINE)
+TRIAGE_HUNK_RE = re.compile(r'^\[(\d+)\] (\S+)$', re.MULTILINE)
+
+
+# 프롬프트 내용으로 결정되는 합성 응답 (같은 입력에는 항상 같은 출력)
+def synthetic_completion(prompt, schema_name):
+    detail = "이 코드는 외부 입력을 검증하지 않고 그대로 사용합니다. 악의적인 입력이 들어오면 예상하지 못한 동작이 발생할 수 있습니다. 입력 검증 로직을 추가해야 합니다."
+    fix = "입력값을 허용 목록으로 검증한 뒤 사용하고, 위험한 내장 함수 대신 안전한 파서를 사용하세요. 예: ast.literal_eval(value)"
+
+    if schema_name == 'issue_analyses':
+        ids = [int(value) for value in ANALYSIS_ID_RE.findall(prompt)]
+        return json.dumps({'analyses': [
+            {'id': i, 'problem': detail, 'impact': "보안 사고로 이어질 수 있습니다.", 'solution': fix} for i in ids
+        ]}, ensure_ascii=False)
+
+    if schema_name == 'hunk_triage':
+        # 경로별로 고정된 점수 - 일부 파일만 큰 모델로 올라가도록 0.0~0.9에 고르게 분포
+        return json.dumps({'scores': [
+            {'id': int(i), 'score': zlib.crc32(path.encode()) % 10 / 10} for i, path in TRIAGE_HUNK_RE.findall(prompt)
+        ]})
+
+    if DETAIL_LINE_RE.search(prompt) and 'diff --git' not in prompt:
+        return f"1. {detail}\n2. 보안 사고로 이어질 수 있습니다.\n3. {fix}"
+
+    issues = []
+    for match in DIFF_FILE_RE.finditer(prompt):
+        path = match.group(2)
+        hunk = HUNK_RE.search(prompt, match.end())
+        if not hunk:
+            continue
+        line = int(hunk.group(1)) + 1
+        issues.append({
+            'file': path, 'line': line, 'type': ISSUE_TYPES[len(issues) % len(ISSUE_TYPES)],
+            'description': detail, 'recommendation': fix
+        })
+        if len(issues) == 5:
+            break
+
+    if schema_name == 'code_review':
+        return json.dumps({'issues': issues}, ensure_ascii=False)
+    return "\n\n".join(
+        f"- 파일: {issue['file']}, 라인: {issue['line']}\n- 유형: {issue['type']}\n- 이슈: {issue['description']}\n- 해결: {issue['recommendation']}"
+        for issue in issues
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the fake GitHub/OpenAI server standalone")
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--bot-comments', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = FakeServer(Scenario(args.files, bot_comments=args.bot_comments), args.latency,
+                        failure_rate=args.failure_rate, port=args.port)
+    print(f"Fake GitHub/OpenAI server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
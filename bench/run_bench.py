@@ -0,0 +1,169 @@
+"""code_review.py 오프라인 벤치마크
+
+로컬 대역 서버(fake_server.py)에 합성 PR을 올려 두고 code_review.py를 하위 프로세스로 실행하여
+PR 크기별 전체 실행 시간, 엔드포인트별 요청 수, 최대 메모리(RSS), 단계별 계측(실행 리포트)을 측정.
+
+예시:
+    python bench/run_bench.py --sizes 1,10,100,1000,5000 --bot-comments 300 --latency 0.01
+    python bench/run_bench.py --sizes 100 --failure-rate 0.05 --output bench_results.json
+    python bench/run_bench.py --baseline bench_results.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_server import FakeServer, Scenario  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code_review.py')
+
+# 기준 결과와 비교할 지표 (값이 클수록 나쁨)
+REGRESSION_METRICS = ('seconds', 'total_requests', 'peak_rss_mb')
+
+
+def run_scenario(files, args):
+    scenario = Scenario(files, hunks_per_file=args.hunks_per_file, bot_comments=args.bot_comments, seed=args.seed)
+    server = FakeServer(scenario, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                        llm_latency=args.llm_latency, seed=args.seed).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='codesage-bench-') as workspace:
+            scenario.write_workspace(workspace)
+            report_path = os.path.join(workspace, 'codesage_report.json')
+            log_path = os.path.join(workspace, 'run.log')
+            env = dict(
+                os.environ,
+                GITHUB_API_URL=server.url,
+                GITHUB_GRAPHQL_URL=f"{server.url}/graphql",
+                OPENAI_BASE_URL=f"{server.url}/v1",
+                GITHUB_TOKEN='bench-token',
+                OPENAI_API_KEY='bench-key',
+                GITHUB_REPOSITORY='bench/repo',
+                GITHUB_REF='refs/pull/1/merge',
+                GITHUB_WORKSPACE=workspace,
+                CODESAGE_CACHE='false',
+                CODESAGE_REPORT_PATH=report_path,
+                CODESAGE_LOG_LEVEL='info'
+            )
+            env.pop('GITHUB_STEP_SUMMARY', None)
+            env.pop('RUNNER_DEBUG', None)
+            env.update(args.env)
+
+            start = time.perf_counter()
+            with open(log_path, 'w') as log:
+                process = subprocess.Popen([sys.executable, SCRIPT], cwd=workspace, env=env,
+                                           stdout=log, stderr=subprocess.STDOUT)
+                # wait4로 하위 프로세스 자체의 최대 RSS를 얻음 (Linux: KB 단위)
+                _, status, rusage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+            seconds = time.perf_counter() - start
+
+            report = {}
+            if os.path.exists(report_path):
+                with open(report_path) as file:
+                    report = json.load(file)
+            log_tail = ""
+            if report.get('status') != 'success':
+                with open(log_path) as file:
+                    log_tail = "".join(file.readlines()[-20:])
+    finally:
+        server.stop()
+
+    github_requests = sum(count for route, count in server.counts.items() if route != 'chat_completions')
+    return {
+        'files': files,
+        'hunks': files * args.hunks_per_file,
+        'bot_comments': args.bot_comments,
+        'seconds': round(seconds, 3),
+        'exit_code': process.returncode,
+        'status': report.get('status', 'unknown'),
+        'peak_rss_mb': round(rusage.ru_maxrss / 1024, 1),
+        'total_requests': sum(server.counts.values()),
+        'github_requests': github_requests,
+        'llm_requests': server.counts.get('chat_completions', 0),
+        'requests': dict(sorted(server.counts.items())),
+        'bytes_to_client': server.bytes_sent,
+        'bytes_from_client': server.bytes_received,
+        'stages': report.get('stages', {}),
+        'log_tail': log_tail
+    }
+
+
+def print_results(results):
+    print(f"{'files':>6} {'status':>8} {'seconds':>8} {'requests':>8} {'github':>7} {'llm':>5} {'rss MB':>7}  slowest stages")
+    for result in results:
+        stages = sorted(result['stages'].items(), key=lambda item: -item[1].get('wall_seconds', 0))[:3]
+        slowest = ", ".join(f"{name} {stats['wall_seconds']:.2f}s" for name, stats in stages)
+        print(f"{result['files']:>6} {result['status']:>8} {result['seconds']:>8.2f} {result['total_requests']:>8} "
+              f"{result['github_requests']:>7} {result['llm_requests']:>5} {result['peak_rss_mb']:>7.1f}  {slowest}")
+        if result['log_tail']:
+            print("        " + result['log_tail'].replace("\n", "\n        ").rstrip())
+
+
+# 기준 결과 대비 허용 범위를 넘게 나빠진 지표 목록
+def find_regressions(results, baseline, tolerance):
+    baseline_by_size = {result['files']: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_size.get(result['files'])
+        if not previous:
+            continue
+        for metric in REGRESSION_METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if before and after is not None and after > before * (1 + tolerance):
+                regressions.append(f"{result['files']} files: {metric} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_env(values):
+    env = {}
+    for value in values:
+        key, _, val = value.partition('=')
+        env[key] = val
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for code_review.py")
+    parser.add_argument('--sizes', default='1,10,100,1000,5000', help="comma-separated PR sizes (files)")
+    parser.add_argument('--hunks-per-file', type=int, default=2)
+    parser.add_argument('--bot-comments', type=int, default=300, help="historical bot comments/reviews/threads each")
+    parser.add_argument('--latency', type=float, default=0.005, help="GitHub API latency in seconds")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="chat completions latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="probability of an injected 502")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--env', action='append', default=[], help="extra KEY=VALUE for code_review.py")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+    args.env = parse_env(args.env)
+
+    results = []
+    for size in (int(value) for value in args.sizes.split(',') if value.strip()):
+        print(f"Running {size} files...", flush=True)
+        results.append(run_scenario(size, args))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+    if any(result['status'] != 'success' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,67 +1,816 @@
 import os
+import posixpath
+import sys
+import ast
+import argparse
+import contextvars
 import requests
+from requests.adapters import HTTPAdapter
 import re
-from openai import OpenAI
+import random
+import threading
 import json
 import time
-
-# 환경 변수
-repo = os.getenv('GITHUB_REPOSITORY')
-pr_number = os.getenv('GITHUB_REF', '').split('/')[-2] if os.getenv('GITHUB_REF') else None
-
-# PR 번호가 없으면 직접 설정 (로컬 테스트용)
-if not pr_number or not pr_number.isdigit():
-    pr_number = "9"  # 실제 PR 번호로 변경하세요
-    
-github_token = os.getenv('GITHUB_TOKEN')
-openai_api_key = os.getenv('OPENAI_API_KEY')
+import hashlib
+import subprocess
+import sqlite3
+import keyword
+import builtins
+import codecs
+import io
+import bisect
+from urllib.parse import quote
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
 
 # 봇 식별자 - 리뷰에 추가될 태그
 BOT_SIGNATURE = "<!-- auto-review-bot -->"
 
+# 마지막으로 리뷰한 커밋 SHA를 요약 코멘트에 숨겨 두기 위한 마커
+REVIEWED_SHA_MARKER = "<!-- codesage:last-reviewed-sha={sha} -->"
+REVIEWED_SHA_PATTERN = re.compile(r'<!-- codesage:last-reviewed-sha=([0-9a-f]{7,40}) -->')
+
+# 인라인 코멘트에 숨겨 두는 이슈 지문 - 다음 실행에서 같은 이슈의 코멘트를 찾아 유지/수정/해결
+FINGERPRINT_MARKER = "<!-- codesage:fp={fingerprint} -->"
+FINGERPRINT_PATTERN = re.compile(r'<!-- codesage:fp=([0-9a-f]{16}) -->')
+
+# 요약 리뷰 마커 - 실행마다 새 리뷰를 만들지 않고 이 리뷰의 본문을 갱신
+SUMMARY_MARKER = "<!-- codesage:summary -->"
+
+# 지문 기반 코멘트 조정 - 바뀐 이슈만 생성/수정/해결 (false면 이전 봇 활동을 모두 정리하고 다시 게시)
+RECONCILE_COMMENTS = os.getenv('CODESAGE_RECONCILE', 'true').lower() not in ('0', 'false', 'no')
+
+# 증분 리뷰 모드 - 이전 리뷰 이후 변경된 부분만 리뷰
+INCREMENTAL_MODE = os.getenv('CODESAGE_INCREMENTAL', 'true').lower() not in ('0', 'false', 'no')
+
+# 로그 레벨 - debug로 설정하거나 GitHub Actions 디버그 로깅(RUNNER_DEBUG=1)이 켜져 있으면 상세 로그 출력
+LOG_LEVEL = os.getenv('CODESAGE_LOG_LEVEL', 'debug' if os.getenv('RUNNER_DEBUG') == '1' else 'info').lower()
+
 # 디버그 모드 - 자세한 로깅을 위한 설정
-DEBUG_MODE = True
+DEBUG_MODE = LOG_LEVEL == 'debug'
+
+# 실행 리포트(JSON) 저장 경로 (빈 값이면 저장하지 않음)
+RUN_REPORT_PATH = os.getenv('CODESAGE_REPORT_PATH', 'codesage_report.json')
+
+# 실행 시간 예산(초, 0이면 제한 없음) - 전체 마감에서 게시용 예비 시간을 뺀 나머지를 LLM 단계에 배분하고,
+# 그중 REVIEW_BUDGET_SHARE 비율까지를 청크 리뷰에, 나머지를 상세 분석에 사용 (마감이 지나면 준비된 결과만 게시)
+RUN_TIME_BUDGET = float(os.getenv('CODESAGE_TIME_BUDGET', '900'))
+POST_RESERVE_SECONDS = float(os.getenv('CODESAGE_POST_RESERVE', '60'))
+REVIEW_BUDGET_SHARE = float(os.getenv('CODESAGE_REVIEW_BUDGET_SHARE', '0.6'))
+
+# 요청별 최대 대기 시간(초) - 남은 예산이 더 짧으면 남은 시간으로 줄임 (GitHub 요청은 결과 게시를 위해 최소 시간 보장)
+GITHUB_REQUEST_TIMEOUT = float(os.getenv('CODESAGE_GITHUB_TIMEOUT', '30'))
+LLM_REQUEST_TIMEOUT = float(os.getenv('CODESAGE_LLM_TIMEOUT', '120'))
+MIN_REQUEST_TIMEOUT = 5
+
+# 이슈별 상세 분석 요청의 최대 동시 실행 수
+ANALYSIS_CONCURRENCY = max(1, int(os.getenv('CODESAGE_ANALYSIS_CONCURRENCY', '4')))
+
+# 같은 파일의 이슈들을 한 번의 요청으로 묶어 상세 분석 (겹치는 컨텍스트 구간은 병합)
+# 요청당 이슈 수와 이슈당 응답 토큰 수 - 이슈가 많으면 여러 요청으로 나눠 이슈별 분석 길이를 보장
+ANALYSIS_BATCHING = os.getenv('CODESAGE_ANALYSIS_BATCHING', 'true').lower() not in ('0', 'false', 'no')
+ANALYSIS_BATCH_SIZE = 4
+ANALYSIS_TOKENS_PER_ISSUE = 1000
+
+# 상세 분석 시 이슈 라인 앞뒤로 포함할 컨텍스트 라인 수
+ANALYSIS_CONTEXT_LINES = 5
+
+# 청크 단위 리뷰 설정 - 청크당 프롬프트 토큰 예산, 청크 리뷰 동시 실행 수, 최종 보고 이슈 수
+REVIEW_CHUNK_TOKENS = max(500, int(os.getenv('CODESAGE_REVIEW_CHUNK_TOKENS', '6000')))
+REVIEW_CONCURRENCY = max(1, int(os.getenv('CODESAGE_REVIEW_CONCURRENCY', '4')))
+MAX_REVIEW_ISSUES = max(1, int(os.getenv('CODESAGE_MAX_REVIEW_ISSUES', '15')))
+
+# 전체 리뷰 프롬프트 토큰 예산 (0이면 제한 없음) - 초과하면 가치가 낮은 청크(hunk)부터 제외
+REVIEW_TOKEN_BUDGET = max(0, int(os.getenv('CODESAGE_REVIEW_TOKEN_BUDGET', '60000')))
+
+# 리뷰 가치가 낮아 프롬프트에서 제외하는 파일 - 잠금 파일, 벤더링/빌드 산출물, 생성된 코드
+LOCKFILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock',
+    'uv.lock', 'Cargo.lock', 'go.sum', 'composer.lock', 'Gemfile.lock', 'Podfile.lock', 'pubspec.lock', 'mix.lock'
+}
+VENDORED_PATH_RE = re.compile(r'(?:^|/)(?:vendor|vendors|node_modules|third_party|third-party|bower_components)/|\.min\.(?:js|css)$|\.map$')
+GENERATED_PATH_RE = re.compile(r'(?:_pb2(?:_grpc)?\.pyi?|\.pb\.go|\.pb\.(?:cc|h)|\.g\.dart|\.generated\.\w+|\.designer\.cs)$|(?:^|/)(?:dist|__generated__)/')
+GENERATED_MARKER_RE = re.compile(r'@generated|DO NOT EDIT|auto-?generated', re.IGNORECASE)
+
+# 가치 점수를 낮게 매기는 문서/테스트 파일
+LOW_VALUE_PATH_RE = re.compile(r'\.(?:md|rst|txt|adoc)$|(?:^|/)(?:docs?|tests?|__tests__|spec)/', re.IGNORECASE)
+
+# 로컬 사전 검사 사용 여부 - Python 파일의 청크를 base/head의 ast로 비교하여 의미 변경이 없는 청크(포맷, 주석, 독스트링, import 순서)는
+# 모델 리뷰에서 제외하고, 명백한 위험 코드(eval/exec, bare except, 셸 실행)는 모델 호출 없이 바로 이슈로 보고
+PRESCREEN_ENABLED = os.getenv('CODESAGE_PRESCREEN', 'true').lower() not in ('0', 'false', 'no')
+
+# 이슈 유형별 우선순위 (앞쪽일수록 중요)
+ISSUE_TYPE_PRIORITY = ['보안', '논리', '성능', '품질']
+
+# 지적된 라인이 diff에 없을 때 가장 가까운 코멘트 가능 라인으로 옮길 수 있는 최대 거리(라인 수)
+POSITION_SNAP_DISTANCE = int(os.getenv('CODESAGE_POSITION_SNAP_DISTANCE', '10'))
+
+# 이전 봇 코멘트 정리 설정 - 코멘트별 API 호출 동시 실행 수, GitHub 반영 확인 최대 대기 시간(초)
+CLEANUP_CONCURRENCY = max(1, int(os.getenv('CODESAGE_CLEANUP_CONCURRENCY', '8')))
+CLEANUP_READY_TIMEOUT = float(os.getenv('CODESAGE_CLEANUP_READY_TIMEOUT', '10'))
+
+# 리뷰 응답을 스트리밍으로 받아, 완성된 이슈부터 바로 이슈별 상세 분석을 시작
+# 지연 시간은 줄지만 이슈마다 분석 요청을 보내므로, 켜면 일괄 분석(ANALYSIS_BATCHING)보다 우선하며 기본값은 꺼짐
+REVIEW_STREAMING = os.getenv('CODESAGE_REVIEW_STREAMING', 'false').lower() not in ('0', 'false', 'no')
+
+# 리뷰에 사용하는 모델 (캐시 키에 포함) - 큰 모델(large)은 위험도가 높은 청크 리뷰와 이슈 상세 분석에 사용
+REVIEW_MODEL = os.getenv('CODESAGE_REVIEW_MODEL', 'gpt-4.1')
+
+# 모델 라우팅 - 빠른 모델(fast)이 먼저 청크(hunk)별 리뷰 필요도를 0~1 점수로 평가하고,
+# 점수가 ESCALATION_THRESHOLD 이상인 청크만 큰 모델로 리뷰 (나머지는 빠른 모델로 리뷰, TRIAGE_SKIP_THRESHOLD 미만은 리뷰 생략)
+MODEL_ROUTING = os.getenv('CODESAGE_MODEL_ROUTING', 'true').lower() not in ('0', 'false', 'no')
+FAST_MODEL = os.getenv('CODESAGE_FAST_MODEL', 'gpt-4.1-mini')
+ESCALATION_THRESHOLD = float(os.getenv('CODESAGE_ESCALATION_THRESHOLD', '0.5'))
+TRIAGE_SKIP_THRESHOLD = float(os.getenv('CODESAGE_TRIAGE_SKIP_THRESHOLD', '0'))
+TRIAGE_HUNK_TOKENS = 400
+
+# 리뷰 필요도 평가에 쓸 수 있는 청크 리뷰 시간 예산의 비율 (마감까지 평가하지 못한 hunk는 큰 모델로 리뷰)
+TRIAGE_BUDGET_SHARE = 0.25
+MODEL_TIERS = {'fast': FAST_MODEL, 'large': REVIEW_MODEL}
+
+# 리뷰 결과 디스크 캐시 설정 - 위치, 만료 시간(초), 최대 항목 수(초과 시 오래 사용하지 않은 항목부터 삭제)
+CACHE_ENABLED = os.getenv('CODESAGE_CACHE', 'true').lower() not in ('0', 'false', 'no')
+CACHE_DIR = os.getenv('CODESAGE_CACHE_DIR', '.codesage_cache')
+CACHE_TTL_SECONDS = int(os.getenv('CODESAGE_CACHE_TTL', str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv('CODESAGE_CACHE_MAX_ENTRIES', '5000'))
+
+# 저장소 심볼 인덱스 - 정의/참조/import를 blob SHA 기준으로 캐시 디렉터리의 SQLite에 저장하여 바뀐 파일만 다시 인덱싱
+SYMBOL_INDEX_ENABLED = os.getenv('CODESAGE_SYMBOL_INDEX', 'true').lower() not in ('0', 'false', 'no')
+SYMBOL_INDEX_PATH = os.getenv('CODESAGE_SYMBOL_INDEX_PATH', os.path.join(CACHE_DIR, 'symbols.db'))
+
+# 상세 분석 프롬프트에 덧붙이는 관련 정의 수와 정의당 최대 라인 수
+RELATED_DEFINITIONS_LIMIT = int(os.getenv('CODESAGE_RELATED_DEFINITIONS', '4'))
+RELATED_DEFINITION_LINES = 12
+
+# 코드 구간에서 정의한 함수/클래스를 사용하는 다른 위치(호출부)를 프롬프트에 덧붙이는 최대 수
+RELATED_REFERENCES_LIMIT = int(os.getenv('CODESAGE_RELATED_REFERENCES', '6'))
+
+# 코드 리뷰 프롬프트 템플릿 (변경 시 캐시가 자동으로 무효화됨)
+REVIEW_PROMPT_TEMPLATE = """코드 변경 사항을 리뷰하고 중요한 문제점을 상세하게 분석해주세요:
+
+1. 각 문제점에 대해 다음 형식을 정확히 사용하세요:
+- 파일: [파일명], 라인: [라인번호]
+- 유형: [보안/성능/논리/품질] 중 하나를 선택
+- 이슈: [상세한 문제 설명 - 구체적으로 무엇이 문제인지, 왜 문제인지, 어떤 영향이 있는지 기술]
+- 해결: [구체적인 해결 방법 - 정확히 어떻게 코드를 수정해야 하는지 예시 코드 포함]
+
+2. 중요도 순서로 최대 5개 이슈만 알려주세요.
+3. 무조건 파일명과 라인 번호를 명시해 주세요.
+4. 모든 이슈에 최소 3문장 이상의 상세한 설명과 구체적인 해결 방법을 제공해주세요.
+5. 일반적인 조언이나 모호한 설명은 완전히 피하고, 코드의 특정 문제를 정확히 지적해주세요.
+6. 해결 방법에는 가능한 실제 코드 예시를 포함해주세요.
+
+다음 코드 변경 사항을 리뷰하세요:
+
+{diff}"""
+
+# 리뷰 응답 형식 - json: JSON 스키마 기반 구조화 출력 (기본값), text: 기존 텍스트 형식 + 정규식 파싱
+REVIEW_OUTPUT_MODE = os.getenv('CODESAGE_OUTPUT_MODE', 'json').lower()
+
+# 청크 리뷰 응답의 최대 토큰 수 (응답이 잘리면 완성된 이슈만 사용하고 결과를 불완전한 것으로 표시)
+REVIEW_MAX_TOKENS = int(os.getenv('CODESAGE_REVIEW_MAX_TOKENS', '3000'))
+
+# 구조화 출력용 코드 리뷰 프롬프트 템플릿
+REVIEW_JSON_PROMPT_TEMPLATE = """코드 변경 사항을 리뷰하고 중요한 문제점을 상세하게 분석해주세요:
+
+1. 각 문제점을 issues 배열의 항목으로 작성하세요:
+- file: 파일명 (diff에 표시된 경로 그대로)
+- line: 새 파일 기준 라인 번호
+- type: 보안/성능/논리/품질 중 하나
+- description: 상세한 문제 설명 - 구체적으로 무엇이 문제인지, 왜 문제인지, 어떤 영향이 있는지 기술
+- recommendation: 구체적인 해결 방법 - 정확히 어떻게 코드를 수정해야 하는지 예시 코드 포함
+
+2. 중요도 순서로 최대 5개 이슈만 알려주세요. 문제가 없으면 빈 배열을 반환하세요.
+3. 모든 이슈에 최소 3문장 이상의 상세한 설명과 구체적인 해결 방법을 제공해주세요.
+4. 일반적인 조언이나 모호한 설명은 완전히 피하고, 코드의 특정 문제를 정확히 지적해주세요.
+
+다음 코드 변경 사항을 리뷰하세요:
+
+{diff}"""
+
+# 구조화 출력 JSON 스키마 (strict 모드에서는 모든 필드가 필수이며, 라인을 알 수 없으면 null)
+REVIEW_RESPONSE_SCHEMA = {
+    'name': 'code_review',
+    'strict': True,
+    'schema': {
+        'type': 'object',
+        'properties': {
+            'issues': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'file': {'type': 'string'},
+                        'line': {'type': ['integer', 'null']},
+                        'type': {'type': 'string', 'enum': ISSUE_TYPE_PRIORITY},
+                        'description': {'type': 'string'},
+                        'recommendation': {'type': 'string'}
+                    },
+                    'required': ['file', 'line', 'type', 'description', 'recommendation'],
+                    'additionalProperties': False
+                }
+            }
+        },
+        'required': ['issues'],
+        'additionalProperties': False
+    }
+}
+
+# 청크(hunk)별 리뷰 필요도 평가 프롬프트 템플릿 (빠른 모델용)
+TRIAGE_PROMPT_TEMPLATE = """다음 코드 변경 조각(hunk)마다 꼼꼼한 코드 리뷰가 필요한 정도를 0~1 사이 점수로 평가해주세요.
+
+- 높은 점수: 보안 취약점, 로직 오류, 동시성/자원 관리 문제, 예외 처리 누락, 성능 저하 가능성이 있는 변경
+- 낮은 점수: 이름 변경, 주석/문서, 로그 메시지, 단순 설정 값이나 테스트 데이터 변경처럼 위험이 낮은 변경
+
+{hunks}
+
+모든 조각의 번호(id)에 대해 점수를 반환해주세요."""
+
+TRIAGE_RESPONSE_SCHEMA = {
+    'name': 'hunk_triage',
+    'strict': True,
+    'schema': {
+        'type': 'object',
+        'properties': {
+            'scores': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'id': {'type': 'integer'},
+                        'score': {'type': 'number'}
+                    },
+                    'required': ['id', 'score'],
+                    'additionalProperties': False
+                }
+            }
+        },
+        'required': ['scores'],
+        'additionalProperties': False
+    }
+}
+
+# 이슈 상세 분석 프롬프트 템플릿
+DETAIL_PROMPT_TEMPLATE = """다음 코드의 {line_num}번 라인에서 발견된 이슈에 대해 상세 분석이 필요합니다:
+
+```
+{code_context}
+```
+{related_definitions}
+이슈 유형: {issue_type}
+현재 설명: {description}
+현재 해결책: {recommendation}
+
+위 코드와 라인을 면밀히 분석하여 다음 정보를 제공해주세요:
+1. 정확히 어떤 문제가 있는지 (최소 3문장 이상으로 상세히)
+2. 이 문제가 왜 중요한지, 어떤 영향을 미치는지
+3. 구체적인 해결 방법 (가능하면 수정된 코드 예시 포함)
+
+중요: 일반적인 설명이나 모호한 조언은 피하고, 이 특정 코드에 맞춘 구체적인 분석을 제공해주세요.
+"""
+
+# 파일 단위 일괄 상세 분석 프롬프트 템플릿
+BATCH_DETAIL_PROMPT_TEMPLATE = """다음은 {file} 파일의 코드 일부입니다. 표시된(>>>) 라인들에서 발견된 이슈들에 대해 각각 상세 분석이 필요합니다:
+
+```
+{code_context}
+```
+{related_definitions}
+이슈 목록:
+{issue_list}
+
+위 코드와 라인을 면밀히 분석하여 각 이슈(id)마다 다음 정보를 제공해주세요:
+- problem: 정확히 어떤 문제가 있는지 (최소 3문장 이상으로 상세히)
+- impact: 이 문제가 왜 중요한지, 어떤 영향을 미치는지
+- solution: 구체적인 해결 방법 (가능하면 수정된 코드 예시 포함)
+
+중요: 일반적인 설명이나 모호한 조언은 피하고, 이 특정 코드에 맞춘 구체적인 분석을 제공해주세요.
+"""
+
+# 일괄 상세 분석 응답 JSON 스키마
+BATCH_DETAIL_RESPONSE_SCHEMA = {
+    'name': 'issue_analyses',
+    'strict': True,
+    'schema': {
+        'type': 'object',
+        'properties': {
+            'analyses': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'id': {'type': 'integer'},
+                        'problem': {'type': 'string'},
+                        'impact': {'type': 'string'},
+                        'solution': {'type': 'string'}
+                    },
+                    'required': ['id', 'problem', 'impact', 'solution'],
+                    'additionalProperties': False
+                }
+            }
+        },
+        'required': ['analyses'],
+        'additionalProperties': False
+    }
+}
+
+# GitHub API 주소 (GitHub Actions에서는 GITHUB_API_URL이 자동 설정됨, GHES 대응)
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# GitHub GraphQL API 주소 (GitHub Actions에서는 GITHUB_GRAPHQL_URL이 자동 설정됨)
+GITHUB_GRAPHQL_URL = os.getenv('GITHUB_GRAPHQL_URL', f"{GITHUB_API_URL}/graphql")
+
+# GitHub API 재시도 설정 - 최대 재시도 횟수, 대기 시간 상한(초), 속도 조절을 시작할 남은 요청 수
+GITHUB_MAX_RETRIES = int(os.getenv('CODESAGE_GITHUB_MAX_RETRIES', '4'))
+GITHUB_MAX_WAIT_SECONDS = int(os.getenv('CODESAGE_GITHUB_MAX_WAIT', '120'))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv('CODESAGE_GITHUB_RATE_LIMIT_RESERVE', '100'))
+
+# ETag 조건부 요청 캐시의 최대 항목 수와 본문 총 바이트 수 (넘으면 가장 오래 사용되지 않은 항목부터 제거)
+GITHUB_ETAG_CACHE_SIZE = max(1, int(os.getenv('CODESAGE_GITHUB_ETAG_CACHE_SIZE', '512')))
+GITHUB_ETAG_CACHE_MAX_BYTES = int(os.getenv('CODESAGE_GITHUB_ETAG_CACHE_BYTES', str(32 * 1024 * 1024)))
 
 # GitHub API 헤더
+# (인증 헤더는 실행별 토큰으로 요청마다 추가)
 github_headers = {
-    'Authorization': f'Bearer {github_token}',
     'Accept': 'application/vnd.github.v3+json'
 }
 
+# diff 형식 응답을 받기 위한 Accept 헤더
+GITHUB_DIFF_ACCEPT = 'application/vnd.github.v3.diff'
+
+# 모든 GitHub API 호출이 공유하는 세션 (keep-alive 연결 재사용, 병렬 호출을 위한 커넥션 풀)
+github_session = requests.Session()
+github_session.headers.update(github_headers)
+github_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+github_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# 조건부 요청(ETag)용 응답 캐시 - 항목은 연결/요청 객체를 붙잡지 않도록 ETag와 응답 본문만 보관
+# 삽입/조회 순서로 LRU를 유지하고, 항목 수와 본문 총 바이트 수를 모두 제한 (한도보다 큰 본문은 저장하지 않음)
+class EtagCache:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, entry):
+        size = len(entry[3])
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[3])
+            if size > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted[3])
+
+# ETag 캐시와 최근 응답의 rate limit 상태
+github_etag_cache = EtagCache(GITHUB_ETAG_CACHE_SIZE, GITHUB_ETAG_CACHE_MAX_BYTES)
+github_rate_limit = {'remaining': None, 'reset': None}
+github_state_lock = threading.Lock()
+
 # 로깅 함수
 def log_info(message):
     print(f"INFO: {message}")
 
+# 디버그 로그는 메시지 대신 함수를 넘기면 실제로 출력할 때만 문자열을 만듦 (큰 응답 본문 등)
 def log_debug(message):
-    if DEBUG_MODE:
-        print(f"DEBUG: {message}")
+    if not DEBUG_MODE:
+        return
+    if callable(message):
+        message = message()
+    print(f"DEBUG: {message}")
 
 def log_error(message):
     print(f"ERROR: {message}")
 
+# 현재 실행 중인 파이프라인 단계 (작업 스레드에는 bind_context()로 제출 시점의 값을 전달)
+current_stage_var = contextvars.ContextVar('codesage_stage', default=None)
+
+# 파이프라인 단계별 계측 - 실행 시간, HTTP 호출/재시도 수, 전송 바이트, LLM 호출과 토큰 수
+class RunTracer:
+    COUNTERS = ('http_calls', 'http_retries', 'bytes_sent', 'bytes_received',
+                'llm_calls', 'prompt_tokens', 'completion_tokens')
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages = {}
+        self.lock = threading.Lock()
+    
+    def current_stage(self):
+        return current_stage_var.get() or 'other'
+    
+    def stage_stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = dict.fromkeys(self.COUNTERS, 0)
+            stats.update(busy_seconds=0.0, first_start=None, last_end=None)
+        return stats
+    
+    # 단계 실행 구간 기록 - 여러 스레드에서 겹쳐 실행되면 busy_seconds는 합계, wall_seconds는 처음~마지막 구간
+    @contextmanager
+    def stage(self, name):
+        token = current_stage_var.set(name)
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            current_stage_var.reset(token)
+            with self.lock:
+                stats = self.stage_stats(name)
+                stats['busy_seconds'] += end - start
+                stats['first_start'] = start if stats['first_start'] is None else min(stats['first_start'], start)
+                stats['last_end'] = end if stats['last_end'] is None else max(stats['last_end'], end)
+    
+    def add(self, **counters):
+        with self.lock:
+            stats = self.stage_stats(self.current_stage())
+            for name, value in counters.items():
+                stats[name] += value
+    
+    def report(self, status, **extra):
+        with self.lock:
+            stages = {}
+            for name, stats in self.stages.items():
+                entry = {counter: stats[counter] for counter in self.COUNTERS}
+                entry['busy_seconds'] = round(stats['busy_seconds'], 3)
+                entry['wall_seconds'] = round(stats['last_end'] - stats['first_start'], 3) if stats['first_start'] else 0.0
+                stages[name] = entry
+        return dict({
+            'status': status,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+            'total_seconds': round(time.time() - self.started_at, 3),
+            'stages': stages
+        }, **extra)
+
+# 리뷰 설정 - 대상 저장소/PR, 인증 정보, 실행 옵션
+class CodeSageConfig:
+    def __init__(self, repo, pr_number, github_token=None, openai_api_key=None,
+                 incremental=INCREMENTAL_MODE, report_path=RUN_REPORT_PATH, workspace=None, local_checkout=True):
+        self.repo = repo
+        self.pr_number = str(pr_number)
+        self.github_token = github_token
+        self.openai_api_key = openai_api_key
+        self.incremental = incremental
+        self.report_path = report_path
+        # 대상 저장소의 로컬 체크아웃 경로 (기본: GITHUB_WORKSPACE)
+        self.workspace = workspace
+        # 로컬 체크아웃이 없으면 파일 내용은 GitHub contents API로만 읽고 심볼 인덱스는 사용하지 않음
+        # (현재 디렉터리의 다른 저장소 파일이 분석 컨텍스트에 섞이지 않도록)
+        self.local_checkout = local_checkout
+    
+    # GitHub Actions 환경 변수에서 설정 구성
+    @classmethod
+    def from_env(cls, **overrides):
+        pr_number = os.getenv('GITHUB_REF', '').split('/')[-2] if os.getenv('GITHUB_REF') else None
+        
+        # PR 번호가 없으면 직접 설정 (로컬 테스트용)
+        if not pr_number or not pr_number.isdigit():
+            pr_number = "9"  # 실제 PR 번호로 변경하세요
+        
+        config = {
+            'repo': os.getenv('GITHUB_REPOSITORY'),
+            'pr_number': pr_number,
+            'github_token': os.getenv('GITHUB_TOKEN'),
+            'openai_api_key': os.getenv('OPENAI_API_KEY')
+        }
+        config.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**config)
+
+# 리뷰 실행 한 번의 상태 - 봇 활동 스냅샷, 파일 내용 제공자, 계측, 토큰 사용량
+class RunState:
+    def __init__(self, config):
+        self.config = config
+        self.bot_activity = None
+        self.file_content_provider = FileContentProvider(workspace=config.workspace, local=config.local_checkout)
+        self.tracer = RunTracer()
+        self.token_usage = {}
+        self.model_usage = {}
+        self.prescreen_stats = {'files': 0, 'trivial_hunks': 0, 'static_issues': 0}
+        self.symbol_index = None
+        self.symbol_index_stats = None
+        self.pr_changes = None  # 증분 리뷰에서 받은 전체 PR diff (본문 없음)
+        self.deadline = Deadline.after(RUN_TIME_BUDGET)
+        self.budget_skipped = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def repo(self):
+        return self.config.repo
+    
+    @property
+    def pr_number(self):
+        return self.config.pr_number
+
+# 현재 컨텍스트의 실행 상태 (CodeSage가 단계 실행 중에 설정, 없으면 환경 변수 기반 기본 실행)
+current_run_var = contextvars.ContextVar('codesage_run', default=None)
+default_run = None
+
+def current_run():
+    global default_run
+    run = current_run_var.get()
+    if run is None:
+        if default_run is None:
+            default_run = RunState(CodeSageConfig.from_env())
+        run = default_run
+    return run
+
+def current_tracer():
+    return current_run().tracer
+
+# 마감 시각 (expires_at이 None이면 제한 없음)
+class Deadline:
+    def __init__(self, expires_at=None):
+        self.expires_at = expires_at
+    
+    @classmethod
+    def after(cls, seconds):
+        return cls(time.time() + seconds if seconds > 0 else None)
+    
+    def remaining(self):
+        return None if self.expires_at is None else max(0.0, self.expires_at - time.time())
+    
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+    
+    # 남은 시간에서 reserve를 뺀 뒤 share 비율만큼의 하위 마감
+    def split(self, share=1.0, reserve=0.0):
+        if self.expires_at is None:
+            return Deadline()
+        now = time.time()
+        return Deadline(now + max(0.0, self.expires_at - now - reserve) * share)
+
+# 시간 예산을 모두 써서 요청을 보내지 않았거나 중단한 경우
+class TimeBudgetExceeded(Exception):
+    pass
+
+# 현재 컨텍스트의 단계 마감 (설정되지 않았으면 실행 전체 마감)
+current_deadline_var = contextvars.ContextVar('codesage_deadline', default=None)
+
+def current_deadline():
+    return current_deadline_var.get() or current_run().deadline
+
+@contextmanager
+def use_deadline(deadline):
+    token = current_deadline_var.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline_var.reset(token)
+
+# 예산 초과로 건너뛴 LLM 요청을 단계별로 집계 (stage를 생략하면 현재 단계)
+def record_budget_skip(stage=None):
+    run = current_run()
+    stage = stage or current_tracer().current_stage()
+    with run.lock:
+        run.budget_skipped[stage] = run.budget_skipped.get(stage, 0) + 1
+
+# 작업 스레드에서도 제출 시점의 실행 상태와 단계를 그대로 사용하도록 컨텍스트를 복사하여 실행
+def bind_context(func):
+    context = contextvars.copy_context()
+    def run_in_context(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run_in_context
+
+# 실행 리포트를 JSON 파일로 저장하고, GitHub Actions 작업 요약(GITHUB_STEP_SUMMARY)에 표로 추가
+def write_run_report(status, **extra):
+    report = current_tracer().report(status, **extra)
+    report_path = current_run().config.report_path
+    if report_path:
+        try:
+            with open(report_path, 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            log_info(f"Run report written to {report_path}")
+        except OSError as e:
+            log_error(f"Failed to write run report: {str(e)}")
+    
+    summary_path = os.getenv('GITHUB_STEP_SUMMARY')
+    if summary_path:
+        rows = [
+            f"| {name} | {stats['wall_seconds']:.2f} | {stats['http_calls']} | {stats['http_retries']} | "
+            f"{stats['bytes_received'] + stats['bytes_sent']:,} | {stats['llm_calls']} | "
+            f"{stats['prompt_tokens']:,} / {stats['completion_tokens']:,} |"
+            for name, stats in report['stages'].items()
+        ]
+        summary = "\n".join([
+            f"### CodeSage review ({status}, {report['total_seconds']:.1f}s)",
+            "",
+            "| 단계 | 시간(초) | HTTP 호출 | 재시도 | 전송 바이트 | LLM 호출 | 토큰 (입력 / 출력) |",
+            "|---|---:|---:|---:|---:|---:|---:|"
+        ] + rows)
+        try:
+            with open(summary_path, 'a') as file:
+                file.write(summary + "\n\n")
+        except OSError as e:
+            log_error(f"Failed to write job summary: {str(e)}")
+    return report
+
+# 재시도 대기 시간 (지수 백오프 + 지터)
+def github_backoff(attempt):
+    return min(GITHUB_MAX_WAIT_SECONDS, 2 ** attempt) + random.uniform(0, 1)
+
+# 응답 헤더의 rate limit 정보 갱신
+def update_github_rate_limit(response):
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+    if remaining is None or reset is None:
+        return
+    with github_state_lock:
+        github_rate_limit['remaining'] = int(remaining)
+        github_rate_limit['reset'] = int(reset)
+
+# 남은 요청 수가 적으면 리셋 시각까지 남은 요청을 고르게 나누어 미리 속도 조절
+# 대기는 실행 마감에서 게시용 예비 시간을 뺀 남은 시간까지만 (예비 시간 안에서는 대기하지 않음)
+def throttle_github_requests(deadline):
+    with github_state_lock:
+        remaining = github_rate_limit['remaining']
+        reset = github_rate_limit['reset']
+    if remaining is None or remaining > GITHUB_RATE_LIMIT_RESERVE:
+        return
+    
+    wait = (reset - time.time()) / max(remaining, 1)
+    budget = deadline.remaining()
+    if budget is not None:
+        wait = min(wait, budget - POST_RESERVE_SECONDS)
+    if wait > 0:
+        wait = min(wait, GITHUB_MAX_WAIT_SECONDS)
+        log_info(f"GitHub rate limit low ({remaining} remaining), pausing {wait:.1f}s")
+        time.sleep(wait)
+
+# 재시도가 필요한 응답이면 대기 시간(초)을, 아니면 None을 반환
+def github_retry_delay(response, attempt, idempotent):
+    status = response.status_code
+    body = response.text.lower() if status in (403, 429) else ''
+    rate_limited = status == 429 or (status == 403 and (
+        response.headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in body))
+    
+    if rate_limited:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            wait = int(retry_after)
+        elif response.headers.get('X-RateLimit-Remaining') == '0' and response.headers.get('X-RateLimit-Reset'):
+            wait = int(response.headers['X-RateLimit-Reset']) - time.time() + 1
+        else:
+            # secondary rate limit은 Retry-After가 없으면 최소 1분 대기 권장
+            wait = max(60, github_backoff(attempt))
+        # 대기 시간이 너무 길면 재시도하지 않고 실패 응답을 그대로 반환
+        return max(wait, 0) if wait <= GITHUB_MAX_WAIT_SECONDS else None
+    
+    # 5xx는 중복 생성 위험이 없는 요청만 재시도
+    if status in (500, 502, 503, 504) and idempotent:
+        return github_backoff(attempt)
+    return None
+
+# GitHub 요청별 timeout - 실행 마감까지 남은 시간으로 줄이되, 마감 직전 요청도 응답을 받을 수 있도록 최소 시간은 보장
+def github_request_timeout(deadline):
+    remaining = deadline.remaining()
+    if remaining is None:
+        return GITHUB_REQUEST_TIMEOUT
+    return max(MIN_REQUEST_TIMEOUT, min(GITHUB_REQUEST_TIMEOUT, remaining))
+
+# 재시도 대기 후에도 마감 전에 요청할 시간이 남는지
+def deadline_allows(deadline, wait):
+    remaining = deadline.remaining()
+    return remaining is None or wait + MIN_REQUEST_TIMEOUT <= remaining
+
+# ETag 캐시 항목 - (ETag, 상태 코드, 헤더, 본문 바이트, 인코딩)
+def etag_cache_entry(response):
+    return (response.headers['ETag'], response.status_code, dict(response.headers), response.content, response.encoding)
+
+# 캐시 항목으로 응답 객체를 새로 구성 (호출 쪽은 일반 응답과 같이 status_code/json()/text 사용)
+def response_from_etag_cache(entry, url):
+    _, status_code, headers, content, encoding = entry
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = encoding
+    response.url = url
+    return response
+
+# ETag 캐시 키 - 토큰마다 볼 수 있는 내용이 다르므로 인증 정보의 해시를 포함
+# (서비스에서는 여러 설치/토큰이 캐시를 공유하므로, 다른 토큰으로 받은 본문이 304 응답으로 재사용되지 않도록)
+def etag_cache_key(url, headers, params):
+    credential = hashlib.sha256(headers.get('Authorization', '').encode('utf-8')).hexdigest()[:16]
+    return (credential, url, headers.get('Accept', ''), json.dumps(params, sort_keys=True))
+
+# GitHub API 요청 (세션 재사용, 5xx/429 재시도, rate limit 대응, GET 요청의 ETag 조건부 요청)
+# idempotent를 지정하지 않으면 HTTP 메서드로 판단 (GraphQL 조회처럼 안전한 POST는 True로 지정)
+def github_request(method, url, accept=None, idempotent=None, **kwargs):
+    headers = dict(kwargs.pop('headers', None) or {})
+    github_token = current_run().config.github_token
+    if github_token:
+        headers.setdefault('Authorization', f'Bearer {github_token}')
+    if accept:
+        headers['Accept'] = accept
+    
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in ('GET', 'PUT', 'PATCH', 'DELETE')
+    etag_key = None
+    cached = None
+    if method == 'GET' and not kwargs.get('stream'):
+        etag_key = etag_cache_key(url, headers, kwargs.get('params'))
+        cached = github_etag_cache.get(etag_key)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+    
+    # 실행 마감이 지나면 더 이상 요청하지 않음 (요청마다 최소 timeout을 보장하므로 계속 보내면 예산을 넘어 실행됨)
+    deadline = current_run().deadline
+    if deadline.expired():
+        record_budget_skip('github')
+        raise TimeBudgetExceeded(f"GitHub {method} {url} not sent: time budget exhausted")
+    for attempt in range(GITHUB_MAX_RETRIES + 1):
+        throttle_github_requests(deadline)
+        try:
+            response = github_session.request(method, url, headers=headers, timeout=github_request_timeout(deadline), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            current_tracer().add(http_calls=1)
+            wait = github_backoff(attempt)
+            if attempt == GITHUB_MAX_RETRIES or not deadline_allows(deadline, wait):
+                raise
+            current_tracer().add(http_retries=1)
+            log_info(f"GitHub {method} {url} failed ({str(e)}), retrying in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+        
+        update_github_rate_limit(response)
+        # 스트리밍 응답의 본문 크기는 읽는 쪽(iter_diff_lines)에서 기록
+        current_tracer().add(
+            http_calls=1,
+            bytes_sent=len(response.request.body or b'') if response.request is not None else 0,
+            bytes_received=0 if kwargs.get('stream') else len(response.content)
+        )
+        
+        # 304 Not Modified는 rate limit을 소모하지 않으며, 캐시된 응답을 그대로 사용
+        if response.status_code == 304 and cached:
+            log_debug(f"GitHub {method} {url} not modified, using cached response")
+            return response_from_etag_cache(cached, url)
+        
+        wait = github_retry_delay(response, attempt, idempotent) if attempt < GITHUB_MAX_RETRIES else None
+        if wait is not None and not deadline_allows(deadline, wait):
+            log_info(f"GitHub {method} {url} returned {response.status_code}, not retrying past the time budget")
+            wait = None
+        if wait is not None:
+            current_tracer().add(http_retries=1)
+            log_info(f"GitHub {method} {url} returned {response.status_code}, retrying in {wait:.1f}s")
+            # 스트리밍 응답은 본문을 읽지 않았으므로 닫아서 연결을 풀에 반환
+            response.close()
+            time.sleep(wait)
+            continue
+        
+        if etag_key and response.status_code == 200 and response.headers.get('ETag'):
+            github_etag_cache.put(etag_key, etag_cache_entry(response))
+        return response
+
 # GitHub API 토큰 검증
 def validate_github_token():
-    test_url = f"https://api.github.com/repos/{repo}"
+    run = current_run()
+    test_url = f"{GITHUB_API_URL}/repos/{run.repo}"
     log_debug(f"Validating GitHub token with test request to: {test_url}")
     
-    response = requests.get(test_url, headers=github_headers)
+    response = github_request('GET', test_url)
     if response.status_code == 200:
         log_info("GitHub token is valid")
         return True
     else:
         log_error(f"GitHub token validation failed (status code: {response.status_code})")
-        log_debug(f"Response: {response.text}")
+        log_debug(lambda: f"Response: {response.text}")
         return False
 
 # PR 정보 가져오기 (commit SHA 포함)
 def get_pr_info():
-    log_info(f"Working with repository: {repo}")
-    log_info(f"Working with PR number: {pr_number}")
+    run = current_run()
+    # GraphQL로 이미 가져온 PR 활동에 SHA가 있으면 추가 요청 없이 사용
+    activity = get_bot_activity()
+    if activity.get('head_sha') and activity.get('base_sha'):
+        log_debug(f"Using PR info from GraphQL. Head SHA: {activity['head_sha']}")
+        return {
+            'head_sha': activity['head_sha'],
+            'base_sha': activity['base_sha']
+        }
     
-    pr_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}"
+    pr_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}"
     log_debug(f"Fetching PR info from: {pr_url}")
     
-    response = requests.get(pr_url, headers=github_headers)
+    response = github_request('GET', pr_url)
     if response.status_code == 200:
         pr_data = response.json()
         log_debug(f"Successfully retrieved PR info. Head SHA: {pr_data['head']['sha']}")
@@ -71,314 +820,2164 @@ def get_pr_info():
         }
     else:
         log_error(f"Failed to get PR info (status code: {response.status_code})")
-        log_debug(f"Response: {response.text}")
+        log_debug(lambda: f"Response: {response.text}")
         return None
 
-# diff 가져오기
-def get_diff():
-    diff_headers = {
-        'Authorization': f'Bearer {github_token}',
-        'Accept': 'application/vnd.github.v3.diff'
-    }
-    diff_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}"
+# diff를 스트리밍으로 받으면서 바로 파싱 (전체 diff 텍스트를 메모리에 올리지 않음)
+def fetch_parsed_diff(url, keep_text=True):
+    response = github_request('GET', url, accept=GITHUB_DIFF_ACCEPT, stream=True)
+    try:
+        if response.status_code != 200:
+            log_error(f"Failed to get diff from {url} (status code: {response.status_code})")
+            log_debug(lambda: f"Response: {response.text}")
+            return None
+        file_changes = parse_diff(response, keep_text)
+    finally:
+        response.close()
+    
+    hunk_count = sum(len(changes['hunks']) for changes in file_changes.values())
+    log_debug(f"Successfully parsed diff: {len(file_changes)} files, {hunk_count} hunks")
+    return file_changes
+
+# PR diff 가져오기 (파일별 청크 레코드로 파싱된 결과 반환)
+def get_diff(keep_text=True):
+    run = current_run()
+    diff_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}"
     log_debug(f"Fetching diff from: {diff_url}")
+    return fetch_parsed_diff(diff_url, keep_text)
+
+# 두 커밋 사이의 diff 가져오기 (증분 리뷰용)
+def get_compare_diff(base_sha, head_sha):
+    run = current_run()
+    compare_url = f"{GITHUB_API_URL}/repos/{run.repo}/compare/{base_sha}...{head_sha}"
+    log_debug(f"Fetching compare diff from: {compare_url}")
+    return fetch_parsed_diff(compare_url)
+
+# 증분 diff를 전체 PR diff에도 있는 변경으로 제한
+# (PR에 베이스 브랜치를 병합하면 compare 결과에 업스트림 변경이 섞이므로, PR diff의 추가 라인과 겹치는 청크만 유지)
+def restrict_to_pr_diff(file_changes, pr_changes):
+    restricted = {}
+    for file_path, changes in file_changes.items():
+        pr_file = pr_changes.get(file_path)
+        if pr_file is None:
+            continue
+        added_lines = set()
+        pr_ranges = []
+        for hunk in pr_file['hunks']:
+            added_lines.update(new_line for _, kind, _, new_line in hunk.iter_lines() if kind == LINE_ADDED)
+            pr_ranges.append((hunk.new_start, hunk.new_start + max(hunk.new_count - 1, 0)))
+        
+        hunks = []
+        for hunk in changes['hunks']:
+            hunk_added = [new_line for _, kind, _, new_line in hunk.iter_lines() if kind == LINE_ADDED]
+            if hunk_added:
+                keep = any(line in added_lines for line in hunk_added)
+            else:
+                # 삭제만 있는 청크는 PR diff의 청크 범위 안에 있을 때만 유지
+                keep = any(start <= hunk.new_start <= end for start, end in pr_ranges)
+            if keep:
+                hunks.append(hunk)
+        
+        if hunks or (not changes['hunks'] and not pr_file['hunks']):
+            restricted[file_path] = {**changes, 'hunks': hunks}
     
-    response = requests.get(diff_url, headers=diff_headers)
-    if response.status_code == 200:
-        log_debug("Successfully retrieved diff")
-        return response.text
-    else:
-        log_error(f"Failed to get diff (status code: {response.status_code})")
-        log_debug(f"Response: {response.text}")
+    dropped = len(file_changes) - len(restricted)
+    if dropped:
+        log_info(f"Excluded {dropped} files changed outside the PR (e.g. merged from the base branch)")
+    return restricted
+
+# 이전 봇 리뷰/코멘트의 마커에서 마지막으로 리뷰한 커밋 SHA 찾기
+def find_last_reviewed_sha():
+    activity = get_bot_activity()
+    candidates = []
+    for review in activity['reviews']:
+        if is_bot_comment(review):
+            candidates.append((review.get('submitted_at') or '', review.get('body') or ''))
+    for comment in activity['comments']:
+        if is_bot_comment(comment):
+            candidates.append((comment.get('created_at') or '', comment.get('body') or ''))
+    
+    # 가장 최근 항목의 마커를 사용 (ISO 8601 시각은 문자열 비교로 정렬 가능)
+    for _, body in sorted(candidates, key=lambda item: item[0], reverse=True):
+        match = REVIEWED_SHA_PATTERN.search(body)
+        if match:
+            return match.group(1)
+    return None
+
+# 리뷰 대상 diff 결정 - 증분 모드에서는 마지막 리뷰 커밋 이후의 변경만 가져옴
+# 반환값: (파싱된 diff, 증분 리뷰 기준 SHA 또는 None)
+def get_review_diff(pr_info):
+    if current_run().config.incremental:
+        last_sha = find_last_reviewed_sha()
+        if last_sha and pr_info['head_sha'].startswith(last_sha):
+            log_info(f"Head {pr_info['head_sha'][:7]} was already reviewed")
+            return {}, last_sha
+        if last_sha:
+            log_info(f"Incremental review: {last_sha[:7]}...{pr_info['head_sha'][:7]}")
+            file_changes = get_compare_diff(last_sha, pr_info['head_sha'])
+            # 전체 PR diff는 증분 변경 제한과 인라인 코멘트 position 계산에 함께 사용 (본문 없이 파싱)
+            pr_changes = get_diff(keep_text=False) if file_changes is not None else None
+            if pr_changes is not None:
+                current_run().pr_changes = pr_changes
+                return restrict_to_pr_diff(file_changes, pr_changes), last_sha
+            # force-push 등으로 이전 커밋을 비교할 수 없으면 전체 리뷰로 전환
+            log_info("Falling back to full PR review")
+    
+    return get_diff(), None
+
+# 증분 diff의 파일별 변경 라인 범위 (새 파일 기준)
+def get_touched_ranges(file_changes):
+    touched = {}
+    for file_path, changes in file_changes.items():
+        ranges = []
+        for hunk in changes.get('hunks', []):
+            ranges.append((hunk.new_start, hunk.new_start + max(hunk.new_count - 1, 0)))
+        touched[file_path] = ranges
+    return touched
+
+# diff 파싱용 정규식 (모듈 로드 시 한 번만 컴파일)
+DIFF_FILE_HEADER_RE = re.compile(r'^diff --git a/(.+?) b/(.+)$')
+# 줄 수가 1이면 생략될 수 있음 (예: @@ -1 +1 @@)
+HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# 청크 내 라인 종류
+LINE_CONTEXT = 0
+LINE_ADDED = 1
+LINE_DELETED = -1
+LINE_META = 2  # "\ No newline at end of file" 등, 파일 라인 번호는 증가하지 않음
+
+# diff 청크(hunk) 레코드 - 대형 diff에서도 메모리를 적게 쓰도록 __slots__와 array 사용
+# position: 청크 헤더(@@)의 diff position (파일의 첫 청크는 0, 그 아래 라인이 1)
+# kinds: 청크 본문 각 라인의 종류 (LINE_*), lines: 본문 원문 (keep_text=False면 None)
+class DiffHunk:
+    __slots__ = ('file', 'header', 'old_start', 'old_count', 'new_start', 'new_count',
+                 'position', 'kinds', 'lines')
+    
+    def __init__(self, file, header, old_start, old_count, new_start, new_count, position, keep_text=True):
+        self.file = file
+        self.header = header
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.position = position
+        self.kinds = array('b')
+        self.lines = [] if keep_text else None
+    
+    # 헤더를 포함한 청크 원문
+    def text(self):
+        return "\n".join([self.header] + (self.lines or []))
+    
+    # 청크 본문 각 라인의 (diff position, 종류, 이전 파일 라인 번호, 새 파일 라인 번호)
+    def iter_lines(self):
+        old_line = self.old_start
+        new_line = self.new_start
+        for offset, kind in enumerate(self.kinds, 1):
+            if kind == LINE_ADDED:
+                yield self.position + offset, kind, None, new_line
+                new_line += 1
+            elif kind == LINE_DELETED:
+                yield self.position + offset, kind, old_line, None
+                old_line += 1
+            elif kind == LINE_CONTEXT:
+                yield self.position + offset, kind, old_line, new_line
+                old_line += 1
+                new_line += 1
+            else:
+                yield self.position + offset, kind, None, None
+
+# diff 입력을 한 줄씩 읽기 - 문자열, 파일 객체, HTTP 스트리밍 응답(requests.Response) 모두 지원
+# 응답은 청크 단위로 디코딩하여 전체 본문을 메모리에 올리지 않음 (iter_lines는 \r에서도 줄을 나누므로 사용하지 않음)
+def iter_diff_lines(source, chunk_size=64 * 1024):
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    
+    if hasattr(source, 'iter_content'):
+        decoder = codecs.getincrementaldecoder(source.encoding or 'utf-8')(errors='replace')
+        pending = ''
+        for chunk in source.iter_content(chunk_size=chunk_size):
+            current_tracer().add(bytes_received=len(chunk))
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            yield from lines
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+        return
+    
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        yield line.rstrip('\n')
+
+# diff를 한 번만 훑으면서 청크 레코드를 순서대로 생성
+# 청크 헤더의 줄 수를 기준으로 청크 끝을 판단하므로 "---"로 시작하는 삭제 라인도 헤더로 오인하지 않음
+# file_headers가 주어지면 파일별 헤더 라인(diff --git, index, ---, +++, rename, Binary 등)을 채움
+def iter_diff_hunks(source, keep_text=True, file_headers=None):
+    current_file = None
+    file_has_hunk = False
+    hunk = None
+    position = 0
+    old_left = new_left = 0
+    
+    for line in iter_diff_lines(source):
+        if hunk is not None:
+            tag = line[:1]
+            if old_left > 0 or new_left > 0 or tag == '\\':
+                if tag == '+':
+                    kind = LINE_ADDED
+                    new_left -= 1
+                elif tag == '-':
+                    kind = LINE_DELETED
+                    old_left -= 1
+                elif tag == '\\':
+                    kind = LINE_META
+                else:
+                    kind = LINE_CONTEXT
+                    old_left -= 1
+                    new_left -= 1
+                position += 1
+                hunk.kinds.append(kind)
+                if keep_text:
+                    hunk.lines.append(line)
+                continue
+            yield hunk
+            hunk = None
+        
+        if line.startswith('diff --git'):
+            match = DIFF_FILE_HEADER_RE.match(line)
+            current_file = match.group(2) if match else None
+            file_has_hunk = False
+            position = 0
+            if file_headers is not None and current_file:
+                file_headers[current_file] = [line]
+            continue
+        
+        if current_file is None:
+            continue
+        
+        match = HUNK_HEADER_RE.match(line) if line.startswith('@@') else None
+        if match:
+            # 두 번째 청크부터는 헤더 라인도 position에 포함됨
+            if file_has_hunk:
+                position += 1
+            file_has_hunk = True
+            old_left = int(match.group(2)) if match.group(2) is not None else 1
+            new_left = int(match.group(4)) if match.group(4) is not None else 1
+            hunk = DiffHunk(current_file, line, int(match.group(1)), old_left,
+                            int(match.group(3)), new_left, position, keep_text)
+            continue
+        
+        if file_headers is not None:
+            file_headers[current_file].append(line)
+    
+    if hunk is not None:
+        yield hunk
+
+# 파일별 새 파일 라인 번호 <-> diff position 양방향 인덱스
+# 코멘트 가능한 라인(추가/컨텍스트)만 포함하며, 두 배열 모두 정렬되어 있어 이진 탐색으로 조회 (O(log n))
+class PositionIndex:
+    __slots__ = ('lines', 'positions')
+    
+    def __init__(self, hunks):
+        pairs = sorted(
+            (new_line, position)
+            for hunk in hunks
+            for position, kind, _, new_line in hunk.iter_lines()
+            if kind in (LINE_ADDED, LINE_CONTEXT)
+        )
+        self.lines = array('l', (line for line, _ in pairs))
+        self.positions = array('l', (position for _, position in pairs))
+    
+    def __len__(self):
+        return len(self.lines)
+    
+    # 새 파일 라인 번호의 diff position (diff에 없으면 None)
+    def position_for_line(self, line):
+        i = bisect.bisect_left(self.lines, line)
+        if i < len(self.lines) and self.lines[i] == line:
+            return self.positions[i]
         return None
+    
+    # diff position의 새 파일 라인 번호 (삭제 라인 등 코멘트할 수 없는 위치면 None)
+    def line_for_position(self, position):
+        i = bisect.bisect_left(self.positions, position)
+        if i < len(self.positions) and self.positions[i] == position:
+            return self.lines[i]
+        return None
+    
+    # 가장 가까운 코멘트 가능 라인으로 보정 - (position, 라인 번호) 또는 max_distance 초과 시 (None, None)
+    def nearest_position(self, line, max_distance=None):
+        if not self.lines:
+            return None, None
+        i = bisect.bisect_left(self.lines, line)
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(self.lines)]
+        j = min(candidates, key=lambda k: (abs(self.lines[k] - line), k))
+        if max_distance is not None and abs(self.lines[j] - line) > max_distance:
+            return None, None
+        return self.positions[j], self.lines[j]
+
+# 파싱된 diff로 파일별 position 인덱스 구성
+def build_position_index(file_changes):
+    return {
+        file_path: PositionIndex(changes['hunks'])
+        for file_path, changes in file_changes.items()
+        if changes['hunks']
+    }
+
+# 모델이 응답한 파일 경로를 diff의 파일 경로로 보정 (./ 접두어, 백틱, 경로 일부만 적은 경우 등)
+def resolve_diff_path(file_path, position_index):
+    if not file_path:
+        return None
+    path = file_path.strip().strip('`\'"[]*')
+    while path.startswith('./'):
+        path = path[2:]
+    path = path.lstrip('/')
+    if path in position_index:
+        return path
+    matches = [candidate for candidate in position_index
+               if candidate.endswith('/' + path) or path.endswith('/' + candidate)]
+    return matches[0] if len(matches) == 1 else None
 
-# diff 파싱하여 파일별 변경 라인 정보 추출
-def parse_diff(diff_text):
-    if not diff_text:
+# 이슈의 인라인 코멘트 위치 계산 - diff 경로, position, 보정된 라인 번호를 이슈에 기록
+# (위치를 찾지 못하면 position은 None)
+def place_issue(issue, position_index):
+    issue['path'], issue['position'], issue['position_line'] = None, None, None
+    if not issue.get('file') or not issue.get('line') or position_index is None:
+        return issue
+    file_path = resolve_diff_path(issue['file'], position_index)
+    if file_path:
+        position, line = position_index[file_path].nearest_position(issue['line'], POSITION_SNAP_DISTANCE)
+        if position is not None:
+            issue['path'], issue['position'], issue['position_line'] = file_path, position, line
+    return issue
+
+# diff 파싱하여 파일별 헤더와 청크 레코드 추출
+# 반환값: {파일 경로: {'header': [헤더 라인], 'hunks': [DiffHunk]}} (청크가 없는 바이너리/이름 변경 파일도 포함)
+def parse_diff(source, keep_text=True):
+    if not source:
         return {}
     
-    file_changes = {}
-    current_file = None
-    file_diff_lines = []
+    file_headers = {}
+    hunks_by_file = {}
+    for hunk in iter_diff_hunks(source, keep_text, file_headers):
+        hunks_by_file.setdefault(hunk.file, []).append(hunk)
     
-    # diff 텍스트를 줄 단위로 분석
-    lines = diff_text.split('\n')
-    for i, line in enumerate(lines):
-        # 새 파일 시작 감지
-        if line.startswith('diff --git'):
-            # 이전 파일 정보 저장
-            if current_file and file_diff_lines:
-                file_changes[current_file] = analyze_file_diff(file_diff_lines)
+    return {
+        file_path: {'header': header, 'hunks': hunks_by_file.get(file_path, [])}
+        for file_path, header in file_headers.items()
+    }
+
+# 캐시 키 생성 (입력 문자열들을 이어 붙인 SHA-256)
+def cache_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def cache_path(namespace, key):
+    return os.path.join(CACHE_DIR, namespace, key[:2], f"{key}.json")
+
+# 캐시 조회 - 만료된 항목은 삭제하고, 적중한 항목은 수정 시각을 갱신하여 LRU 순서 유지
+def cache_get(namespace, key):
+    if not CACHE_ENABLED:
+        return None
+    
+    path = cache_path(namespace, key)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL_SECONDS:
+            os.remove(path)
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            value = json.load(file)
+        os.utime(path)
+        return value
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_debug(f"Cache read failed for {namespace}/{key}: {str(e)}")
+        return None
+
+# 캐시 저장 - 임시 파일에 쓴 뒤 교체하여 동시 실행 중에도 깨진 파일이 남지 않도록 함
+def cache_put(namespace, key, value):
+    if not CACHE_ENABLED:
+        return
+    
+    path = cache_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(value, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        log_debug(f"Cache write failed for {namespace}/{key}: {str(e)}")
+
+# 만료된 캐시 항목 삭제 후, 최대 항목 수를 넘으면 가장 오래 사용되지 않은 항목부터 삭제
+def evict_cache():
+    if not CACHE_ENABLED or not os.path.isdir(CACHE_DIR):
+        return 0
+    
+    now = time.time()
+    entries = []
+    removed = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        # 캐시 디렉터리 바로 아래의 파일(심볼 인덱스, 작업 큐 등 SQLite)은 항목 단위 캐시가 아니므로 제외
+        if os.path.normpath(root) == os.path.normpath(CACHE_DIR):
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                mtime = os.path.getmtime(path)
+                if now - mtime > CACHE_TTL_SECONDS or name.endswith('.tmp'):
+                    os.remove(path)
+                    removed += 1
+                else:
+                    entries.append((mtime, path))
+            except OSError:
+                continue
+    
+    if len(entries) > CACHE_MAX_ENTRIES:
+        entries.sort()
+        for _, path in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+    
+    log_info(f"Evicted {removed} cache entries")
+    return removed
+
+# 청크(hunk) 캐시 키 - 줄 번호가 바뀌어도 내용이 같으면 같은 키가 되도록 @@ 헤더의 위치 정보와 줄 끝 공백 제거
+def hunk_cache_key(file_path, hunk):
+    header = HUNK_HEADER_RE.sub('@@', hunk.header)
+    body = [line.rstrip() for line in hunk.lines]
+    while body and not body[-1]:
+        body.pop()
+    return cache_key(review_prompt_template(), review_routing_signature(), file_path, header, "\n".join(body))
+
+# 청크 리뷰 결과를 결정하는 모델 설정 (라우팅을 사용하면 평가 모델과 기준 점수도 포함)
+def review_routing_signature():
+    if not MODEL_ROUTING:
+        return REVIEW_MODEL
+    return "|".join([FAST_MODEL, REVIEW_MODEL, str(ESCALATION_THRESHOLD), str(TRIAGE_SKIP_THRESHOLD), TRIAGE_PROMPT_TEMPLATE])
+
+# 현재 응답 형식에 맞는 리뷰 프롬프트 템플릿
+def review_prompt_template():
+    return REVIEW_JSON_PROMPT_TEMPLATE if REVIEW_OUTPUT_MODE == 'json' else REVIEW_PROMPT_TEMPLATE
+
+# OpenAI 클라이언트 (API 키별로 하나를 만들어 연결 풀을 재사용)
+# SDK는 불러오는 데 시간이 걸리므로 실제로 LLM을 호출할 때 처음 불러옴 (parse-only/cleanup-only 모드에서는 불러오지 않음)
+openai_clients = {}
+openai_clients_lock = threading.Lock()
+
+def get_openai_client():
+    from openai import OpenAI
+    api_key = current_run().config.openai_api_key
+    with openai_clients_lock:
+        client = openai_clients.get(api_key)
+        if client is None:
+            client = openai_clients[api_key] = OpenAI(api_key=api_key)
+        return client
+
+# LLM 요청 - 현재 단계 마감까지 남은 시간으로 timeout을 줄이고, 마감이 지났으면 요청하지 않음
+# 남은 시간이 요청별 최대 대기 시간보다 짧으면 SDK 재시도가 마감을 넘기지 않도록 재시도하지 않음
+def create_chat_completion(**kwargs):
+    deadline = current_deadline()
+    remaining = deadline.remaining()
+    if remaining is not None and remaining < 1:
+        record_budget_skip()
+        raise TimeBudgetExceeded("Time budget exhausted before the LLM request")
+    
+    timeout = LLM_REQUEST_TIMEOUT if remaining is None else min(LLM_REQUEST_TIMEOUT, remaining)
+    client = get_openai_client()
+    if timeout < LLM_REQUEST_TIMEOUT:
+        client = client.with_options(max_retries=0)
+    try:
+        return client.chat.completions.create(timeout=timeout, **kwargs)
+    except Exception as e:
+        if deadline.expired():
+            record_budget_skip()
+            raise TimeBudgetExceeded(f"LLM request stopped at the time budget: {str(e)}") from e
+        raise
+
+# OpenAI 리뷰 요청 - (응답 텍스트, 최대 토큰 수에 걸려 응답이 잘렸는지 여부) 반환
+# on_issue가 주어지면 응답을 스트리밍으로 받으며, 이슈 항목이 완성될 때마다 on_issue(issue)를 호출
+# tier는 사용할 모델 등급 (MODEL_TIERS의 fast/large)
+def get_code_review(diff, on_issue=None, tier='large'):
+    log_info(f"Requesting code review from OpenAI API ({MODEL_TIERS[tier]})")
+    
+    # 상세한 프롬프트로 변경
+    prompt = review_prompt_template().format(diff=diff)
+    
+    # 구조화 출력 모드에서는 JSON 스키마를 지정하여 응답 형식을 고정
+    options = {}
+    if REVIEW_OUTPUT_MODE == 'json':
+        options['response_format'] = {'type': 'json_schema', 'json_schema': REVIEW_RESPONSE_SCHEMA}
+    if on_issue is not None:
+        # 스트리밍 응답의 마지막 청크로 토큰 사용량을 받음
+        options['stream_options'] = {'include_usage': True}
+    
+    # OpenAI API에 리뷰 요청
+    start = time.time()
+    deadline = current_deadline()
+    response = create_chat_completion(
+        model=MODEL_TIERS[tier],
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=REVIEW_MAX_TOKENS,
+        stream=on_issue is not None,
+        **options
+    )
+    
+    if on_issue is None:
+        review_comment = response.choices[0].message.content or ""
+        finish_reason = response.choices[0].finish_reason
+        usage = response.usage
+    else:
+        parser = IncrementalJsonIssueParser(on_issue) if REVIEW_OUTPUT_MODE == 'json' else IncrementalIssueParser(on_issue)
+        usage = None
+        finish_reason = None
+        try:
+            for chunk in response:
+                # 마감이 지나면 스트림을 닫고 지금까지 완성된 이슈만 남김
+                if deadline.expired():
+                    raise TimeBudgetExceeded("Review stream stopped at the time budget")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parser.feed(chunk.choices[0].delta.content)
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+        except TimeBudgetExceeded:
+            response.close()
+            record_budget_skip()
+            raise
+        except Exception as e:
+            response.close()
+            # 다음 청크를 기다리다 마감 시각의 timeout으로 끊긴 경우도 시간 예산 초과로 처리
+            if deadline.expired():
+                record_budget_skip()
+                raise TimeBudgetExceeded(f"Review stream stopped at the time budget: {str(e)}") from e
+            raise
+        review_comment = parser.close()
+    record_token_usage('review', estimate_tokens(prompt), usage, tier, time.time() - start)
+    log_debug(lambda: f"OpenAI response:\n{review_comment}")
+    
+    truncated = finish_reason == 'length'
+    if truncated:
+        log_info(f"Review response hit the {REVIEW_MAX_TOKENS} token limit and was truncated")
+    return review_comment, truncated
+
+# 로컬 토큰 수 추정 - BPE 토크나이저와 비슷하게 앞 공백을 포함한 영단어(7자 단위), 숫자(3자 단위),
+# 기호 1~2자, 공백 묶음을 각각 1토큰으로, 한글 등 비ASCII 문자는 글자당 1토큰으로 계산 (API 호출 없이 예산 계산용)
+TOKEN_ESTIMATE_RE = re.compile(r' ?[A-Za-z]{1,7}| ?\d{1,3}| ?[!-/:-@\[-`{-~]{1,2}|[^\x00-\x7f]|\s+')
+
+def estimate_tokens(text):
+    if not text:
+        return 1
+    return sum(1 for _ in TOKEN_ESTIMATE_RE.finditer(text)) + 1
+
+# 요청별 토큰 사용량 집계 (단계별 요청 수, 추정/실제 프롬프트 토큰, 응답 토큰)
+# 모델 등급(tier)별로도 요청 수, 응답 대기 시간, 토큰 사용량을 따로 집계
+token_usage_lock = threading.Lock()
+
+def record_token_usage(stage, estimated_prompt_tokens, usage=None, tier='large', seconds=None):
+    prompt_tokens = getattr(usage, 'prompt_tokens', None) if usage is not None else None
+    completion_tokens = getattr(usage, 'completion_tokens', None) if usage is not None else None
+    with token_usage_lock:
+        stats = current_run().token_usage.setdefault(stage, {
+            'requests': 0, 'estimated_prompt_tokens': 0, 'prompt_tokens': 0, 'completion_tokens': 0
+        })
+        stats['requests'] += 1
+        stats['estimated_prompt_tokens'] += estimated_prompt_tokens
+        stats['prompt_tokens'] += prompt_tokens or 0
+        stats['completion_tokens'] += completion_tokens or 0
+        tier_stats = current_run().model_usage.setdefault(tier, {
+            'model': MODEL_TIERS[tier], 'requests': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+            'prompt_tokens': 0, 'completion_tokens': 0
+        })
+        tier_stats['requests'] += 1
+        tier_stats['seconds'] = round(tier_stats['seconds'] + (seconds or 0), 3)
+        tier_stats['max_seconds'] = round(max(tier_stats['max_seconds'], seconds or 0), 3)
+        tier_stats['prompt_tokens'] += prompt_tokens if prompt_tokens is not None else estimated_prompt_tokens
+        tier_stats['completion_tokens'] += completion_tokens or 0
+    current_tracer().add(llm_calls=1, prompt_tokens=prompt_tokens if prompt_tokens is not None else estimated_prompt_tokens,
+               completion_tokens=completion_tokens or 0)
+    log_info(f"[{stage}] prompt ~{estimated_prompt_tokens} tokens (actual: {prompt_tokens if prompt_tokens is not None else 'n/a'}), "
+             f"completion: {completion_tokens if completion_tokens is not None else 'n/a'}")
+
+def log_token_usage_summary():
+    with token_usage_lock:
+        for stage, stats in current_run().token_usage.items():
+            log_info(f"Token usage [{stage}]: {stats['requests']} requests, prompt {stats['prompt_tokens']} "
+                     f"(estimated {stats['estimated_prompt_tokens']}), completion {stats['completion_tokens']}")
+        for tier, stats in current_run().model_usage.items():
+            log_info(f"Model tier [{tier}] {stats['model']}: {stats['requests']} requests, {stats['seconds']:.2f}s total "
+                     f"(max {stats['max_seconds']:.2f}s), prompt {stats['prompt_tokens']}, completion {stats['completion_tokens']}")
+
+# 파일 단위로 리뷰에서 제외할 사유 (잠금 파일, 벤더링, 생성 코드, 바이너리, 이름만 변경) - 해당 없으면 None
+def classify_skipped_file(file_path, changes):
+    header = changes.get('header', [])
+    hunks = changes.get('hunks', [])
+    if any(line.startswith('Binary files') or line.startswith('GIT binary patch') for line in header):
+        return 'binary'
+    if not hunks:
+        return 'rename-only' if any(line.startswith('rename from') for line in header) else None
+    if os.path.basename(file_path) in LOCKFILE_NAMES:
+        return 'lockfile'
+    if VENDORED_PATH_RE.search(file_path):
+        return 'vendored'
+    if GENERATED_PATH_RE.search(file_path):
+        return 'generated'
+    first = hunks[0]
+    if first.lines and first.new_start <= 1 and any(GENERATED_MARKER_RE.search(line) for line in first.lines[:10]):
+        return 'generated'
+    return None
+
+# 공백만 바뀐 청크인지 확인 - 줄 끝 공백과 빈 줄 변경만 무시하고 삭제/추가 라인을 비교
+# 들여쓰기와 줄 안의 공백(문자열 리터럴 등)은 의미가 있을 수 있으므로 그대로 비교
+# (Python의 의미 없는 재포맷은 ast 기반 사전 검사에서 따로 제외)
+def is_whitespace_only_hunk(hunk):
+    if not hunk.lines:
+        return False
+    removed, added = [], []
+    for kind, line in zip(hunk.kinds, hunk.lines):
+        if kind not in (LINE_DELETED, LINE_ADDED):
+            continue
+        text = line[1:].rstrip()
+        if text:
+            (removed if kind == LINE_DELETED else added).append(text)
+    changed = any(kind in (LINE_DELETED, LINE_ADDED) for kind in hunk.kinds)
+    return changed and removed == added
+
+# 리뷰 가치가 낮은 파일/청크를 제외 - (남은 변경 사항, [(파일, 사유)]) 반환
+def filter_low_value_changes(file_changes):
+    filtered, skipped = {}, []
+    for file_path, changes in file_changes.items():
+        reason = classify_skipped_file(file_path, changes)
+        if reason:
+            skipped.append((file_path, reason))
+            continue
+        hunks = [hunk for hunk in changes.get('hunks', []) if not is_whitespace_only_hunk(hunk)]
+        if len(hunks) < len(changes.get('hunks', [])):
+            skipped.append((file_path, f"whitespace-only ({len(changes['hunks']) - len(hunks)} hunks)"))
+        if hunks:
+            filtered[file_path] = dict(changes, hunks=hunks)
+    return filtered, skipped
+
+# 청크를 거꾸로 적용하여 base 파일 라인 복원 (head 내용이 청크의 추가/컨텍스트 라인과 다르면 None)
+def reconstruct_base_lines(head_lines, hunks):
+    base = []
+    cursor = 0
+    for hunk in hunks:
+        # 추가 라인이 없는 청크(+N,0)는 N번째 라인 뒤를 가리킴
+        start = hunk.new_start - 1 if hunk.new_count else hunk.new_start
+        base.extend(head_lines[i] for i in range(cursor, start))
+        head_index = start
+        for kind, line in zip(hunk.kinds, hunk.lines):
+            if kind in (LINE_CONTEXT, LINE_ADDED):
+                if head_index >= len(head_lines) or head_lines[head_index] != line[1:].rstrip('\r'):
+                    return None
+                head_index += 1
+            if kind in (LINE_CONTEXT, LINE_DELETED):
+                base.append(line[1:].rstrip('\r'))
+        cursor = head_index
+    base.extend(head_lines[i] for i in range(cursor, len(head_lines)))
+    return base
+
+# 아무 동작도 하지 않는 문자열 문장 (독스트링 등)
+def is_noop_string(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+# 파싱된 Python 소스 - 라인별로 그 라인을 포함하는 가장 안쪽 문장(statement)
+class ParsedSource:
+    def __init__(self, lines):
+        self.lines = lines
+        self.tree = ast.parse("\n".join(lines))
+        self.owners = [None] * (len(lines) + 2)
+        # ast.walk는 바깥 노드를 먼저 방문하므로 안쪽 문장이 나중에 덮어씀
+        # 데코레이터가 있는 함수/클래스는 lineno가 def/class 라인이므로 첫 데코레이터부터 소유
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.stmt):
+                start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+                for line in range(start, min(node.end_lineno, len(lines)) + 1):
+                    self.owners[line] = node
+        # 독스트링 등 문자열만 있는 문장은 본문에서 빼서, 감싸는 문장(함수/클래스)의 덤프에도 영향이 없게 함
+        for node in ast.walk(self.tree):
+            for field in ('body', 'orelse', 'finalbody'):
+                body = getattr(node, field, None)
+                if isinstance(body, list) and any(is_noop_string(child) for child in body):
+                    setattr(node, field, [child for child in body if not is_noop_string(child)])
+        self.dumps = {}
+    
+    def dump(self, node):
+        key = id(node)
+        if key not in self.dumps:
+            # 위치 속성을 빼고 덤프하므로 줄바꿈/공백만 다른 문장은 같은 값
+            self.dumps[key] = ast.dump(node)
+        return self.dumps[key]
+    
+    # 라인 범위에 걸친 문장 - (순서 있는 문장 목록, 정렬된 import 목록)
+    # 빈 줄, 주석, 아무 동작도 하지 않는 문자열 문장(독스트링)은 제외
+    # 어느 문장에도 속하지 않는 코드 라인이 있으면 비교할 수 없으므로 None (의미 있는 변경으로 취급)
+    def statements(self, start, count):
+        seen = set()
+        ordered, imports = [], []
+        for line in range(start, start + count):
+            if line < 1 or line > len(self.lines):
+                continue
+            text = self.lines[line - 1].strip()
+            if not text or text.startswith('#'):
+                continue
+            node = self.owners[line]
+            if node is None:
+                return None
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if is_noop_string(node):
+                continue
+            (imports if isinstance(node, (ast.Import, ast.ImportFrom)) else ordered).append(self.dump(node))
+        return ordered, sorted(imports)
+
+# 셸을 거치는 명령 실행 함수
+SHELL_CALLS = {('os', 'system'), ('os', 'popen')}
+SUBPROCESS_CALLS = {'run', 'call', 'check_call', 'check_output', 'Popen', 'getoutput', 'getstatusoutput'}
+
+def static_issue(file_path, line, issue_type, description, recommendation):
+    return {
+        'type': issue_type,
+        'description': description,
+        'recommendation': recommendation,
+        'file': file_path,
+        'line': line,
+        'source': 'prescreen'
+    }
+
+# 추가된 라인의 명백한 위험 코드 탐지 (모델 호출 없이 바로 보고)
+def find_static_hazards(file_path, tree, added_lines):
+    issues = []
+    for node in ast.walk(tree):
+        if getattr(node, 'lineno', None) not in added_lines:
+            continue
+        if isinstance(node, ast.ExceptHandler) and node.type is None:
+            issues.append(static_issue(
+                file_path, node.lineno, '품질',
+                "`except:`는 KeyboardInterrupt, SystemExit까지 모든 예외를 잡아 실제 오류를 숨깁니다.",
+                "처리할 예외 유형을 명시하세요 (최소한 `except Exception:`)."
+            ))
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        if isinstance(func, ast.Name) and func.id in ('eval', 'exec'):
+            issues.append(static_issue(
+                file_path, node.lineno, '보안',
+                f"`{func.id}()`는 전달된 문자열을 코드로 실행하므로, 외부 입력이 섞이면 임의 코드 실행 취약점이 됩니다.",
+                "리터럴 파싱에는 `ast.literal_eval()`을, 그 외에는 명시적인 분기나 함수 매핑으로 대체하세요."
+            ))
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            shell = (func.value.id, func.attr) in SHELL_CALLS or (
+                func.value.id == 'subprocess' and func.attr in SUBPROCESS_CALLS and (
+                    func.attr in ('getoutput', 'getstatusoutput') or any(
+                        kw.arg == 'shell' and isinstance(kw.value, ast.Constant) and kw.value.value is True
+                        for kw in node.keywords
+                    )
+                )
+            )
+            if shell:
+                issues.append(static_issue(
+                    file_path, node.lineno, '보안',
+                    f"`{func.value.id}.{func.attr}()`는 셸을 통해 명령을 실행하므로, 인자에 외부 입력이 섞이면 명령 주입이 가능합니다.",
+                    "`shell=True` 없이 인자 리스트로 `subprocess.run()`을 호출하세요."
+                ))
+    return issues
+
+# Python 파일의 청크 사전 검사 - (모델 리뷰가 필요한 변경 사항, 위험 코드 이슈, [(파일, 사유)]) 반환
+# head 파일을 읽을 수 없거나 파싱할 수 없으면 해당 파일은 그대로 모델 리뷰로 보냄
+def prescreen_changes(file_changes):
+    remaining, static_issues, skipped = {}, [], []
+    stats = current_run().prescreen_stats
+    for file_path, changes in file_changes.items():
+        hunks = changes.get('hunks', [])
+        head_lines = get_file_lines(file_path) if file_path.endswith('.py') and hunks and hunks[0].lines is not None else None
+        base_lines = reconstruct_base_lines(head_lines, hunks) if head_lines is not None else None
+        try:
+            head = ParsedSource(list(head_lines)) if base_lines is not None else None
+            base = ParsedSource(base_lines) if head is not None else None
+        except (SyntaxError, ValueError, RecursionError):
+            head = base = None
+        if head is None:
+            remaining[file_path] = changes
+            continue
+        
+        stats['files'] += 1
+        added_lines = {new_line for hunk in hunks for _, kind, _, new_line in hunk.iter_lines() if kind == LINE_ADDED}
+        hazards = find_static_hazards(file_path, head.tree, added_lines)
+        static_issues.extend(hazards)
+        stats['static_issues'] += len(hazards)
+        
+        substantive = []
+        for hunk in hunks:
+            before = base.statements(hunk.old_start, hunk.old_count)
+            after = head.statements(hunk.new_start, hunk.new_count)
+            if before is None or after is None or before != after:
+                substantive.append(hunk)
+        if len(substantive) < len(hunks):
+            stats['trivial_hunks'] += len(hunks) - len(substantive)
+            skipped.append((file_path, f"no semantic change ({len(hunks) - len(substantive)} hunks)"))
+        if substantive:
+            remaining[file_path] = dict(changes, hunks=substantive)
+    
+    if stats['files']:
+        log_info(f"Pre-screened {stats['files']} Python files: {stats['trivial_hunks']} trivial hunks, {stats['static_issues']} static issues")
+    return remaining, static_issues, skipped
+
+# 청크의 리뷰 가치 점수 - 변경 라인 수 기준 (삭제는 절반), 문서/테스트 파일은 절반
+def hunk_value(file_path, hunk):
+    added = sum(1 for kind in hunk.kinds if kind == LINE_ADDED)
+    deleted = sum(1 for kind in hunk.kinds if kind == LINE_DELETED)
+    weight = 0.5 if LOW_VALUE_PATH_RE.search(file_path) else 1.0
+    return (added + deleted * 0.5) * weight
+
+# 가치가 높은 청크부터 전체 토큰 예산에 채워 넣음 (원래 파일/청크 순서는 유지) - (선택된 변경 사항, [(파일, 사유)]) 반환
+def pack_review_hunks(file_changes, token_budget=REVIEW_TOKEN_BUDGET):
+    if not token_budget:
+        return file_changes, []
+    
+    candidates = []
+    for file_path, changes in file_changes.items():
+        header_tokens = estimate_tokens("\n".join(changes.get('header', [])))
+        for hunk in changes.get('hunks', []):
+            tokens = min(estimate_tokens(hunk.text()), REVIEW_CHUNK_TOKENS) + header_tokens
+            candidates.append((hunk_value(file_path, hunk), tokens, file_path, hunk))
+    
+    total = sum(tokens for _, tokens, _, _ in candidates)
+    if total <= token_budget:
+        return file_changes, []
+    
+    selected, used = set(), 0
+    for value, tokens, file_path, hunk in sorted(candidates, key=lambda c: -c[0]):
+        if used + tokens <= token_budget:
+            selected.add(id(hunk))
+            used += tokens
+    log_info(f"Packed {len(selected)} of {len(candidates)} hunks into token budget ({used}/{token_budget}, total ~{total})")
+    
+    packed, skipped = {}, []
+    for file_path, changes in file_changes.items():
+        hunks = [hunk for hunk in changes.get('hunks', []) if id(hunk) in selected]
+        if len(hunks) < len(changes.get('hunks', [])):
+            skipped.append((file_path, f"token budget ({len(changes['hunks']) - len(hunks)} hunks)"))
+        if hunks:
+            packed[file_path] = dict(changes, hunks=hunks)
+    return packed, skipped
+
+# 청크 원문을 토큰 예산 이내로 자르기 (예산을 넘는 거대한 청크는 앞부분만 보내고 생략된 줄 수 표시)
+def hunk_prompt_text(hunk, token_budget):
+    text = hunk.text()
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return text, tokens
+    
+    kept, used = [hunk.header], estimate_tokens(hunk.header)
+    lines = hunk.lines or []
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        if used + line_tokens > token_budget:
+            break
+        kept.append(line)
+        used += line_tokens
+    kept.append(f"... ({len(lines) - len(kept) + 1}줄 생략)")
+    return "\n".join(kept), used + 10
+
+# 파일/청크 단위로 diff를 나누어 토큰 예산 이내의 리뷰 청크 구성
+def build_review_chunks(file_changes, token_budget=REVIEW_CHUNK_TOKENS):
+    chunks = []
+    current = {'files': [], 'hunks': [], 'parts': [], 'tokens': 0}
+    
+    def flush():
+        if current['parts']:
+            chunks.append({
+                'files': list(current['files']),
+                'hunks': list(current['hunks']),  # [(file_path, hunk)]
+                'text': "\n".join(current['parts']),
+                'tokens': current['tokens']
+            })
+        current['files'], current['hunks'], current['parts'], current['tokens'] = [], [], [], 0
+    
+    def add_part(file_path, header, hunks, texts, tokens):
+        if current['parts'] and current['tokens'] + tokens > token_budget:
+            flush()
+        if file_path not in current['files']:
+            current['files'].append(file_path)
+        current['hunks'].extend((file_path, hunk) for hunk in hunks)
+        current['parts'].append("\n".join([header] + texts))
+        current['tokens'] += tokens
+    
+    for file_path, changes in file_changes.items():
+        hunks = changes.get('hunks', [])
+        if not hunks:
+            continue
+        
+        header = "\n".join(changes.get('header', []))
+        header_tokens = estimate_tokens(header)
+        hunk_texts = [hunk_prompt_text(hunk, max(100, token_budget - header_tokens)) for hunk in hunks]
+        file_tokens = header_tokens + sum(tokens for _, tokens in hunk_texts)
+        if file_tokens <= token_budget:
+            add_part(file_path, header, hunks, [text for text, _ in hunk_texts], file_tokens)
+            continue
+        
+        # 한 파일이 예산을 넘으면 청크(hunk) 단위로 분할하고, 각 조각에 파일 헤더를 반복
+        flush()
+        group, texts, group_tokens = [], [], header_tokens
+        for hunk, (text, tokens) in zip(hunks, hunk_texts):
+            if group and group_tokens + tokens > token_budget:
+                add_part(file_path, header, group, texts, group_tokens)
+                flush()
+                group, texts, group_tokens = [], [], header_tokens
+            group.append(hunk)
+            texts.append(text)
+            group_tokens += tokens
+        if group:
+            add_part(file_path, header, group, texts, group_tokens)
+            flush()
+    
+    flush()
+    return chunks
+
+# 이슈 유형 문자열을 우선순위 인덱스로 변환
+def issue_priority(issue):
+    issue_type = (issue.get('type') or '').lower()
+    aliases = {'security': '보안', 'logical': '논리', 'logic': '논리', 'performance': '성능', 'quality': '품질'}
+    for alias, name in aliases.items():
+        issue_type = issue_type.replace(alias, name)
+    for rank, name in enumerate(ISSUE_TYPE_PRIORITY):
+        if name in issue_type:
+            return rank
+    return len(ISSUE_TYPE_PRIORITY)
+
+# 청크별 리뷰 결과를 합쳐 중복 제거 후 중요도 순으로 정렬 (reduce 단계)
+def merge_review_issues(issue_lists, limit=MAX_REVIEW_ISSUES):
+    merged = []
+    seen = set()
+    for issues in issue_lists:
+        for issue in issues or []:
+            key = (issue.get('file'), issue.get('line'), issue_priority(issue))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(issue)
+    
+    # 정렬은 안정 정렬이므로 같은 우선순위 안에서는 청크(파일) 순서가 유지됨
+    merged.sort(key=issue_priority)
+    if len(merged) > limit:
+        log_info(f"Keeping top {limit} of {len(merged)} merged issues")
+    return merged[:limit]
+
+# 이슈를 해당 라인이 포함된 청크(hunk)에 할당 (없으면 같은 파일에서 가장 가까운 청크)
+def find_issue_hunk(issue, file_changes):
+    hunks = file_changes.get(issue.get('file'), {}).get('hunks', [])
+    if not hunks:
+        return None
+    line = issue.get('line')
+    if line is None:
+        return hunks[0]
+    
+    def distance(hunk):
+        start = hunk.new_start
+        end = start + max(hunk.new_count - 1, 0)
+        if start <= line <= end:
+            return 0
+        return min(abs(line - start), abs(line - end))
+    
+    return min(hunks, key=distance)
+
+# 캐시된 청크 결과를 현재 청크 위치 기준의 이슈로 복원
+def restore_cached_issues(file_path, hunk, cached_issues):
+    issues = []
+    for cached in cached_issues:
+        issue = dict(cached)
+        offset = issue.pop('line_offset', None)
+        issue['file'] = file_path
+        issue['line'] = hunk.new_start + offset if offset is not None else None
+        issues.append(issue)
+    return issues
+
+# 빠른 모델로 청크(hunk)별 리뷰 필요도 점수 요청 - hunks와 같은 순서의 점수 목록 (응답에 없는 hunk는 None)
+def get_hunk_triage_scores(hunks):
+    parts = [f"[{i}] {path}\n{hunk_prompt_text(hunk, TRIAGE_HUNK_TOKENS)[0]}" for i, (path, hunk) in enumerate(hunks, 1)]
+    prompt = TRIAGE_PROMPT_TEMPLATE.format(hunks="\n\n".join(parts))
+    
+    start = time.time()
+    response = create_chat_completion(
+        model=FAST_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=50 + 20 * len(hunks),
+        response_format={'type': 'json_schema', 'json_schema': TRIAGE_RESPONSE_SCHEMA}
+    )
+    record_token_usage('triage', estimate_tokens(prompt), response.usage, 'fast', time.time() - start)
+    
+    scores = [None] * len(hunks)
+    try:
+        for item in json.loads(response.choices[0].message.content or '{}').get('scores', []):
+            if isinstance(item.get('id'), int) and 1 <= item['id'] <= len(hunks) and isinstance(item.get('score'), (int, float)):
+                scores[item['id'] - 1] = min(1.0, max(0.0, float(item['score'])))
+    except (ValueError, AttributeError) as e:
+        log_error(f"Failed to parse triage response: {str(e)}")
+    return scores
+
+# 청크(hunk)별 리뷰 필요도에 따라 리뷰 모델 등급 결정 - ({등급: file_changes}, 리뷰를 생략한 hunk [(파일, hunk)])
+# 평가 요청이 실패했거나 점수가 없는 hunk는 놓치지 않도록 큰 모델로 리뷰
+def route_review_hunks(file_changes):
+    batches = build_review_chunks(file_changes)
+    log_info(f"Scoring review-worthiness of {sum(len(batch['hunks']) for batch in batches)} hunks with {FAST_MODEL}")
+    results = run_concurrently(lambda batch: get_hunk_triage_scores(batch['hunks']), batches, REVIEW_CONCURRENCY)
+    
+    tiers = {'fast': {}, 'large': {}}
+    low_risk = []
+    for batch, scores in zip(batches, results):
+        for (file_path, hunk), score in zip(batch['hunks'], scores or [None] * len(batch['hunks'])):
+            if score is not None and score < TRIAGE_SKIP_THRESHOLD:
+                low_risk.append((file_path, hunk))
+                continue
+            tier = 'fast' if score is not None and score < ESCALATION_THRESHOLD else 'large'
+            changes = tiers[tier].setdefault(file_path, dict(file_changes[file_path], hunks=[]))
+            changes['hunks'].append(hunk)
+    
+    log_info(f"Routed hunks - large: {sum(len(c['hunks']) for c in tiers['large'].values())}, "
+             f"fast: {sum(len(c['hunks']) for c in tiers['fast'].values())}, skipped: {len(low_risk)}")
+    return tiers, low_risk
+
+# diff를 청크로 나누어 병렬 리뷰 후 결과 병합 (map-reduce)
+# 이전 실행에서 리뷰한 것과 내용이 같은 청크(hunk)는 캐시된 결과를 재사용하고, 새로 바뀐 청크만 리뷰
+# on_issue가 주어지면 스트리밍 리뷰에서 이슈가 완성되는 즉시 전달
+def review_diff_in_chunks(file_changes, on_issue=None):
+    # 잠금 파일, 생성 코드, 공백만 바뀐 청크 등은 프롬프트에서 제외
+    file_changes, skipped = filter_low_value_changes(file_changes)
+    
+    # 의미 변경이 없는 Python 청크는 제외하고, 명백한 위험 코드는 로컬 검사 결과로 바로 보고
+    static_issues = []
+    if PRESCREEN_ENABLED:
+        file_changes, static_issues, trivial_skipped = prescreen_changes(file_changes)
+        skipped.extend(trivial_skipped)
+    
+    cached_issues = [static_issues]
+    pending_changes = {}
+    hunk_keys = {}
+    low_risk_counts = {}
+    for file_path, changes in file_changes.items():
+        pending_hunks = []
+        for hunk in changes.get('hunks', []):
+            key = hunk_cache_key(file_path, hunk)
+            cached = cache_get('review', key)
+            if isinstance(cached, dict) and cached.get('skipped'):
+                # 이전 실행에서 위험도가 낮아 리뷰를 생략한 청크 - 리뷰한 것으로 보지 않고 제외 목록에 계속 표시
+                low_risk_counts[file_path] = low_risk_counts.get(file_path, 0) + 1
+            elif cached is not None:
+                cached_issues.append(restore_cached_issues(file_path, hunk, cached))
+            else:
+                hunk_keys[id(hunk)] = key
+                pending_hunks.append(hunk)
+        if pending_hunks:
+            pending_changes[file_path] = dict(changes, hunks=pending_hunks)
+    
+    total_hunks = sum(len(changes.get('hunks', [])) for changes in file_changes.values())
+    cached_hunks = total_hunks - len(hunk_keys) - sum(low_risk_counts.values())
+    if total_hunks:
+        log_info(f"Reusing cached review for {cached_hunks} of {total_hunks} hunks")
+    
+    # 남은 청크를 가치 순으로 전체 토큰 예산에 맞춰 선택
+    pending_changes, budget_skipped = pack_review_hunks(pending_changes)
+    skipped.extend(budget_skipped)
+    
+    # 빠른 모델의 리뷰 필요도 점수에 따라 청크별 리뷰 모델 결정
+    # 위험도가 낮아 생략한 청크는 다시 평가하지 않도록 생략 표시로 캐시 (이슈 없음 결과와 구분)
+    tiered_changes = {'large': pending_changes}
+    if MODEL_ROUTING and pending_changes:
+        with use_deadline(current_deadline().split(TRIAGE_BUDGET_SHARE)):
+            tiered_changes, low_risk = route_review_hunks(pending_changes)
+        for file_path, hunk in low_risk:
+            cache_put('review', hunk_keys[id(hunk)], {'skipped': 'low risk'})
+            low_risk_counts[file_path] = low_risk_counts.get(file_path, 0) + 1
+    skipped.extend((file_path, f"low risk ({count} hunks)") for file_path, count in low_risk_counts.items())
+    for file_path, reason in skipped:
+        log_info(f"Skipping {file_path} from review: {reason}")
+    skipped_note = ""
+    if skipped:
+        skipped_note = "\n\n리뷰에서 제외된 변경: " + ", ".join(f"`{path}` ({reason})" for path, reason in skipped)
+    
+    chunks = []
+    for tier, changes in tiered_changes.items():
+        for chunk in build_review_chunks(changes):
+            chunk['tier'] = tier
+            chunks.append(chunk)
+    if not chunks:
+        if cached_hunks:
+            # 모든 청크가 캐시에 있으면 리뷰 본문도 캐시된 이슈로 다시 구성 (이전 리뷰 내용 유지)
+            issues = merge_review_issues(cached_issues)
+            log_info("All reviewable hunks were reviewed before, reusing cached findings")
+            return issues, format_issues_as_text(issues) + skipped_note
+        if static_issues:
+            return merge_review_issues(cached_issues), "모델 리뷰가 필요한 변경은 없으며, 로컬 정적 검사 결과만 보고합니다." + skipped_note
+        log_info("No reviewable hunks in the diff")
+        return [], "리뷰할 코드 변경 사항이 없습니다." + skipped_note
+
+    
+    log_info(f"Reviewing {len(chunks)} diff chunks (concurrency: {REVIEW_CONCURRENCY})")
+    budget_skipped_files = []
+    incomplete_files = []
+    
+    def review_chunk(chunk):
+        log_debug(f"Reviewing chunk with {len(chunk['files'])} files (~{chunk['tokens']} tokens)")
+        streamed_issues = []
+        def handle_issue(issue):
+            streamed_issues.append(issue)
+            on_issue(issue)
+        
+        try:
+            review_comment, truncated = get_code_review(chunk['text'], handle_issue if on_issue else None, chunk['tier'])
+        except TimeBudgetExceeded as e:
+            # 시간 예산을 넘긴 청크는 캐시하지 않고, 스트리밍 중 이미 완성된 이슈만 결과로 사용
+            log_info(f"Skipping review of {len(chunk['files'])} files: {str(e)}")
+            budget_skipped_files.extend(chunk['files'])
+            return ("", streamed_issues) if streamed_issues else None
+        except Exception as e:
+            # 스트림이 중간에 끊기면 이미 완성된 이슈는 유지하고 불완전한 청크로 보고 (캐시하지 않음)
+            if not streamed_issues:
+                raise
+            log_error(f"Review stream failed for {len(chunk['files'])} files, keeping {len(streamed_issues)} completed issues: {str(e)}")
+            incomplete_files.extend(chunk['files'])
+            return format_issues_as_text(streamed_issues), streamed_issues
+        chunk_changes = {path: dict(pending_changes[path], hunks=[]) for path in chunk['files']}
+        for path, hunk in chunk['hunks']:
+            chunk_changes[path]['hunks'].append(hunk)
+        # 스트리밍 중 파싱된 이슈가 없으면 전체 응답으로 대체 파싱 시도
+        parsed_issues, decoded = parse_review_response(review_comment, chunk_changes)
+        issues = streamed_issues or parsed_issues
+        complete = decoded and not truncated
+        if not complete:
+            # 잘리거나 해석되지 않은 응답은 완성된 이슈만 사용하고, "이슈 없음"으로 보고하지 않음
+            log_info(f"Review response for {len(chunk['files'])} files is incomplete, keeping {len(issues)} completed issues")
+            incomplete_files.extend(chunk['files'])
+        if REVIEW_OUTPUT_MODE == 'json':
+            # 요약/대체 코멘트에 JSON 원문이 그대로 게시되지 않도록 읽기 쉬운 형식으로 변환
+            review_comment = format_issues_as_text(issues) if issues or complete else ""
+        
+        # 청크 내 각 hunk에 이슈를 할당하여 hunk 단위로 캐시 (이슈가 없는 hunk도 빈 결과로 저장)
+        # 응답 전체를 해석하지 못한 청크는 캐시하지 않음 - 빈 결과가 다음 실행에서 "이슈 없음"으로 재사용되지 않도록
+        if not complete:
+            return review_comment, issues
+        hunk_issues = {id(hunk): [] for _, hunk in chunk['hunks']}
+        for issue in issues:
+            hunk = find_issue_hunk(issue, chunk_changes)
+            if hunk is not None:
+                cached = {k: v for k, v in issue.items() if k not in ('file', 'line')}
+                cached['line_offset'] = issue['line'] - hunk.new_start if issue.get('line') is not None else None
+                hunk_issues[id(hunk)].append(cached)
+        for _, hunk in chunk['hunks']:
+            cache_put('review', hunk_keys[id(hunk)], hunk_issues[id(hunk)])
+        
+        return review_comment, issues
+    
+    # 실패한 청크는 건너뛰고 나머지 청크 결과만 사용
+    results = [result for result in run_concurrently(review_chunk, chunks, REVIEW_CONCURRENCY) if result]
+    if not results and not budget_skipped_files:
+        raise Exception("All chunk reviews failed")
+    
+    if incomplete_files:
+        skipped_note += "\n\n리뷰 응답이 잘리거나 해석되지 않아 일부 결과만 반영된 변경: " + ", ".join(f"`{path}`" for path in dict.fromkeys(incomplete_files))
+    if budget_skipped_files:
+        skipped_note += "\n\n시간 예산 안에 리뷰하지 못한 변경: " + ", ".join(f"`{path}`" for path in dict.fromkeys(budget_skipped_files))
+    review_comment = ("\n\n".join(comment for comment, _ in results if comment) + skipped_note).lstrip("\n")
+    issues = merge_review_issues(cached_issues + [issues for _, issues in results])
+    return issues, review_comment
+
+# 리뷰받은 이슈에 대해 더 상세한 분석 요청
+def get_detailed_issue_analysis(issue, file_content):
+    if not issue.get('file') or not issue.get('line') or not file_content or issue.get('source') == 'prescreen':
+        return issue
+    
+    # 파일 내용과 이슈 정보를 바탕으로 상세 분석 요청
+    line_num = issue.get('line', 0)
+    
+    # 해당 라인 주변 10줄 컨텍스트 추출
+    lines = as_file_lines(file_content)
+    start_line = max(0, line_num - ANALYSIS_CONTEXT_LINES)
+    end_line = min(len(lines), line_num + ANALYSIS_CONTEXT_LINES)
+    
+    context_lines = []
+    for i in range(start_line, end_line):
+        prefix = ">>> " if i + 1 == line_num else "    "
+        context_lines.append(f"{prefix}{i+1}: {lines[i]}")
+    
+    code_context = "\n".join(context_lines)
+    
+    prompt = DETAIL_PROMPT_TEMPLATE.format(
+        line_num=line_num,
+        code_context=code_context,
+        related_definitions=related_definitions_section(issue['file'], lines, [(start_line, end_line)]),
+        issue_type=issue.get('type', '일반'),
+        description=issue.get('description', '설명 없음'),
+        recommendation=issue.get('recommendation', '해결책 없음')
+    )
+    
+    # 같은 코드 컨텍스트와 이슈에 대한 분석 결과가 캐시에 있으면 재사용
+    analysis_key = cache_key(DETAIL_PROMPT_TEMPLATE, REVIEW_MODEL, prompt)
+    cached = cache_get('analysis', analysis_key)
+    if cached:
+        log_debug(f"Using cached detailed analysis for {issue['file']}:{line_num}")
+        issue.update(cached)
+        return issue
+    
+    # OpenAI API에 상세 분석 요청
+    try:
+        start = time.time()
+        response = create_chat_completion(
+            model=REVIEW_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=1000
+        )
+        detailed_analysis = response.choices[0].message.content
+        record_token_usage('analysis', estimate_tokens(prompt), response.usage, 'large', time.time() - start)
+        log_debug(lambda: f"Detailed analysis for line {line_num}:\n{detailed_analysis}")
+        
+        # 상세 분석에서 설명과 해결책 추출
+        description_match = re.search(r'1\.\s+(.*?)(?=2\.)', detailed_analysis, re.DOTALL)
+        impact_match = re.search(r'2\.\s+(.*?)(?=3\.)', detailed_analysis, re.DOTALL)
+        solution_match = re.search(r'3\.\s+(.*)', detailed_analysis, re.DOTALL)
+        
+        # 충분히 상세하게 추출된 경우에만 업데이트
+        apply_issue_analysis(
+            issue,
+            description_match.group(1) if description_match else "",
+            impact_match.group(1) if impact_match else "",
+            solution_match.group(1) if solution_match else ""
+        )
+        
+        cache_put('analysis', analysis_key, {
+            'description': issue.get('description'),
+            'recommendation': issue.get('recommendation')
+        })
             
-            # 새 파일 이름 추출 (b/ 이후 부분)
-            match = re.search(r'b/(.+)$', line)
-            if match:
-                current_file = match.group(1)
-                file_diff_lines = []
+    except Exception as e:
+        log_error(f"Error getting detailed analysis: {str(e)}")
+    
+    return issue
+
+# 이슈 라인들의 컨텍스트 구간 계산 - 겹치거나 맞닿는 구간은 하나로 병합 (0-based, 끝 미포함)
+def merge_context_windows(line_numbers, total_lines, radius=ANALYSIS_CONTEXT_LINES):
+    windows = []
+    for line_num in sorted(set(line_numbers)):
+        start, end = max(0, line_num - radius), min(total_lines, line_num + radius)
+        if start >= end:
+            continue
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return [tuple(window) for window in windows]
+
+# 병합된 컨텍스트 구간을 라인 번호와 함께 렌더링 (이슈 라인은 >>> 표시, 구간 사이는 ... 표시)
+def render_context_windows(lines, windows, marked_lines):
+    blocks = []
+    for start, end in windows:
+        blocks.append("\n".join(
+            f"{'>>> ' if i + 1 in marked_lines else '    '}{i+1}: {lines[i]}" for i in range(start, end)
+        ))
+    return "\n...\n".join(blocks)
+
+# 상세 분석 결과(문제/영향/해결)를 이슈에 반영 - 충분히 상세한 경우에만 업데이트
+def apply_issue_analysis(issue, problem, impact, solution):
+    new_description = (problem or "").strip()
+    if impact and impact.strip():
+        new_description += "\n\n영향: " + impact.strip()
+    new_recommendation = (solution or "").strip()
+    
+    if len(new_description) > 50:
+        issue['description'] = new_description
+    if len(new_recommendation) > 50:
+        issue['recommendation'] = new_recommendation
+    return issue
+
+# 같은 파일의 여러 이슈를 한 번의 요청으로 상세 분석 (응답은 이슈 id별 JSON 봉투)
+# 캐시에 있는 이슈는 요청에서 제외하고, 응답에 빠진 이슈는 원래 내용을 유지
+def get_batched_issue_analysis(issues, file_content):
+    issues = [dict(issue) for issue in issues]
+    lines = as_file_lines(file_content)
+    
+    pending = []
+    for issue in issues:
+        line_num = issue.get('line')
+        if not line_num or not lines or issue.get('source') == 'prescreen':
+            continue
         
-        # 현재 파일의 diff 라인 수집
-        if current_file:
-            file_diff_lines.append(line)
+        # 이슈별 캐시 키는 자기 컨텍스트 구간만으로 계산하여, 함께 묶인 다른 이슈와 무관하게 재사용
+        own_windows = merge_context_windows([line_num], len(lines))
+        own_context = render_context_windows(lines, own_windows, {line_num})
+        own_context += related_definitions_section(issue['file'], lines, own_windows)
+        analysis_key = cache_key(BATCH_DETAIL_PROMPT_TEMPLATE, REVIEW_MODEL, issue['file'], own_context,
+                                 issue.get('type'), issue.get('description'), issue.get('recommendation'))
+        cached = cache_get('analysis', analysis_key)
+        if cached:
+            log_debug(f"Using cached detailed analysis for {issue['file']}:{line_num}")
+            issue.update(cached)
+        else:
+            pending.append((issue, analysis_key))
     
-    # 마지막 파일 정보 저장
-    if current_file and file_diff_lines:
-        file_changes[current_file] = analyze_file_diff(file_diff_lines)
+    # 요청당 이슈 수를 제한하여 이슈별 응답 토큰을 보장 (나눈 요청은 순서대로 실행)
+    for start in range(0, len(pending), ANALYSIS_BATCH_SIZE):
+        analyze_issue_batch(pending[start:start + ANALYSIS_BATCH_SIZE], lines)
+    return issues
+
+# 한 파일의 이슈 묶음(최대 ANALYSIS_BATCH_SIZE개)을 한 번의 요청으로 분석하여 이슈에 반영
+def analyze_issue_batch(pending, lines):
+    marked_lines = {issue['line'] for issue, _ in pending}
+    windows = merge_context_windows(marked_lines, len(lines))
+    issue_list = "\n".join(
+        f"- id: {i}, 라인: {issue['line']}, 유형: {issue.get('type', '일반')}\n"
+        f"  현재 설명: {issue.get('description', '설명 없음')}\n"
+        f"  현재 해결책: {issue.get('recommendation', '해결책 없음')}"
+        for i, (issue, _) in enumerate(pending)
+    )
+    prompt = BATCH_DETAIL_PROMPT_TEMPLATE.format(
+        file=pending[0][0]['file'],
+        code_context=render_context_windows(lines, windows, marked_lines),
+        related_definitions=related_definitions_section(pending[0][0]['file'], lines, windows),
+        issue_list=issue_list
+    )
     
-    return file_changes
+    try:
+        start = time.time()
+        response = create_chat_completion(
+            model=REVIEW_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=ANALYSIS_TOKENS_PER_ISSUE * len(pending),
+            response_format={'type': 'json_schema', 'json_schema': BATCH_DETAIL_RESPONSE_SCHEMA}
+        )
+        detailed_analysis = response.choices[0].message.content
+        record_token_usage('analysis', estimate_tokens(prompt), response.usage, 'large', time.time() - start)
+        log_debug(lambda: f"Batched analysis for {pending[0][0]['file']} ({len(pending)} issues, {len(windows)} context windows):\n{detailed_analysis}")
+        analyses = json.loads(detailed_analysis).get('analyses', [])
+    except Exception as e:
+        log_error(f"Error getting batched analysis: {str(e)}")
+        return
+    
+    for analysis in analyses:
+        if not isinstance(analysis, dict) or not isinstance(analysis.get('id'), int):
+            continue
+        if not 0 <= analysis['id'] < len(pending):
+            continue
+        issue, analysis_key = pending[analysis['id']]
+        apply_issue_analysis(issue, analysis.get('problem'), analysis.get('impact'), analysis.get('solution'))
+        cache_put('analysis', analysis_key, {
+            'description': issue.get('description'),
+            'recommendation': issue.get('recommendation')
+        })
+
+# 작업 목록을 제한된 스레드 풀에서 병렬 실행 (결과는 입력 순서 유지)
+# 개별 작업이 실패하면 fallback(item)의 값으로 대체하여 나머지 작업에 영향을 주지 않음
+def run_concurrently(func, items, max_workers, fallback=None):
+    items = list(items)
+    if not items:
+        return []
+    
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(bind_context(func), item) for item in items]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                log_error(f"Concurrent task {i+1}/{len(items)} failed: {str(e)}")
+                results[i] = fallback(items[i]) if fallback else None
+    
+    return results
+
+# 이슈 하나의 상세 분석 후 인라인 코멘트 위치 계산 (원본 이슈는 변경하지 않음)
+def analyze_and_place_issue(issue, position_index):
+    issue = dict(issue)
+    with current_tracer().stage('analysis'):
+        if issue.get('file') and issue.get('line'):
+            log_debug(f"Getting detailed analysis for {issue['file']}:{issue['line']}")
+            file_content = get_file_lines(issue['file'])
+            if file_content:
+                issue = get_detailed_issue_analysis(issue, file_content)
+        place_issue(issue, position_index)
+    return issue
+
+# 같은 파일 이슈들의 일괄 상세 분석 후 인라인 코멘트 위치 계산 (원본 이슈는 변경하지 않음)
+def analyze_and_place_file_issues(issues, position_index):
+    with current_tracer().stage('analysis'):
+        file_path = issues[0].get('file')
+        file_content = get_file_lines(file_path) if file_path else None
+        if file_content:
+            log_debug(f"Getting batched analysis for {len(issues)} issues in {file_path}")
+            issues = get_batched_issue_analysis(issues, file_content)
+        else:
+            issues = [dict(issue) for issue in issues]
+        for issue in issues:
+            place_issue(issue, position_index)
+    return issues
+
+# 병합된 이슈를 파일별로 묶어 파일당 한 번의 요청으로 상세 분석 (결과는 입력 이슈 순서 유지)
+def analyze_issues_by_file(issues, position_index):
+    groups = {}
+    for i, issue in enumerate(issues):
+        groups.setdefault(issue.get('file'), []).append(i)
+    
+    group_indices = list(groups.values())
+    results = run_concurrently(
+        lambda indices: analyze_and_place_file_issues([issues[i] for i in indices], position_index),
+        group_indices,
+        ANALYSIS_CONCURRENCY,
+        fallback=lambda indices: [place_issue(dict(issues[i]), position_index) for i in indices]
+    )
+    
+    analyzed = [None] * len(issues)
+    for indices, group_result in zip(group_indices, results):
+        for i, issue in zip(indices, group_result):
+            analyzed[i] = issue
+    return analyzed
+
+# 리뷰와 상세 분석 파이프라인
+# 일괄 분석 모드에서는 병합 후 파일별로 묶어 분석하고,
+# 스트리밍 모드에서는 리뷰 응답에서 이슈가 완성되는 즉시 상세 분석/위치 계산을 시작하여 이후 이슈 생성과 겹쳐 실행
+# 병합 단계에서 제외된 이슈의 분석은 취소하고, 결과는 병합된 이슈 순서대로 반환
+# 시간 예산 - 게시용 예비 시간을 남기고 청크 리뷰와 상세 분석에 마감을 나누며, 마감까지 끝나지 않은 분석은 취소하고 원래 이슈를 사용
+def review_and_analyze(file_changes, position_index):
+    executor = ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY)
+    early_analyses = {}
+    lock = threading.Lock()
+    analysis_deadline = current_deadline().split(reserve=POST_RESERVE_SECONDS)
+    review_deadline = analysis_deadline.split(REVIEW_BUDGET_SHARE)
+    
+    def analyze(issue):
+        with use_deadline(analysis_deadline):
+            return analyze_and_place_issue(issue, position_index)
+    
+    def on_issue(issue):
+        future = executor.submit(bind_context(analyze), issue)
+        with lock:
+            early_analyses[id(issue)] = (issue, future)
+    
+    try:
+        # 일괄 분석은 파일의 이슈가 모두 모여야 시작할 수 있으므로, 스트리밍 모드에서만 이슈별 조기 분석
+        with use_deadline(review_deadline):
+            issues, review_comment = review_diff_in_chunks(file_changes, on_issue if REVIEW_STREAMING else None)
+        log_info(f"Parsed {len(issues)} issues from OpenAI response")
+        
+        if ANALYSIS_BATCHING and not REVIEW_STREAMING:
+            with use_deadline(analysis_deadline):
+                analyzed = analyze_issues_by_file(issues, position_index)
+            return analyzed, review_comment + analysis_budget_note()
+        
+        futures = []
+        with lock:
+            for issue in issues:
+                entry = early_analyses.pop(id(issue), None)
+                futures.append(entry[1] if entry else executor.submit(bind_context(analyze), issue))
+            dropped = [future for _, future in early_analyses.values()]
+        for future in dropped:
+            future.cancel()
+        
+        # 실패한 분석은 원래 이슈를 그대로 유지
+        analyzed = []
+        for issue, future in zip(issues, futures):
+            remaining = analysis_deadline.remaining()
+            try:
+                # 진행 중인 요청은 마감에 맞춘 timeout으로 곧 끝나므로 약간의 여유를 두고 기다림
+                analyzed.append(future.result(timeout=None if remaining is None else remaining + MIN_REQUEST_TIMEOUT))
+            except FuturesTimeoutError:
+                future.cancel()
+                record_budget_skip('analysis')
+                analyzed.append(place_issue(dict(issue), position_index))
+            except Exception as e:
+                log_error(f"Detailed analysis failed for {issue.get('file')}:{issue.get('line')}: {str(e)}")
+                analyzed.append(dict(issue))
+        return analyzed, review_comment + analysis_budget_note()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# 시간 예산을 넘어 생략한 상세 분석이 있으면 리뷰 코멘트에 덧붙일 안내
+def analysis_budget_note():
+    skipped = current_run().budget_skipped.get('analysis', 0)
+    if not skipped:
+        return ""
+    return f"\n\n시간 예산을 넘어 상세 분석 {skipped}건을 생략했습니다. 해당 이슈는 1차 리뷰 내용 그대로 게시됩니다."
+
+# 파일 내용과 라인 시작 오프셋 인덱스 - 필요한 라인만 잘라내어 전체 splitlines() 없이 컨텍스트 추출
+class FileLines:
+    __slots__ = ('text', 'offsets')
+    
+    def __init__(self, text):
+        self.text = text
+        offsets = array('q', [0] if text else [])
+        pos = text.find('\n')
+        while pos != -1 and pos + 1 < len(text):
+            offsets.append(pos + 1)
+            pos = text.find('\n', pos + 1)
+        self.offsets = offsets
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(index)
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.text)
+        return self.text[self.offsets[index]:end].rstrip('\r\n')
+
+def as_file_lines(file_content):
+    return file_content if isinstance(file_content, FileLines) else FileLines(file_content or "")
+
+# 리뷰 컨텍스트용 파일 내용 제공자 - 경로별로 한 번만 읽어 메모이즈
+# 로컬 git 객체 저장소에서 head 커밋의 blob을 직접 읽고(git cat-file --batch), 없으면 워크스페이스 파일로 대체
+# 얕은(shallow) 또는 분리된(detached) 체크아웃에서도 head 기준 내용으로 분석 가능
+# local이 False이면(대상 저장소의 체크아웃이 없음) head 커밋의 파일을 GitHub contents API로만 읽음
+class FileContentProvider:
+    def __init__(self, commit_sha=None, workspace=None, local=True):
+        self.commit_sha = commit_sha
+        self.workspace = workspace if workspace is not None else os.environ.get('GITHUB_WORKSPACE', '')
+        self.local = local
+        self.files = {}
+        self.lock = threading.Lock()
+        self.git_lock = threading.Lock()
+        self.git_process = None
+        self.git_unavailable = not commit_sha or not local
+    
+    def get_lines(self, file_path):
+        with self.lock:
+            if file_path in self.files:
+                return self.files[file_path]
+        
+        if self.local:
+            text = self.read_git_blob(file_path)
+            if text is None:
+                text = self.read_workspace_file(file_path)
+        else:
+            text = self.read_github_file(file_path)
+        lines = FileLines(text) if text is not None else None
+        
+        with self.lock:
+            return self.files.setdefault(file_path, lines)
+    
+    def read_git_blob(self, file_path):
+        if self.git_unavailable or file_path.startswith('/') or '\n' in file_path:
+            return None
+        
+        with self.git_lock:
+            try:
+                if self.git_process is None:
+                    self.git_process = subprocess.Popen(
+                        ['git', 'cat-file', '--batch'],
+                        cwd=self.workspace or None,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL
+                    )
+                self.git_process.stdin.write(f"{self.commit_sha}:{file_path}\n".encode('utf-8'))
+                self.git_process.stdin.flush()
+                
+                header = self.git_process.stdout.readline().decode('utf-8', errors='replace').rstrip('\n')
+                if not header:
+                    raise OSError("git cat-file exited")
+                if header.endswith(' missing') or header.endswith(' ambiguous'):
+                    log_debug(f"{file_path} not found at {self.commit_sha[:7]} in local git objects")
+                    return None
+                
+                _, object_type, size = header.rsplit(' ', 2)
+                data = self.git_process.stdout.read(int(size) + 1)[:int(size)]
+                if object_type != 'blob':
+                    return None
+                return data.decode('utf-8', errors='replace')
+            except (OSError, ValueError) as e:
+                log_debug(f"Local git object reader unavailable, using workspace files: {str(e)}")
+                self.git_unavailable = True
+                self.close()
+                return None
+    
+    def read_github_file(self, file_path):
+        if not self.commit_sha or file_path.startswith('/'):
+            return None
+        url = f"{GITHUB_API_URL}/repos/{current_run().repo}/contents/{quote(file_path)}"
+        response = github_request('GET', url, accept='application/vnd.github.raw', params={'ref': self.commit_sha})
+        if response.status_code != 200:
+            log_debug(f"{file_path} not available at {self.commit_sha[:7]} from GitHub (status code: {response.status_code})")
+            return None
+        return response.content.decode('utf-8', errors='replace')
+    
+    def read_workspace_file(self, file_path):
+        try:
+            # 프로젝트 루트 기준 경로 처리
+            if file_path.startswith('/'):
+                full_path = file_path
+            else:
+                # GitHub Actions에서는 워크스페이스 기준 경로로 접근
+                full_path = os.path.join(self.workspace, file_path)
+                
+            with open(full_path, 'r') as file:
+                return file.read()
+        except Exception as e:
+            log_error(f"Error reading file {file_path}: {str(e)}")
+            return None
+    
+    def close(self):
+        if self.git_process is not None:
+            try:
+                self.git_process.stdin.close()
+                self.git_process.wait(timeout=5)
+            except Exception:
+                self.git_process.kill()
+            self.git_process = None
+
+# 파일 내용 읽기 (라인 인덱스 포함) - 실행별 파일 내용 제공자 사용 (PR 정보를 가져온 뒤 head 커밋 기준으로 교체됨)
+def get_file_lines(file_path):
+    return current_run().file_content_provider.get_lines(file_path)
+
+# 파일 내용 읽기
+def get_file_content(file_path):
+    lines = get_file_lines(file_path)
+    return lines.text if lines is not None else None
+
+# 저장소 심볼 인덱스 - 체크아웃의 git 인덱스(git ls-files -s)에서 Python 파일의 blob SHA를 읽고,
+# 처음 보는 blob만 ast로 파싱하여 정의(함수/클래스/모듈 변수), 참조(이름/속성 사용 위치), import를 저장
+# blob 단위로 저장하므로 내용이 같은 파일은 경로/저장소가 달라도 다시 파싱하지 않음
+class SymbolIndex:
+    def __init__(self, path=SYMBOL_INDEX_PATH, workspace=None):
+        self.workspace = os.path.abspath(workspace if workspace is not None else os.environ.get('GITHUB_WORKSPACE', '') or '.')
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.sources = {}
+        with self.lock, self.db:
+            # 참조 테이블이 없는 이전 인덱스는 참조를 채우도록 모든 blob을 다시 인덱싱
+            if not self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'refs'").fetchone():
+                self.db.executescript("DROP TABLE IF EXISTS blobs; DROP TABLE IF EXISTS definitions; DROP TABLE IF EXISTS imports;")
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, indexed_at REAL);
+                CREATE TABLE IF NOT EXISTS files (root TEXT, path TEXT, sha TEXT, PRIMARY KEY (root, path));
+                CREATE TABLE IF NOT EXISTS definitions (sha TEXT, name TEXT, qualname TEXT, kind TEXT, line INTEGER, end_line INTEGER);
+                CREATE TABLE IF NOT EXISTS refs (sha TEXT, name TEXT, line INTEGER);
+                CREATE TABLE IF NOT EXISTS imports (sha TEXT, module TEXT, name TEXT, alias TEXT, line INTEGER);
+                CREATE INDEX IF NOT EXISTS files_sha ON files (sha);
+                CREATE INDEX IF NOT EXISTS definitions_name ON definitions (name);
+                CREATE INDEX IF NOT EXISTS definitions_sha ON definitions (sha);
+                CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+                CREATE INDEX IF NOT EXISTS refs_sha ON refs (sha);
+                CREATE INDEX IF NOT EXISTS imports_sha ON imports (sha);
+            """)
+    
+    # 체크아웃 상태에 맞춰 인덱스 갱신 - (전체 파일 수, 새로 인덱싱한 blob 수) 반환
+    def refresh(self):
+        start = time.time()
+        output = subprocess.run(['git', 'ls-files', '-s', '-z', '--', '*.py'], cwd=self.workspace,
+                                capture_output=True, check=True).stdout.decode('utf-8', errors='replace')
+        current = {}
+        for entry in output.split('\0'):
+            if entry:
+                info, _, path = entry.partition('\t')
+                current[path] = info.split()[1]
+        
+        with self.lock:
+            indexed = {row[0] for row in self.db.execute("SELECT sha FROM blobs")}
+        new_blobs = {sha: path for path, sha in current.items() if sha not in indexed}
+        symbols = {sha: extract_symbols(text) for sha, text in self.read_blobs(new_blobs)}
+        
+        with self.lock, self.db:
+            for sha, (definitions, references, imports) in symbols.items():
+                self.db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?)", (sha, time.time()))
+                self.db.executemany("INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?)", [(sha,) + row for row in definitions])
+                self.db.executemany("INSERT INTO refs VALUES (?, ?, ?)", [(sha,) + row for row in references])
+                self.db.executemany("INSERT INTO imports VALUES (?, ?, ?, ?, ?)", [(sha,) + row for row in imports])
+            self.db.execute("DELETE FROM files WHERE root = ?", (self.workspace,))
+            self.db.executemany("INSERT INTO files VALUES (?, ?, ?)", [(self.workspace, path, sha) for path, sha in current.items()])
+            # 어떤 체크아웃에서도 쓰지 않는 blob 정리
+            for table in ('definitions', 'refs', 'imports', 'blobs'):
+                self.db.execute(f"DELETE FROM {table} WHERE sha NOT IN (SELECT sha FROM files)")
+        
+        log_info(f"Symbol index: {len(current)} Python files, {len(symbols)} re-indexed in {time.time() - start:.2f}s")
+        return len(current), len(symbols)
+    
+    # blob 내용을 한 프로세스(git cat-file --batch)로 차례로 읽음 - (sha, 내용) 생성
+    def read_blobs(self, blobs):
+        if not blobs:
+            return
+        process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=self.workspace,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            for sha in blobs:
+                process.stdin.write(f"{sha}\n".encode())
+                process.stdin.flush()
+                header = process.stdout.readline().decode('utf-8', errors='replace').split()
+                if len(header) != 3:
+                    continue
+                data = process.stdout.read(int(header[2]) + 1)[:int(header[2])]
+                yield sha, data.decode('utf-8', errors='replace')
+        finally:
+            process.stdin.close()
+            process.wait()
+    
+    # 이름으로 정의 찾기 - [(경로, blob SHA, 정규 이름, 종류, 시작 라인, 끝 라인)]
+    def definitions(self, name):
+        with self.lock:
+            return self.db.execute("""
+                SELECT files.path, files.sha, qualname, kind, line, end_line FROM definitions
+                JOIN files ON files.sha = definitions.sha AND files.root = ?
+                WHERE name = ? ORDER BY files.path, line
+            """, (self.workspace, name)).fetchall()
+    
+    # 이름을 참조하는 위치 - [(경로, blob SHA, 라인)]
+    def references(self, name, limit=50):
+        with self.lock:
+            return self.db.execute("""
+                SELECT files.path, files.sha, line FROM refs
+                JOIN files ON files.sha = refs.sha AND files.root = ?
+                WHERE name = ? ORDER BY files.path, line LIMIT ?
+            """, (self.workspace, name, limit)).fetchall()
+    
+    # 파일의 import 목록 - [(모듈, 이름, 별칭, 라인)]
+    def imports(self, path):
+        with self.lock:
+            return self.db.execute("""
+                SELECT module, name, alias, line FROM imports
+                JOIN files ON files.sha = imports.sha AND files.root = ?
+                WHERE files.path = ? ORDER BY line
+            """, (self.workspace, path)).fetchall()
+    
+    # 인덱싱한 blob의 라인 (정의의 라인 번호와 어긋나지 않도록 워크스페이스 파일이 아닌 blob에서 읽음)
+    def blob_lines(self, sha):
+        with self.lock:
+            if sha in self.sources:
+                return self.sources[sha]
+        try:
+            lines = next((FileLines(text) for _, text in self.read_blobs([sha])), None)
+        except OSError:
+            lines = None
+        with self.lock:
+            return self.sources.setdefault(sha, lines)
+    
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+# Python 소스의 심볼 추출 - (정의, 참조, import) 목록 (파싱할 수 없으면 모두 빈 목록)
+def extract_symbols(source):
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return [], [], []
+    definitions, references, imports = [], set(), []
+    
+    def visit(node, scope, in_class):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{scope}.{child.name}" if scope else child.name
+                if isinstance(child, ast.ClassDef):
+                    kind = 'class'
+                else:
+                    kind = 'method' if in_class else 'function'
+                start = min([child.lineno] + [decorator.lineno for decorator in child.decorator_list])
+                definitions.append((child.name, qualname, kind, start, child.end_lineno))
+                visit(child, qualname, isinstance(child, ast.ClassDef))
+                continue
+            if not scope and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        definitions.append((target.id, target.id, 'variable', child.lineno, child.end_lineno))
+            elif isinstance(child, ast.Import):
+                for alias in child.names:
+                    imports.append((alias.name, None, alias.asname, child.lineno))
+            elif isinstance(child, ast.ImportFrom):
+                for alias in child.names:
+                    imports.append(('.' * child.level + (child.module or ''), alias.name, alias.asname, child.lineno))
+            elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                references.add((child.id, child.lineno))
+            elif isinstance(child, ast.Attribute) and isinstance(child.ctx, ast.Load):
+                references.add((child.attr, child.lineno))
+            visit(child, scope, in_class)
+    
+    visit(tree, '', False)
+    return definitions, sorted(references), imports
+
+# 관련 정의 검색에서 제외할 이름 (키워드, 내장 함수)
+COMMON_NAMES = set(keyword.kwlist) | set(dir(builtins)) | {'self', 'cls'}
+IDENTIFIER_RE = re.compile(r'\b[A-Za-z_][A-Za-z0-9_]{2,}\b')
 
-# 파일 diff 분석하여, 변경 위치 매핑
-def analyze_file_diff(diff_lines):
-    changes = {
-        'added': {},   # {diff_position: original_line}
-        'deleted': {}, # {diff_position: original_line}
-        'changed': {}  # {diff_position: original_line}
-    }
-    
-    in_hunk = False
-    diff_position = 0
-    original_line = 0
-    new_line = 0
-    
-    for i, line in enumerate(diff_lines):
-        diff_position = i + 1
-        
-        # 헤더 라인은 건너뛰기
-        if line.startswith('diff --git') or line.startswith('index ') or line.startswith('---') or line.startswith('+++'):
+# 실행에서 사용할 심볼 인덱스 (처음 요청할 때 한 번 갱신, 워크스페이스가 git 저장소가 아니면 None)
+def get_symbol_index():
+    run = current_run()
+    with run.lock:
+        if run.symbol_index is None and SYMBOL_INDEX_ENABLED and run.config.local_checkout:
+            try:
+                index = SymbolIndex(workspace=run.config.workspace)
+                start = time.time()
+                files, reindexed = index.refresh()
+                run.symbol_index = index
+                run.symbol_index_stats = {'files': files, 'reindexed': reindexed, 'seconds': round(time.time() - start, 3)}
+            except (OSError, subprocess.CalledProcessError, sqlite3.Error) as e:
+                log_debug(f"Symbol index unavailable: {str(e)}")
+                run.symbol_index = False
+        return run.symbol_index or None
+
+# import 문의 모듈이 가리킬 수 있는 파일 경로 - (경로 후보, 상대 import 여부)
+def import_module_paths(module, file_path):
+    name = module.lstrip('.')
+    level = len(module) - len(name)
+    parts = name.split('.') if name else []
+    if level:
+        package = posixpath.dirname(file_path).split('/') if posixpath.dirname(file_path) else []
+        if level - 1 > len(package):
+            return (), True
+        parts = package[:len(package) - (level - 1)] + parts
+    stem = '/'.join(parts)
+    candidates = (f"{stem}.py", f"{stem}/__init__.py") if stem else ("__init__.py",)
+    return candidates, bool(level)
+
+# 파일의 import로 이름의 정의 위치 고르기 (import한 이름이 아니거나 모듈 파일을 찾지 못하면 None)
+def resolve_imported_definition(name, imported, candidates, file_path):
+    if name not in imported:
+        return None
+    module, original = imported[name]
+    module_paths, relative = import_module_paths(module, file_path)
+    for candidate in candidates:
+        # 절대 import는 src/ 등 하위 디렉터리에 있는 패키지도 허용
+        if any(candidate[0] == path or (not relative and candidate[0].endswith('/' + path)) for path in module_paths):
+            return candidate
+    return None
+
+# 코드 구간에서 사용하는 이름의 정의와, 코드 구간에서 정의한 함수/클래스의 사용 위치를 찾아 프롬프트 섹션으로 렌더링 (없으면 빈 문자열)
+# 같은 파일의 정의, 파일의 import가 가리키는 모듈의 정의 순으로 고르고,
+# 그래도 다른 파일에 같은 이름이 여러 개면 어느 것인지 알 수 없으므로 제외
+# 사용 위치는 저장소 전체에서 정의가 하나뿐인 이름만 찾음 (여러 개면 어느 정의의 호출인지 알 수 없음)
+def related_definitions_section(file_path, lines, windows):
+    index = get_symbol_index() if RELATED_DEFINITIONS_LIMIT > 0 or RELATED_REFERENCES_LIMIT > 0 else None
+    if index is None or not file_path.endswith('.py'):
+        return ""
+    
+    names = []
+    for start, end in windows:
+        for i in range(start, end):
+            for name in IDENTIFIER_RE.findall(lines[i]):
+                if name not in COMMON_NAMES and name not in names:
+                    names.append(name)
+    
+    # 파일에서 import한 이름 - {사용하는 이름: (모듈, 원래 이름)}
+    imported = {}
+    for module, imported_name, alias, _ in index.imports(file_path):
+        if imported_name and imported_name != '*':
+            imported[alias or imported_name] = (module, imported_name)
+    
+    blocks, shown = [], []
+    for name in names:
+        candidates = index.definitions(imported[name][1] if name in imported else name)
+        local = [candidate for candidate in candidates if candidate[0] == file_path]
+        chosen = (local[0] if local else None) or resolve_imported_definition(name, imported, candidates, file_path)
+        if chosen is None and len(candidates) == 1:
+            chosen = candidates[0]
+        if chosen is None:
             continue
-        
-        # 청크 헤더 파싱 (@@ -original_start,original_count +new_start,new_count @@)
-        if line.startswith('@@'):
-            in_hunk = True
-            match = re.search(r'@@ -(\d+),\d+ \+(\d+),\d+ @@', line)
-            if match:
-                original_line = int(match.group(1)) - 1  # 헤더 이후 라인부터 시작
-                new_line = int(match.group(2)) - 1
+        path, sha, qualname, kind, line, end_line = chosen
+        # 이미 코드 구간에 보이는 정의는 본문 대신 사용 위치를 찾음
+        if path == file_path and any(start < line <= end for start, end in windows):
+            if kind != 'variable' and len(candidates) == 1:
+                shown.append(chosen)
             continue
-        
-        if in_hunk:
-            if line.startswith('+'):
-                new_line += 1
-                changes['added'][diff_position] = new_line
-            elif line.startswith('-'):
-                original_line += 1
-                changes['deleted'][diff_position] = original_line
-            else:
-                original_line += 1
-                new_line += 1
-                changes['changed'][diff_position] = new_line
-    
-    return changes
+        if len(blocks) >= RELATED_DEFINITIONS_LIMIT:
+            continue
+        source = index.blob_lines(sha)
+        if source is None or line > len(source):
+            continue
+        last = min(end_line, line + RELATED_DEFINITION_LINES - 1, len(source))
+        body = "\n".join(source[i] for i in range(line - 1, last))
+        if last < end_line:
+            body += "\n    ..."
+        blocks.append(f"# {path}:{line} ({kind} {qualname})\n{body}")
+    
+    usages = related_references(index, file_path, windows, shown)
+    
+    section = ""
+    if blocks:
+        section += "\n참고할 관련 정의 (다른 위치에 있는 함수/클래스):\n```\n" + "\n\n".join(blocks) + "\n```\n"
+    if usages:
+        section += "\n코드 구간의 함수/클래스를 사용하는 위치 (변경이 호출부와 맞는지 확인):\n```\n" + "\n".join(usages) + "\n```\n"
+    return section
 
-# OpenAI 리뷰 요청
-def get_code_review(diff):
-    log_info("Requesting code review from OpenAI API")
-    openai_client = OpenAI(api_key=openai_api_key)
-    
-    # 상세한 프롬프트로 변경
-    prompt = f"""코드 변경 사항을 리뷰하고 중요한 문제점을 상세하게 분석해주세요:
+# 정의의 사용 위치 라인 - ["# 경로:라인 (정규 이름)\n코드"], 코드 구간과 정의 본문 안의 사용(재귀 호출 등)은 제외
+def related_references(index, file_path, windows, definitions):
+    usages = []
+    for path, sha, qualname, kind, line, end_line in definitions:
+        name = qualname.rsplit('.', 1)[-1]
+        for ref_path, ref_sha, ref_line in index.references(name, limit=RELATED_REFERENCES_LIMIT * 4):
+            if len(usages) >= RELATED_REFERENCES_LIMIT:
+                return usages
+            if ref_path == file_path and (line <= ref_line <= end_line or any(start < ref_line <= end for start, end in windows)):
+                continue
+            source = index.blob_lines(ref_sha)
+            if source is None or ref_line > len(source):
+                continue
+            usages.append(f"# {ref_path}:{ref_line} ({qualname})\n{source[ref_line - 1].strip()}")
+    return usages
 
-1. 각 문제점에 대해 다음 형식을 정확히 사용하세요:
-- 파일: [파일명], 라인: [라인번호]
-- 유형: [보안/성능/논리/품질] 중 하나를 선택
-- 이슈: [상세한 문제 설명 - 구체적으로 무엇이 문제인지, 왜 문제인지, 어떤 영향이 있는지 기술]
-- 해결: [구체적인 해결 방법 - 정확히 어떻게 코드를 수정해야 하는지 예시 코드 포함]
+# 이슈 항목의 필드 패턴: 파일 및 라인 정보, 유형, 이슈, 해결
+ISSUE_FILE_LINE_RE = re.compile(r'(?:파일|File)(?:\*\*)?:(?:\*\*)?\s*([^,\n]+)(?:,\s*(?:라인|Line):\s*(\d+))?', re.IGNORECASE)
+ISSUE_TYPE_RE = re.compile(r'(?:유형|Type)(?:\*\*)?:(?:\*\*)?\s*([^\n]+)', re.IGNORECASE)
+ISSUE_DESCRIPTION_RE = re.compile(r'(?:이슈|Issue)(?:\*\*)?:(?:\*\*)?\s*([^\n]+)', re.IGNORECASE)
+ISSUE_FIX_RE = re.compile(r'(?:해결|Fix)(?:\*\*)?:(?:\*\*)?\s*([^\n]+)', re.IGNORECASE)
 
-2. 중요도 순서로 최대 5개 이슈만 알려주세요.
-3. 무조건 파일명과 라인 번호를 명시해 주세요.
-4. 모든 이슈에 최소 3문장 이상의 상세한 설명과 구체적인 해결 방법을 제공해주세요.
-5. 일반적인 조언이나 모호한 설명은 완전히 피하고, 코드의 특정 문제를 정확히 지적해주세요.
-6. 해결 방법에는 가능한 실제 코드 예시를 포함해주세요.
+# 이슈 항목의 시작 줄 (예: "- 파일: a.py, 라인: 3", "1. **파일**: a.py")
+ISSUE_BLOCK_START_RE = re.compile(r'^[ \t]*(?:(?:[-*]|\d+\.)[ \t]*)*(?:\*\*)?(?:파일|File)(?:\*\*)?[ \t]*:', re.IGNORECASE | re.MULTILINE)
 
-다음 코드 변경 사항을 리뷰하세요:
+# 응답을 "파일:" 줄 기준으로 이슈 항목 단위로 분리
+def split_issue_blocks(response_text):
+    starts = [match.start() for match in ISSUE_BLOCK_START_RE.finditer(response_text)]
+    return [response_text[start:end] for start, end in zip(starts, starts[1:] + [len(response_text)])]
 
-{diff}"""
+# 이슈 항목 하나를 파싱 (파일 정보가 없으면 None)
+def parse_issue_block(block):
+    file_match = ISSUE_FILE_LINE_RE.search(block)
+    if not file_match:
+        return None
     
-    # OpenAI API에 리뷰 요청
-    response = openai_client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=1500  # 응답 토큰 증가
-    )
-    review_comment = response.choices[0].message.content
-    log_debug(f"OpenAI response:\n{review_comment}")
+    type_match = ISSUE_TYPE_RE.search(block)
+    issue_match = ISSUE_DESCRIPTION_RE.search(block)
+    fix_match = ISSUE_FIX_RE.search(block)
     
-    return review_comment
+    file_path = file_match.group(1).strip()
+    line_num = int(file_match.group(2)) if file_match.group(2) else None
 
-# 리뷰받은 이슈에 대해 더 상세한 분석 요청
-def get_detailed_issue_analysis(issue, file_content):
-    if not issue.get('file') or not issue.get('line') or not file_content:
-        return issue
-    
-    openai_client = OpenAI(api_key=openai_api_key)
-    
-    # 파일 내용과 이슈 정보를 바탕으로 상세 분석 요청
-    line_num = issue.get('line', 0)
-    
-    # 해당 라인 주변 10줄 컨텍스트 추출
-    lines = file_content.splitlines()
-    start_line = max(0, line_num - 5)
-    end_line = min(len(lines), line_num + 5)
-    
-    context_lines = []
-    for i in range(start_line, end_line):
-        prefix = ">>> " if i + 1 == line_num else "    "
-        context_lines.append(f"{prefix}{i+1}: {lines[i]}")
-    
-    code_context = "\n".join(context_lines)
-    
-    prompt = f"""다음 코드의 {line_num}번 라인에서 발견된 이슈에 대해 상세 분석이 필요합니다:
+    issue_type = type_match.group(1).strip() if type_match else "일반"
+    description = issue_match.group(1).strip() if issue_match else None
+    fix = fix_match.group(1).strip() if fix_match else None
 
-```
-{code_context}
-```
+    # 블록에서 파일/라인/유형 행을 제외한 나머지 텍스트를 설명으로 사용
+    if not description:
+        # 파일, 라인, 유형, 이슈, 해결 키워드로 시작하는 행을 제외한 나머지 텍스트
+        description_lines = []
+        for line in block.split('\n'):
+            line = line.strip()
+            if not line or re.match(r'^(?:파일|File|유형|Type|이슈|Issue|해결|Fix):', line, re.IGNORECASE):
+                continue
+            description_lines.append(line)
 
-이슈 유형: {issue.get('type', '일반')}
-현재 설명: {issue.get('description', '설명 없음')}
-현재 해결책: {issue.get('recommendation', '해결책 없음')}
+        if description_lines:
+            description = " ".join(description_lines)
 
-위 코드와 라인을 면밀히 분석하여 다음 정보를 제공해주세요:
-1. 정확히 어떤 문제가 있는지 (최소 3문장 이상으로 상세히)
-2. 이 문제가 왜 중요한지, 어떤 영향을 미치는지
-3. 구체적인 해결 방법 (가능하면 수정된 코드 예시 포함)
+    # 여전히 설명이 없는 경우, 이슈 유형에 따라 기본 설명 추가
+    if not description:
+        description = default_issue_description(issue_type)
 
-중요: 일반적인 설명이나 모호한 조언은 피하고, 이 특정 코드에 맞춘 구체적인 분석을 제공해주세요.
-"""
-    
-    # OpenAI API에 상세 분석 요청
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1000
-        )
-        detailed_analysis = response.choices[0].message.content
-        log_debug(f"Detailed analysis for line {line_num}:\n{detailed_analysis}")
-        
-        # 상세 분석에서 설명과 해결책 추출
-        description_match = re.search(r'1\.\s+(.*?)(?=2\.)', detailed_analysis, re.DOTALL)
-        impact_match = re.search(r'2\.\s+(.*?)(?=3\.)', detailed_analysis, re.DOTALL)
-        solution_match = re.search(r'3\.\s+(.*)', detailed_analysis, re.DOTALL)
-        
-        new_description = ""
-        if description_match:
-            new_description = description_match.group(1).strip()
-        if impact_match:
-            new_description += "\n\n영향: " + impact_match.group(1).strip()
-            
-        new_recommendation = solution_match.group(1).strip() if solution_match else issue.get('recommendation', '')
-        
-        # 충분히 상세하게 추출된 경우에만 업데이트
-        if len(new_description) > 50:
-            issue['description'] = new_description
-        if len(new_recommendation) > 50:
-            issue['recommendation'] = new_recommendation
-            
-    except Exception as e:
-        log_error(f"Error getting detailed analysis: {str(e)}")
+    # 해결 방법이 없는 경우, 이슈 유형에 따라 기본 해결 방법 추가
+    if not fix:
+        fix = default_issue_recommendation(issue_type)
+
+    log_debug(f"Parsed issue: file={file_path}, line={line_num}, type={issue_type}")
+    log_debug(lambda: f"Description: {description[:100]}..." if len(description) > 100 else f"Description: {description}")
+
+    return {
+        'type': issue_type,
+        'description': description,
+        'recommendation': fix,
+        'file': file_path,
+        'line': line_num
+    }
+
+# 스트리밍 응답에서 이슈 항목이 완성되는 즉시 파싱하여 콜백으로 전달
+# 다음 "파일:" 줄이 도착하거나 스트림이 끝나면 직전 항목이 완성된 것으로 판단
+class IncrementalIssueParser:
+    def __init__(self, on_issue):
+        self.on_issue = on_issue
+        self.text = ""
+        self.scan_pos = 0
+        self.block_start = None
+        self.issues = []
+    
+    def emit(self, end):
+        issue = parse_issue_block(self.text[self.block_start:end])
+        if issue:
+            self.issues.append(issue)
+            self.on_issue(issue)
+    
+    def feed(self, delta):
+        self.text += delta
+        # 완성된 줄까지만 검사하여 "파일:" 레이블이 잘린 상태로 판단되지 않도록 함
+        upto = self.text.rfind('\n') + 1
+        if upto <= self.scan_pos:
+            return
+        for match in ISSUE_BLOCK_START_RE.finditer(self.text, self.scan_pos, upto):
+            if self.block_start is not None:
+                self.emit(match.start())
+            self.block_start = match.start()
+        self.scan_pos = upto
+    
+    def close(self):
+        self.feed("\n")
+        if self.block_start is not None:
+            self.emit(len(self.text))
+            self.block_start = None
+        return self.text.rstrip("\n")
+
+# 이슈 유형별 기본 설명/해결 방법 (응답에 내용이 없을 때 사용)
+def default_issue_description(issue_type):
+    issue_type = issue_type.lower()
+    if issue_type in ["보안", "security"]:
+        return "이 코드에 보안 취약점이 발견되었습니다. 입력 검증이나 안전하지 않은 함수 사용을 확인하세요."
+    elif issue_type in ["성능", "performance"]:
+        return "성능 이슈가 발견되었습니다. 비효율적인 연산이나 불필요한 반복이 있는지 확인하세요."
+    elif issue_type in ["논리", "logical"]:
+        return "논리적 오류가 발견되었습니다. 알고리즘 로직, 조건문, 반환값 등을 확인하세요."
+    elif issue_type in ["품질", "quality"]:
+        return "코드 품질 문제가 발견되었습니다. 중복 코드, 명명 규칙, 미사용 변수 등을 확인하세요."
+    return "이 라인에 코드 이슈가 감지되었습니다. 구현 방식과 로직을 검토하세요."
+
+def default_issue_recommendation(issue_type):
+    issue_type = issue_type.lower()
+    if issue_type in ["보안", "security"]:
+        return "입력 데이터를 검증하고, 안전한 함수를 사용하세요. eval() 대신 ast.literal_eval()을 고려해 보세요."
+    elif issue_type in ["성능", "performance"]:
+        return "중복 연산을 제거하고, 데이터 구조와 알고리즘을 최적화하세요."
+    elif issue_type in ["논리", "logical"]:
+        return "알고리즘 로직을 검토하고, 조건문과 계산 순서가 올바른지 확인하세요."
+    elif issue_type in ["품질", "quality"]:
+        return "코드 재사용을 고려하고, 명명 규칙을 따르며, 불필요한 변수와 코드를 제거하세요."
+    return "코드를 검토하고 발견된 문제를 수정하세요."
+
+# 구조화 출력의 이슈 항목을 검증하고 이슈 레코드로 변환 (파일이 없으면 None)
+def coerce_issue(item):
+    if not isinstance(item, dict):
+        return None
+    file_path = str(item.get('file') or '').strip()
+    if not file_path:
+        return None
     
-    return issue
+    line = item.get('line')
+    if isinstance(line, str) and line.strip().isdigit():
+        line = int(line.strip())
+    if not isinstance(line, int) or isinstance(line, bool) or line <= 0:
+        line = None
+    
+    issue_type = str(item.get('type') or '일반').strip() or '일반'
+    description = str(item.get('description') or '').strip() or default_issue_description(issue_type)
+    recommendation = str(item.get('recommendation') or '').strip() or default_issue_recommendation(issue_type)
+    return {
+        'type': issue_type,
+        'description': description,
+        'recommendation': recommendation,
+        'file': file_path,
+        'line': line
+    }
 
-# 파일 내용 읽기
-def get_file_content(file_path):
+# 구조화 출력 응답 전체를 디코딩 (JSON이 아니거나 형식이 다르면 None)
+def parse_json_review(response_text):
     try:
-        # 프로젝트 루트 기준 경로 처리
-        if file_path.startswith('/'):
-            full_path = file_path
-        else:
-            # GitHub Actions에서는 워크스페이스 기준 경로로 접근
-            full_path = os.path.join(os.environ.get('GITHUB_WORKSPACE', ''), file_path)
-            
-        with open(full_path, 'r') as file:
-            return file.read()
-    except Exception as e:
-        log_error(f"Error reading file {file_path}: {str(e)}")
+        payload = json.loads(response_text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('issues'), list):
         return None
+    return [issue for issue in (coerce_issue(item) for item in payload['issues']) if issue]
+
+# 구조화 출력 스트림에서 issues 배열의 각 객체가 완성되는 즉시 디코딩하여 콜백으로 전달
+JSON_ISSUES_ARRAY_RE = re.compile(r'"issues"\s*:\s*\[')
+
+class IncrementalJsonIssueParser:
+    decoder = json.JSONDecoder()
+    
+    def __init__(self, on_issue):
+        self.on_issue = on_issue
+        self.text = ""
+        self.pos = None
+        self.done = False
+        self.issues = []
+    
+    def feed(self, delta):
+        self.text += delta
+        if self.done:
+            return
+        if self.pos is None:
+            match = JSON_ISSUES_ARRAY_RE.search(self.text)
+            if not match:
+                return
+            self.pos = match.end()
+        
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in ' \t\r\n,':
+                self.pos += 1
+            if self.pos >= len(self.text):
+                return
+            if self.text[self.pos] == ']':
+                self.done = True
+                return
+            # 객체가 닫히기 전에는 디코딩을 시도하지 않음
+            if self.text.find('}', self.pos) == -1:
+                return
+            try:
+                item, end = self.decoder.raw_decode(self.text, self.pos)
+            except ValueError:
+                return
+            self.pos = end
+            issue = coerce_issue(item)
+            if issue:
+                self.issues.append(issue)
+                self.on_issue(issue)
+    
+    def close(self):
+        return self.text
+
+# 잘린 구조화 출력에서 완성된 이슈 객체만 복원
+def recover_json_issues(response_text):
+    parser = IncrementalJsonIssueParser(lambda issue: None)
+    parser.feed(response_text or "")
+    return parser.issues
+
+# 리뷰 응답 파싱 - (이슈 목록, 응답 전체를 해석했는지 여부) 반환
+# 구조화 출력(JSON)을 우선 디코딩하고, 디코딩에 실패하면 완성된 이슈 객체만 복원
+# JSON 형태가 아닌 응답만 정규식 기반 파싱으로 대체 (JSON을 텍스트 파서로 읽으면 이슈가 없는 것으로 오인됨)
+def parse_review_response(response_text, file_changes):
+    if REVIEW_OUTPUT_MODE == 'json':
+        issues = parse_json_review(response_text)
+        if issues is not None:
+            log_debug(f"Decoded {len(issues)} issues from structured output")
+            return issues, True
+        if (response_text or "").lstrip().startswith('{'):
+            issues = recover_json_issues(response_text)
+            log_info(f"Structured output could not be fully decoded, recovered {len(issues)} completed issues")
+            return issues, False
+        log_info("Structured output could not be decoded, falling back to text parsing")
+        issues = parse_ai_response(response_text, file_changes)
+        return issues, bool(issues)
+    return parse_ai_response(response_text, file_changes), True
+
+# 이슈 목록을 사람이 읽을 수 있는 텍스트 형식으로 변환 (일반 코멘트 게시용)
+def format_issues_as_text(issues):
+    if not issues:
+        return "코드 리뷰 완료: 이슈가 발견되지 않았습니다."
+    blocks = []
+    for issue in issues:
+        location = f"- 파일: {issue.get('file')}" + (f", 라인: {issue['line']}" if issue.get('line') else "")
+        blocks.append(f"{location}\n- 유형: {issue.get('type')}\n- 이슈: {issue.get('description')}\n- 해결: {issue.get('recommendation')}")
+    return "\n\n".join(blocks)
 
 # OpenAI 응답 파싱 및 이슈-파일-라인 연결
 def parse_ai_response(response_text, file_changes):
     # 간단한 패턴 매칭을 통한 파일 및 라인 번호 추출
-    issues = []
-    
-    # 패턴: 파일 및 라인 정보 추출
-    file_line_pattern = r'(?:파일|File):\s*([^,\n]+)(?:,\s*(?:라인|Line):\s*(\d+))?'
-    type_pattern = r'(?:유형|Type):\s*([^\n]+)'
-    issue_pattern = r'(?:이슈|Issue):\s*([^\n]+)'
-    fix_pattern = r'(?:해결|Fix):\s*([^\n]+)'
-    
     log_debug(f"Starting to parse response text of length: {len(response_text)}")
     
-    # 모든 이슈 항목 찾기 (- 또는 숫자로 시작하는 항목)
-    issue_blocks = re.split(r'\n(?=-|\d+\.|\*)\s*', response_text)
+    # 모든 이슈 항목 찾기 ("파일:" 줄로 시작하는 항목)
+    issue_blocks = split_issue_blocks(response_text)
     log_debug(f"Found {len(issue_blocks)} issue blocks")
     
+    issues = []
     for i, block in enumerate(issue_blocks):
-        if not block.strip():
-            continue
-            
-        log_debug(f"Processing issue block {i+1}: {block[:100]}...")
-        
-        file_match = re.search(file_line_pattern, block, re.IGNORECASE)
-        type_match = re.search(type_pattern, block, re.IGNORECASE)
-        issue_match = re.search(issue_pattern, block, re.IGNORECASE)
-        fix_match = re.search(fix_pattern, block, re.IGNORECASE)
-        
-        if file_match:
-            file_path = file_match.group(1).strip()
-            line_num = int(file_match.group(2)) if file_match.group(2) else None
-            
-            issue_type = type_match.group(1).strip() if type_match else "일반"
-            description = issue_match.group(1).strip() if issue_match else None
-            fix = fix_match.group(1).strip() if fix_match else None
-            
-            # 블록에서 파일/라인/유형 행을 제외한 나머지 텍스트를 설명으로 사용
-            if not description:
-                # 파일, 라인, 유형, 이슈, 해결 키워드로 시작하는 행을 제외한 나머지 텍스트
-                description_lines = []
-                for line in block.split('\n'):
-                    line = line.strip()
-                    if not line or re.match(r'^(?:파일|File|유형|Type|이슈|Issue|해결|Fix):', line, re.IGNORECASE):
-                        continue
-                    description_lines.append(line)
-                
-                if description_lines:
-                    description = " ".join(description_lines)
-            
-            # 여전히 설명이 없는 경우, 이슈 유형에 따라 기본 설명 추가
-            if not description:
-                if issue_type.lower() in ["보안", "security"]:
-                    description = "이 코드에 보안 취약점이 발견되었습니다. 입력 검증이나 안전하지 않은 함수 사용을 확인하세요."
-                elif issue_type.lower() in ["성능", "performance"]:
-                    description = "성능 이슈가 발견되었습니다. 비효율적인 연산이나 불필요한 반복이 있는지 확인하세요."
-                elif issue_type.lower() in ["논리", "logical"]:
-                    description = "논리적 오류가 발견되었습니다. 알고리즘 로직, 조건문, 반환값 등을 확인하세요."
-                elif issue_type.lower() in ["품질", "quality"]:
-                    description = "코드 품질 문제가 발견되었습니다. 중복 코드, 명명 규칙, 미사용 변수 등을 확인하세요."
-                else:
-                    description = "이 라인에 코드 이슈가 감지되었습니다. 구현 방식과 로직을 검토하세요."
-            
-            # 해결 방법이 없는 경우, 이슈 유형에 따라 기본 해결 방법 추가
-            if not fix:
-                if issue_type.lower() in ["보안", "security"]:
-                    fix = "입력 데이터를 검증하고, 안전한 함수를 사용하세요. eval() 대신 ast.literal_eval()을 고려해 보세요."
-                elif issue_type.lower() in ["성능", "performance"]:
-                    fix = "중복 연산을 제거하고, 데이터 구조와 알고리즘을 최적화하세요."
-                elif issue_type.lower() in ["논리", "logical"]:
-                    fix = "알고리즘 로직을 검토하고, 조건문과 계산 순서가 올바른지 확인하세요."
-                elif issue_type.lower() in ["품질", "quality"]:
-                    fix = "코드 재사용을 고려하고, 명명 규칙을 따르며, 불필요한 변수와 코드를 제거하세요."
-                else:
-                    fix = "코드를 검토하고 발견된 문제를 수정하세요."
-            
-            log_debug(f"Parsed issue: file={file_path}, line={line_num}, type={issue_type}")
-            log_debug(f"Description: {description[:100]}..." if len(description) > 100 else f"Description: {description}")
-            
-            issues.append({
-                'type': issue_type,
-                'description': description,
-                'recommendation': fix,
-                'file': file_path,
-                'line': line_num
-            })
+        log_debug(lambda: f"Processing issue block {i+1}: {block[:100]}...")
+        issue = parse_issue_block(block)
+        if issue:
+            issues.append(issue)
     
     # 파일 및 라인 번호가 없는 경우 처리
     if not issues:
@@ -436,9 +3035,14 @@ def parse_ai_response(response_text, file_changes):
     return issues
 
 # 이슈 요약 생성 함수
-def generate_summary(issues):
+def generate_summary(issues, commit_sha=None, incremental_base=None, unplaced_issues=None):
+    marker = f"\n{REVIEWED_SHA_MARKER.format(sha=commit_sha)}" if commit_sha else ""
+    scope = ""
+    if incremental_base and commit_sha:
+        scope = f"\n\n_이전 리뷰({incremental_base[:7]}) 이후 {commit_sha[:7]}까지의 변경 사항만 리뷰했습니다._"
+    
     if not issues:
-        return f"{BOT_SIGNATURE}\n\n# 코드 리뷰 요약\n\n코드 리뷰 완료: 이슈가 발견되지 않았습니다."
+        return f"{BOT_SIGNATURE}{marker}\n\n# 코드 리뷰 요약\n\n코드 리뷰 완료: 이슈가 발견되지 않았습니다.{scope}"
     
     issue_types = {}
     for issue in issues:
@@ -448,18 +3052,30 @@ def generate_summary(issues):
         else:
             issue_types[category] = 1
     
-    summary = f"{BOT_SIGNATURE}\n\n# 코드 리뷰 요약\n\n"
+    summary = f"{BOT_SIGNATURE}{marker}\n\n# 코드 리뷰 요약\n\n"
     summary += "다음과 같은 이슈가 발견되었습니다:\n\n"
     
     for category, count in issue_types.items():
         summary += f"- **{category}**: {count}개 이슈\n"
     
     summary += "\n각 이슈에 대한 상세 내용은 인라인 코멘트를 참조하세요."
+    
+    # diff 위치에 표시할 수 없는 이슈는 요약 본문에 직접 포함
+    if unplaced_issues:
+        summary += "\n\n## 인라인으로 표시하지 못한 이슈\n"
+        for issue in unplaced_issues:
+            location = (f" `{issue['file']}`" if issue.get('file') else "") + (f" {issue['line']}번 라인" if issue.get('line') else "")
+            summary += f"\n- **{issue.get('type')}**{location}: {issue.get('description', '')}"
+            if issue.get('recommendation'):
+                summary += f"\n  - 해결 방법: {issue['recommendation']}"
+    
+    summary += scope
     return summary
 
 # 모든 기존 PR 코멘트 가져오기 (삭제 대상)
 def get_all_comments():
-    comments_url = f"https://api.github.com/repos/{repo}/issues/{pr_number}/comments"
+    run = current_run()
+    comments_url = f"{GITHUB_API_URL}/repos/{run.repo}/issues/{run.pr_number}/comments"
     log_debug(f"Fetching all PR comments from: {comments_url}")
     
     all_comments = []
@@ -468,11 +3084,11 @@ def get_all_comments():
     
     while True:
         params = {'per_page': per_page, 'page': page}
-        response = requests.get(comments_url, headers=github_headers, params=params)
+        response = github_request('GET', comments_url, params=params)
         
         if response.status_code != 200:
             log_error(f"Failed to get comments (status code: {response.status_code})")
-            log_debug(f"Response: {response.text}")
+            log_debug(lambda: f"Response: {response.text}")
             break
         
         comments = response.json()
@@ -491,7 +3107,8 @@ def get_all_comments():
 
 # 모든 인라인 코멘트(리뷰 코멘트) 가져오기
 def get_all_review_comments():
-    comments_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}/comments"
+    run = current_run()
+    comments_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/comments"
     log_debug(f"Fetching all PR review comments from: {comments_url}")
     
     all_comments = []
@@ -500,11 +3117,11 @@ def get_all_review_comments():
     
     while True:
         params = {'per_page': per_page, 'page': page}
-        response = requests.get(comments_url, headers=github_headers, params=params)
+        response = github_request('GET', comments_url, params=params)
         
         if response.status_code != 200:
             log_error(f"Failed to get review comments (status code: {response.status_code})")
-            log_debug(f"Response: {response.text}")
+            log_debug(lambda: f"Response: {response.text}")
             break
         
         comments = response.json()
@@ -521,74 +3138,242 @@ def get_all_review_comments():
     log_info(f"Retrieved {len(all_comments)} total PR review comments")
     return all_comments
 
+# PR의 코멘트, 인라인 코멘트(리뷰 스레드), 리뷰와 head/base SHA를 한 번에 가져오는 GraphQL 쿼리
+# 각 목록은 아직 남은 페이지가 있을 때만 @include로 다음 페이지를 요청
+PR_ACTIVITY_QUERY = """
+query($owner: String!, $name: String!, $number: Int!,
+      $withComments: Boolean!, $commentsCursor: String,
+      $withThreads: Boolean!, $threadsCursor: String,
+      $withReviews: Boolean!, $reviewsCursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      headRefOid
+      baseRefOid
+      comments(first: 100, after: $commentsCursor) @include(if: $withComments) {
+        pageInfo { hasNextPage endCursor }
+        nodes { databaseId body createdAt author { login } }
+      }
+      reviewThreads(first: 100, after: $threadsCursor) @include(if: $withThreads) {
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          id
+          isResolved
+          comments(first: 100) {
+            nodes { databaseId body path line outdated createdAt author { login } pullRequestReview { databaseId } }
+          }
+        }
+      }
+      reviews(first: 100, after: $reviewsCursor) @include(if: $withReviews) {
+        pageInfo { hasNextPage endCursor }
+        nodes { databaseId body state submittedAt author { login } }
+      }
+    }
+  }
+}
+"""
+
+# GraphQL 노드를 REST 응답과 같은 형태의 dict로 변환
+def graphql_author(node):
+    return {'login': (node.get('author') or {}).get('login', '')}
+
+def convert_graphql_comment(node):
+    return {
+        'id': node.get('databaseId'),
+        'body': node.get('body') or '',
+        'created_at': node.get('createdAt'),
+        'user': graphql_author(node)
+    }
+
+def convert_graphql_review_comment(node, thread):
+    return {
+        'id': node.get('databaseId'),
+        'body': node.get('body') or '',
+        'path': node.get('path'),
+        'line': node.get('line'),
+        # REST API와 동일하게 outdated 코멘트는 position이 없음
+        'position': None if node.get('outdated') else node.get('line'),
+        'created_at': node.get('createdAt'),
+        'thread_id': thread.get('id'),
+        'thread_resolved': thread.get('isResolved'),
+        # 코멘트가 속한 리뷰 (REST API의 pull_request_review_id와 같은 값)
+        'pull_request_review_id': (node.get('pullRequestReview') or {}).get('databaseId'),
+        'user': graphql_author(node)
+    }
+
+def convert_graphql_review(node):
+    return {
+        'id': node.get('databaseId'),
+        'body': node.get('body') or '',
+        'state': node.get('state'),
+        'submitted_at': node.get('submittedAt'),
+        'user': graphql_author(node)
+    }
+
+# GraphQL로 PR 활동(코멘트/인라인 코멘트/리뷰)을 한 번의 페이지 스트림으로 가져와 봇 항목만 반환
+def fetch_bot_activity_graphql():
+    run = current_run()
+    owner, name = run.repo.split('/', 1)
+    activity = {'head_sha': None, 'base_sha': None, 'comments': [], 'review_comments': [], 'reviews': []}
+    cursors = {'comments': None, 'reviewThreads': None, 'reviews': None}
+    pending = {'comments': True, 'reviewThreads': True, 'reviews': True}
+    pages = 0
+    
+    while any(pending.values()):
+        variables = {
+            'owner': owner, 'name': name, 'number': int(run.pr_number),
+            'withComments': pending['comments'], 'commentsCursor': cursors['comments'],
+            'withThreads': pending['reviewThreads'], 'threadsCursor': cursors['reviewThreads'],
+            'withReviews': pending['reviews'], 'reviewsCursor': cursors['reviews']
+        }
+        response = github_request('POST', GITHUB_GRAPHQL_URL, idempotent=True,
+                                  json={'query': PR_ACTIVITY_QUERY, 'variables': variables})
+        if response.status_code != 200:
+            raise Exception(f"GraphQL request failed (status code: {response.status_code})")
+        payload = response.json()
+        if payload.get('errors'):
+            raise Exception(f"GraphQL errors: {payload['errors']}")
+        
+        pr_data = ((payload.get('data') or {}).get('repository') or {}).get('pullRequest')
+        if not pr_data:
+            raise Exception("Pull request not found in GraphQL response")
+        pages += 1
+        activity['head_sha'] = pr_data.get('headRefOid')
+        activity['base_sha'] = pr_data.get('baseRefOid')
+        
+        for node in (pr_data.get('comments') or {}).get('nodes', []):
+            comment = convert_graphql_comment(node)
+            if is_bot_comment(comment):
+                activity['comments'].append(comment)
+        for thread in (pr_data.get('reviewThreads') or {}).get('nodes', []):
+            for node in thread.get('comments', {}).get('nodes', []):
+                comment = convert_graphql_review_comment(node, thread)
+                if is_bot_comment(comment):
+                    activity['review_comments'].append(comment)
+        for node in (pr_data.get('reviews') or {}).get('nodes', []):
+            review = convert_graphql_review(node)
+            if is_bot_comment(review):
+                activity['reviews'].append(review)
+        
+        for field in pending:
+            if not pending[field]:
+                continue
+            page_info = (pr_data.get(field) or {}).get('pageInfo') or {}
+            pending[field] = bool(page_info.get('hasNextPage'))
+            cursors[field] = page_info.get('endCursor')
+    
+    log_info(f"Retrieved bot activity via GraphQL in {pages} pages: "
+             f"{len(activity['comments'])} comments, {len(activity['review_comments'])} review comments, "
+             f"{len(activity['reviews'])} reviews")
+    return activity
+
+# REST API로 PR 활동을 가져와 봇 항목만 반환 (GraphQL 실패 시 대체 경로)
+def fetch_bot_activity_rest():
+    return {
+        'head_sha': None,
+        'base_sha': None,
+        'comments': [comment for comment in get_all_comments() if is_bot_comment(comment)],
+        'review_comments': [comment for comment in get_all_review_comments() if is_bot_comment(comment)],
+        'reviews': [review for review in get_all_reviews() if is_bot_comment(review)]
+    }
+
+# 실행 중 한 번만 가져온 봇 활동 스냅샷
+def get_bot_activity():
+    run = current_run()
+    if run.bot_activity is None:
+        try:
+            run.bot_activity = fetch_bot_activity_graphql()
+        except Exception as e:
+            log_error(f"GraphQL fetch failed, falling back to REST: {str(e)}")
+            run.bot_activity = fetch_bot_activity_rest()
+    return run.bot_activity
+
 # 봇 코멘트인지 확인
 def is_bot_comment(comment):
     body = comment.get('body', '')
     user_login = comment.get('user', {}).get('login', '')
     # 디버그용 - 코멘트 본문 확인
     if len(body) > 0:
-        log_debug(f"Checking comment body (first 100 chars): {body[:100]}")
-        log_debug(f"Bot signature found: {BOT_SIGNATURE in body}")
+        log_debug(lambda: f"Checking comment body (first 100 chars): {body[:100]}")
+        log_debug(lambda: f"Bot signature found: {BOT_SIGNATURE in body}")
     return (BOT_SIGNATURE in body) or (user_login == "github-actions" or user_login == "github-actions[bot]")
 
-# 인라인 코멘트(리뷰 코멘트) 전체 삭제
-def delete_all_bot_review_comments():
-    all_comments = get_all_review_comments()
+# 증분 리뷰에서 다시 리뷰한 라인 또는 더 이상 유효하지 않은(outdated) 코멘트인지 확인
+def is_comment_in_touched_ranges(comment, touched_ranges):
+    line = comment.get('line')
+    if line is None or comment.get('position') is None:
+        return True
+    ranges = touched_ranges.get(comment.get('path'), [])
+    return any(start <= line <= end for start, end in ranges)
+
+# 인라인 코멘트(리뷰 코멘트) 전체 삭제 - 삭제한 코멘트 ID 목록 반환
+# touched_ranges가 주어지면(증분 리뷰) 변경된 라인의 코멘트만 삭제하고 나머지는 유지
+def delete_all_bot_review_comments(touched_ranges=None):
+    run = current_run()
+    all_comments = get_bot_activity()['review_comments']
     log_info(f"Checking {len(all_comments)} review comments for deletion")
     
-    deleted_count = 0
+    targets = []
     for comment in all_comments:
-        comment_id = comment.get('id')
-        if comment_id and is_bot_comment(comment):
-            log_debug(f"Deleting bot review comment {comment_id}")
-            
-            delete_url = f"https://api.github.com/repos/{repo}/pulls/comments/{comment_id}"
-            response = requests.delete(delete_url, headers=github_headers)
-            
-            if response.status_code == 204:  # 204 No Content는 성공적인 삭제를 의미
-                log_info(f"Successfully deleted review comment {comment_id}")
-                deleted_count += 1
-            else:
-                log_error(f"Failed to delete review comment {comment_id} (status code: {response.status_code})")
-                log_debug(f"Response: {response.text}")
+        if touched_ranges is not None and not is_comment_in_touched_ranges(comment, touched_ranges):
+            continue
+        if comment.get('id') and is_bot_comment(comment):
+            targets.append(comment['id'])
+    
+    def delete_comment(comment_id):
+        log_debug(f"Deleting bot review comment {comment_id}")
+        
+        delete_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/comments/{comment_id}"
+        response = github_request('DELETE', delete_url)
+        
+        if response.status_code == 204:  # 204 No Content는 성공적인 삭제를 의미
+            log_info(f"Successfully deleted review comment {comment_id}")
+            return comment_id
+        log_error(f"Failed to delete review comment {comment_id} (status code: {response.status_code})")
+        log_debug(lambda: f"Response: {response.text}")
+        return None
     
-    log_info(f"Deleted {deleted_count} bot review comments")
-    return deleted_count
+    deleted_ids = [i for i in run_concurrently(delete_comment, targets, CLEANUP_CONCURRENCY) if i]
+    log_info(f"Deleted {len(deleted_ids)} bot review comments")
+    return deleted_ids
 
-# 일반 PR 코멘트는 중복 처리 (Outdated로 표시)
+# 일반 PR 코멘트는 중복 처리 (Outdated로 표시) - 표시한 코멘트 ID 목록 반환
 def mark_comments_as_outdated():
-    all_comments = get_all_comments()
+    run = current_run()
+    all_comments = get_bot_activity()['comments']
     log_info(f"Checking {len(all_comments)} comments for marking as outdated")
     
-    marked_count = 0
-    for comment in all_comments:
-        comment_id = comment.get('id')
-        body = comment.get('body', '')
+    targets = [
+        comment for comment in all_comments
+        if comment.get('id') and is_bot_comment(comment) and "OUTDATED" not in comment.get('body', '')
+    ]
+    
+    def mark_comment(comment):
+        comment_id = comment['id']
+        log_debug(f"Marking bot comment {comment_id} as outdated")
         
-        if comment_id and is_bot_comment(comment) and "OUTDATED" not in body:
-            log_debug(f"Marking bot comment {comment_id} as outdated")
-            
-            # 코멘트 본문에 "OUTDATED" 표시 추가
-            updated_body = f"{body}\n\n**OUTDATED**: 새로운 리뷰가 생성되었습니다."
-            
-            update_url = f"https://api.github.com/repos/{repo}/issues/comments/{comment_id}"
-            update_data = {'body': updated_body}
-            
-            response = requests.patch(update_url, headers=github_headers, json=update_data)
-            
-            if response.status_code == 200:
-                log_info(f"Successfully marked comment {comment_id} as outdated")
-                marked_count += 1
-            else:
-                log_error(f"Failed to mark comment {comment_id} as outdated (status code: {response.status_code})")
-                log_debug(f"Response: {response.text}")
+        # 코멘트 본문에 "OUTDATED" 표시 추가
+        updated_body = f"{comment.get('body', '')}\n\n**OUTDATED**: 새로운 리뷰가 생성되었습니다."
+        
+        update_url = f"{GITHUB_API_URL}/repos/{run.repo}/issues/comments/{comment_id}"
+        update_data = {'body': updated_body}
+        
+        response = github_request('PATCH', update_url, json=update_data)
+        
+        if response.status_code == 200:
+            log_info(f"Successfully marked comment {comment_id} as outdated")
+            return comment_id
+        log_error(f"Failed to mark comment {comment_id} as outdated (status code: {response.status_code})")
+        log_debug(lambda: f"Response: {response.text}")
+        return None
     
-    log_info(f"Marked {marked_count} bot comments as outdated")
-    return marked_count
+    marked_ids = [i for i in run_concurrently(mark_comment, targets, CLEANUP_CONCURRENCY) if i]
+    log_info(f"Marked {len(marked_ids)} bot comments as outdated")
+    return marked_ids
 
 # 모든 기존 PR 리뷰 가져오기 (삭제 대상)
 def get_all_reviews():
-    reviews_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}/reviews"
+    run = current_run()
+    reviews_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/reviews"
     log_debug(f"Fetching all PR reviews from: {reviews_url}")
     
     all_reviews = []
@@ -597,11 +3382,11 @@ def get_all_reviews():
     
     while True:
         params = {'per_page': per_page, 'page': page}
-        response = requests.get(reviews_url, headers=github_headers, params=params)
+        response = github_request('GET', reviews_url, params=params)
         
         if response.status_code != 200:
             log_error(f"Failed to get reviews (status code: {response.status_code})")
-            log_debug(f"Response: {response.text}")
+            log_debug(lambda: f"Response: {response.text}")
             break
         
         reviews = response.json()
@@ -621,12 +3406,14 @@ def get_all_reviews():
     log_info(f"Retrieved {len(all_reviews)} total PR reviews")
     return all_reviews
 
-# 봇 리뷰 전체 삭제/dismiss
-def dismiss_all_bot_reviews():
-    all_reviews = get_all_reviews()
+# 봇 리뷰 전체 삭제/dismiss - dismiss한 리뷰 ID 목록 반환
+# review_ids가 주어지면(증분 리뷰) 해당 리뷰만 dismiss
+def dismiss_all_bot_reviews(review_ids=None):
+    run = current_run()
+    all_reviews = get_bot_activity()['reviews']
     log_info(f"Checking {len(all_reviews)} reviews for dismissal")
     
-    dismissed_count = 0
+    targets = []
     for review in all_reviews:
         review_id = review.get('id')
         user_login = review.get('user', {}).get('login', '')
@@ -635,114 +3422,190 @@ def dismiss_all_bot_reviews():
         
         log_debug(f"Review ID: {review_id}, User: {user_login}, State: {review_state}, Body starts with: {review_body[:50] if review_body else 'No body'}")
         
-        if not review_id:
+        if not review_id or (review_ids is not None and review_id not in review_ids):
             continue
             
         # 봇 리뷰인지 확인 (GitHub Actions 봇 또는 시그니처로 식별)
         is_bot = (BOT_SIGNATURE in review_body) or (user_login == "github-actions" or user_login == "github-actions[bot]")
         
         # COMMENT 상태가 아닌 경우에만 dismiss 시도 (APPROVED 또는 REQUEST_CHANGES)
-        if is_bot and review_state != "COMMENTED":
-            log_debug(f"Dismissing bot review {review_id} from user {user_login}")
-            
-            dismiss_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}/reviews/{review_id}/dismissals"
-            dismiss_data = {
-                'message': '이전 자동 리뷰를 대체합니다.',
-                'event': 'DISMISS'
-            }
-            
-            response = requests.put(dismiss_url, headers=github_headers, json=dismiss_data)
-            
-            if response.status_code == 200:
-                log_info(f"Successfully dismissed review {review_id}")
-                dismissed_count += 1
-            else:
-                log_error(f"Failed to dismiss review {review_id} (status code: {response.status_code})")
-                log_debug(f"Response: {response.text}")
+        # 이미 dismiss된 리뷰는 다시 처리하지 않음
+        if is_bot and review_state not in ("COMMENTED", "DISMISSED"):
+            targets.append(review_id)
         elif is_bot:
-            log_debug(f"Skipping COMMENT type review {review_id} - cannot dismiss")
+            log_debug(f"Skipping {review_state} review {review_id} - cannot dismiss")
+    
+    def dismiss_review(review_id):
+        log_debug(f"Dismissing bot review {review_id}")
+        
+        dismiss_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/reviews/{review_id}/dismissals"
+        dismiss_data = {
+            'message': '이전 자동 리뷰를 대체합니다.',
+            'event': 'DISMISS'
+        }
+        
+        response = github_request('PUT', dismiss_url, json=dismiss_data)
+        
+        if response.status_code == 200:
+            log_info(f"Successfully dismissed review {review_id}")
+            return review_id
+        log_error(f"Failed to dismiss review {review_id} (status code: {response.status_code})")
+        log_debug(lambda: f"Response: {response.text}")
+        return None
+    
+    dismissed_ids = [i for i in run_concurrently(dismiss_review, targets, CLEANUP_CONCURRENCY) if i]
+    log_info(f"Dismissed {len(dismissed_ids)} bot reviews")
+    return dismissed_ids
+
+# 정리 작업이 GitHub에 반영될 때까지 폴링 (고정 대기 대신, 반영되는 즉시 종료)
+# 반복 조회는 ETag 조건부 요청이므로 변경이 없으면 rate limit을 소모하지 않음
+def wait_for_cleanup(deleted_comment_ids, dismissed_review_ids):
+    if not deleted_comment_ids and not dismissed_review_ids:
+        return True
     
-    log_info(f"Dismissed {dismissed_count} bot reviews")
-    return dismissed_count
+    deadline = time.time() + CLEANUP_READY_TIMEOUT
+    interval = 0.25
+    while True:
+        pending = 0
+        if deleted_comment_ids:
+            remaining_ids = {comment.get('id') for comment in get_all_review_comments()}
+            pending += len(remaining_ids.intersection(deleted_comment_ids))
+        if dismissed_review_ids:
+            dismissed = set(dismissed_review_ids)
+            pending += sum(1 for review in get_all_reviews()
+                           if review.get('id') in dismissed and review.get('state') != "DISMISSED")
+        
+        if pending == 0:
+            log_info("GitHub reflects all cleanup changes")
+            return True
+        if time.time() + interval > deadline:
+            log_info(f"Cleanup not fully reflected after {CLEANUP_READY_TIMEOUT}s ({pending} pending), continuing")
+            return False
+        
+        log_debug(f"Waiting for {pending} cleanup changes to be reflected")
+        time.sleep(interval)
+        interval = min(interval * 2, 2)
 
 # GitHub PR에 인라인 코멘트 남기기
-def post_review_comments(commit_sha, issues, overall_comment):
+def post_review_comments(commit_sha, issues, overall_comment, incremental_base=None, touched_ranges=None,
+                         position_index=None):
     # 이전 봇 코멘트/리뷰 삭제
     log_info("Starting cleanup of previous bot comments and reviews")
+    with current_tracer().stage('cleanup'):
+        cleanup_previous_activity(touched_ranges)
+    
+    with current_tracer().stage('post'):
+        create_review(commit_sha, issues, overall_comment, incremental_base, position_index)
+
+# 이전 봇 코멘트/리뷰 정리
+def cleanup_previous_activity(touched_ranges=None):
     try:
-        # 기존 봇 인라인 코멘트(리뷰 코멘트) 모두 삭제
-        deleted_review_comments = delete_all_bot_review_comments()
-        log_info(f"Deleted {deleted_review_comments} bot review comments")
+        if touched_ranges is not None:
+            cleanup_incremental_activity(touched_ranges)
+            return
         
-        # 기존 일반 코멘트는 중복으로 표시
-        marked_comments = mark_comments_as_outdated()
-        log_info(f"Marked {marked_comments} bot comments as outdated")
+        # 세 가지 정리 작업은 서로 독립적이므로 동시에 실행
+        # - 기존 봇 인라인 코멘트(리뷰 코멘트) 삭제
+        # - 기존 일반 코멘트는 중복으로 표시
+        # - 기존 봇 리뷰 모두 dismiss
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            delete_future = executor.submit(bind_context(delete_all_bot_review_comments))
+            mark_future = executor.submit(bind_context(mark_comments_as_outdated))
+            dismiss_future = executor.submit(bind_context(dismiss_all_bot_reviews))
         
-        # 기존 봇 리뷰 모두 dismiss
-        dismissed_reviews = dismiss_all_bot_reviews()
-        log_info(f"Dismissed {dismissed_reviews} bot reviews")
+        deleted_review_comments = delete_future.result()
+        marked_comments = mark_future.result()
+        dismissed_reviews = dismiss_future.result()
+        log_info(f"Deleted {len(deleted_review_comments)} bot review comments, "
+                 f"marked {len(marked_comments)} bot comments as outdated, "
+                 f"dismissed {len(dismissed_reviews)} bot reviews")
         
-        # 삭제 작업 후 약간의 대기 시간 추가 (GitHub API 반영 시간 고려)
-        if deleted_review_comments > 0 or dismissed_reviews > 0 or marked_comments > 0:
+        # 삭제/dismiss 결과가 GitHub API에 반영될 때까지 대기
+        if deleted_review_comments or dismissed_reviews:
             log_info("Waiting for GitHub API to process changes...")
-            time.sleep(2)
+            wait_for_cleanup(deleted_review_comments, dismissed_reviews)
     except Exception as e:
         log_error(f"Error cleaning up previous comments/reviews: {str(e)}")
+
+# 증분 리뷰의 정리 - 변경된 라인의 인라인 코멘트만 삭제하고, 코멘트가 모두 삭제된 봇 리뷰만 dismiss
+# 변경되지 않은 부분에 대한 이전 요약 코멘트와 리뷰는 여전히 유효하므로 Outdated로 표시하지 않음
+def cleanup_incremental_activity(touched_ranges):
+    deleted_review_comments = delete_all_bot_review_comments(touched_ranges)
+    deleted = set(deleted_review_comments)
+    
+    review_comment_ids = {}
+    for comment in get_bot_activity()['review_comments']:
+        if comment.get('pull_request_review_id') and is_bot_comment(comment):
+            review_comment_ids.setdefault(comment['pull_request_review_id'], []).append(comment.get('id'))
+    cleared_reviews = {
+        review_id for review_id, comment_ids in review_comment_ids.items()
+        if all(comment_id in deleted for comment_id in comment_ids)
+    }
     
-    # 리뷰 생성
-    review_url = f"https://api.github.com/repos/{repo}/pulls/{pr_number}/reviews"
-    log_debug(f"Creating review at: {review_url}")
+    dismissed_reviews = dismiss_all_bot_reviews(cleared_reviews) if cleared_reviews else []
+    log_info(f"Deleted {len(deleted_review_comments)} bot review comments, "
+             f"dismissed {len(dismissed_reviews)} bot reviews")
     
-    # 간략한 요약 생성
-    summary = generate_summary(issues)
+    if deleted_review_comments or dismissed_reviews:
+        log_info("Waiting for GitHub API to process changes...")
+        wait_for_cleanup(deleted_review_comments, dismissed_reviews)
+
+# 인라인 코멘트 본문 - 지문이 주어지면 숨김 마커로 포함
+def format_issue_comment(issue, fingerprint=None):
+    comment_body = f"{BOT_SIGNATURE}\n"
+    if fingerprint:
+        comment_body += FINGERPRINT_MARKER.format(fingerprint=fingerprint) + "\n"
+    comment_body += f"\n**{issue['type']}**\n\n"
+    line = issue.get('position_line')
+    if line is not None and line != issue['line']:
+        comment_body += f"_{issue['line']}번 라인은 변경 범위에 포함되지 않아 가장 가까운 {line}번 라인에 표시합니다._\n\n"
+    
+    # 설명이나 해결 방법이 비어 있으면 유형별 기본 메시지 사용
+    description = (issue.get('description') or '').strip() or default_issue_description(issue['type'])
+    recommendation = (issue.get('recommendation') or '').strip() or default_issue_recommendation(issue['type'])
+    comment_body += f"{description}\n\n**해결 방법:**\n{recommendation}"
+    return comment_body
+
+# 리뷰 생성
+def create_review(commit_sha, issues, overall_comment, incremental_base=None, position_index=None):
+    run = current_run()
+    review_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/reviews"
+    log_debug(f"Creating review at: {review_url}")
     
-    # 인라인 코멘트 구성
+    # 인라인 코멘트 구성 - 모델이 알려준 라인을 diff position으로 변환하고, diff에 없는 라인은 가까운 라인으로 보정
+    position_index = position_index or {}
     comments = []
+    unplaced_issues = []
     for issue in issues:
         if issue.get('file') and issue.get('line'):
-            comment_body = f"{BOT_SIGNATURE}\n\n**{issue['type']}**\n\n"
-            
-            # 설명이 없거나 비어있는 경우 기본 메시지 사용
-            description = issue.get('description', '').strip()
-            if not description:
-                if issue['type'].lower() in ["보안", "security"]:
-                    description = "이 코드에 보안 취약점이 발견되었습니다. 입력 검증이나 안전하지 않은 함수 사용을 확인하세요."
-                elif issue['type'].lower() in ["성능", "performance"]:
-                    description = "성능 이슈가 발견되었습니다. 비효율적인 연산이나 불필요한 반복이 있는지 확인하세요."
-                elif issue['type'].lower() in ["논리", "logical"]:
-                    description = "논리적 오류가 발견되었습니다. 알고리즘 로직, 조건문, 반환값 등을 확인하세요."
-                elif issue['type'].lower() in ["품질", "quality"]:
-                    description = "코드 품질 문제가 발견되었습니다. 중복 코드, 명명 규칙, 미사용 변수 등을 확인하세요."
-                else:
-                    description = "이 라인에 코드 이슈가 감지되었습니다. 구현 방식과 로직을 검토하세요."
+            # 파이프라인에서 이미 계산된 위치가 있으면 그대로 사용
+            if 'position' not in issue:
+                place_issue(issue, position_index)
+            file_path, position, line = issue['path'], issue['position'], issue['position_line']
+            if position is None:
+                log_debug(f"No diff position for {issue['file']}:{issue['line']}, moving to summary")
+                unplaced_issues.append(issue)
+                continue
             
-            comment_body += f"{description}\n\n"
-            
-            recommendation = issue.get('recommendation', '').strip()
-            if recommendation:
-                comment_body += f"**해결 방법:**\n{recommendation}"
-            else:
-                if issue['type'].lower() in ["보안", "security"]:
-                    comment_body += "**해결 방법:**\n입력 데이터를 검증하고, 안전한 함수를 사용하세요. eval() 대신 ast.literal_eval()을 고려해 보세요."
-                elif issue['type'].lower() in ["성능", "performance"]:
-                    comment_body += "**해결 방법:**\n중복 연산을 제거하고, 데이터 구조와 알고리즘을 최적화하세요."
-                elif issue['type'].lower() in ["논리", "logical"]:
-                    comment_body += "**해결 방법:**\n알고리즘 로직을 검토하고, 조건문과 계산 순서가 올바른지 확인하세요."
-                elif issue['type'].lower() in ["품질", "quality"]:
-                    comment_body += "**해결 방법:**\n코드 재사용을 고려하고, 명명 규칙을 따르며, 불필요한 변수와 코드를 제거하세요."
-                else:
-                    comment_body += "**해결 방법:**\n코드를 면밀히 검토하고 발견된 문제를 수정하세요."
+            if line != issue['line']:
+                log_debug(f"Snapped {issue['file']}:{issue['line']} to line {line} (position {position})")
             
             comments.append({
-                'path': issue['file'],
-                'position': issue['line'],  # 정확한 position 계산이 필요할 수 있음
-                'body': comment_body
+                'path': file_path,
+                'position': position,
+                'body': format_issue_comment(issue)
             })
+        else:
+            # 파일/라인이 없는 이슈는 요약 본문에 포함
+            unplaced_issues.append(issue)
+    
+    # 간략한 요약 생성
+    summary = generate_summary(issues, commit_sha, incremental_base, unplaced_issues)
     
     log_debug(f"Prepared {len(comments)} inline comments")
     for i, comment in enumerate(comments):
         log_debug(f"Comment {i+1} - Path: {comment['path']}, Position: {comment['position']}")
-        log_debug(f"Comment body preview: {comment['body'][:150]}...")
+        log_debug(lambda: f"Comment body preview: {comment['body'][:150]}...")
     
     # 리뷰 데이터 구성
     review_data = {
@@ -755,10 +3618,10 @@ def post_review_comments(commit_sha, issues, overall_comment):
     # 인라인 코멘트가 없으면 일반 PR 코멘트로 대체
     if not comments:
         log_info("No inline comments to post, using regular PR comment instead")
-        comment_url = f"https://api.github.com/repos/{repo}/issues/{pr_number}/comments"
-        comment_data = {'body': f"{BOT_SIGNATURE}\n\n{overall_comment}"}
+        comment_url = f"{GITHUB_API_URL}/repos/{run.repo}/issues/{run.pr_number}/comments"
+        comment_data = {'body': f"{BOT_SIGNATURE}\n{REVIEWED_SHA_MARKER.format(sha=commit_sha)}\n\n{overall_comment}"}
         
-        response = requests.post(comment_url, headers=github_headers, json=comment_data)
+        response = github_request('POST', comment_url, json=comment_data)
         log_info(f"Comment posting result: {response.status_code}")
         
         if response.status_code != 201:
@@ -767,75 +3630,415 @@ def post_review_comments(commit_sha, issues, overall_comment):
     
     # 리뷰 및 인라인 코멘트 게시
     log_debug(f"Posting review with {len(comments)} inline comments")
-    response = requests.post(review_url, headers=github_headers, json=review_data)
+    response = github_request('POST', review_url, json=review_data)
     log_info(f"Review posting result: {response.status_code}")
     
-    if response.status_code != 201:
+    # 인라인 위치 문제로 리뷰 전체가 거부되면(422), 모든 이슈를 요약 본문에 넣어 다시 게시하여 결과 유실 방지
+    if response.status_code == 422:
+        log_error(f"Review with inline comments rejected: {response.text}")
+        review_data['comments'] = []
+        review_data['body'] = generate_summary(issues, commit_sha, incremental_base,
+                                               [issue for issue in issues if issue.get('file')])
+        response = github_request('POST', review_url, json=review_data)
+        log_info(f"Summary-only review posting result: {response.status_code}")
+    
+    if response.status_code not in (200, 201):
         log_error(f"Error details: {response.text}")
 
-# Main 실행 코드
-try:
-    log_info("Starting code review process")
-    log_info(f"Working with repository: {repo}")
-    log_info(f"Working with PR number: {pr_number}")
-    
-    # GitHub 토큰 검증
-    if not validate_github_token():
-        raise Exception("GitHub token validation failed")
-    
-    # PR 정보 및 diff 가져오기
-    pr_info = get_pr_info()
-    if not pr_info:
-        raise Exception("Failed to get PR info")
-    
-    diff = get_diff()
-    if not diff:
-        raise Exception("Failed to get diff")
-    
-    log_debug(f"Review target diff:\n{diff}")
-    
-    # diff 파싱
-    file_changes = parse_diff(diff)
-    
-    # OpenAI API로 코드 리뷰 요청
-    review_comment = get_code_review(diff)
-    
-    # OpenAI 응답 파싱
-    issues = parse_ai_response(review_comment, file_changes)
-    log_info(f"Parsed {len(issues)} issues from OpenAI response")
-    
-    # 각 이슈에 대해 추가 상세 분석 요청
-    for i, issue in enumerate(issues):
-        if issue.get('file') and issue.get('line'):
-            log_debug(f"Getting detailed analysis for issue {i+1} at {issue['file']}:{issue['line']}")
-            file_content = get_file_content(issue['file'])
-            if file_content:
-                issues[i] = get_detailed_issue_analysis(issue, file_content)
+# 이슈 지문 - 파일, 표시 라인의 코드(공백 정규화), 이슈 유형으로 계산하므로 위쪽 변경으로 라인 번호가 밀려도 같은 값
+# 파일 내용을 읽을 수 없으면 라인 번호로 대체
+def issue_fingerprint(issue):
+    file_path = issue.get('path') or issue.get('file') or ''
+    line = issue.get('position_line') or issue.get('line')
+    lines = get_file_lines(file_path) if file_path and line else None
+    if lines is not None and 0 < line <= len(lines):
+        context = " ".join(lines[line - 1].split())
+    else:
+        context = f"line:{line}"
+    rank = issue_priority(issue)
+    issue_type = ISSUE_TYPE_PRIORITY[rank] if rank < len(ISSUE_TYPE_PRIORITY) else (issue.get('type') or '').strip().lower()
+    return cache_key(file_path, context, issue_type)[:16]
+
+# 리뷰 스레드 해결 (GraphQL)
+RESOLVE_THREAD_MUTATION = """
+mutation($threadId: ID!) {
+  resolveReviewThread(input: {threadId: $threadId}) { thread { id isResolved } }
+}
+"""
+
+def resolve_review_thread(thread_id):
+    response = github_request('POST', GITHUB_GRAPHQL_URL, idempotent=True,
+                              json={'query': RESOLVE_THREAD_MUTATION, 'variables': {'threadId': thread_id}})
+    if response.status_code != 200 or response.json().get('errors'):
+        log_error(f"Failed to resolve review thread {thread_id} (status code: {response.status_code})")
+        log_debug(lambda: f"Response: {response.text}")
+        return False
+    return True
+
+# 더 이상 발견되지 않는 이슈의 코멘트 정리 - 스레드를 해결 처리 (REST로 가져와 스레드 ID가 없으면 삭제)
+def resolve_stale_comment(comment):
+    run = current_run()
+    if comment.get('thread_id'):
+        if resolve_review_thread(comment['thread_id']):
+            log_debug(f"Resolved review thread {comment['thread_id']}")
+            return comment['id']
+        return None
+    response = github_request('DELETE', f"{GITHUB_API_URL}/repos/{run.repo}/pulls/comments/{comment['id']}")
+    if response.status_code == 204:
+        return comment['id']
+    log_error(f"Failed to delete review comment {comment['id']} (status code: {response.status_code})")
+    return None
+
+# 같은 이슈의 기존 코멘트 본문 갱신 (내용이 같으면 요청하지 않음, 이미 해결된 스레드는 다시 열지 않음)
+def update_issue_comment(comment, body):
+    run = current_run()
+    if comment.get('body') == body:
+        return comment['id']
+    response = github_request('PATCH', f"{GITHUB_API_URL}/repos/{run.repo}/pulls/comments/{comment['id']}", json={'body': body})
+    if response.status_code == 200:
+        return comment['id']
+    log_error(f"Failed to update review comment {comment['id']} (status code: {response.status_code})")
+    log_debug(lambda: f"Response: {response.text}")
+    return None
+
+# 요약 리뷰 본문 갱신
+def update_review_body(review_id, body):
+    run = current_run()
+    response = github_request('PUT', f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/reviews/{review_id}",
+                              json={'body': body})
+    if response.status_code != 200:
+        log_error(f"Failed to update summary review {review_id} (status code: {response.status_code})")
+        log_debug(lambda: f"Response: {response.text}")
+    return response.status_code == 200
+
+# 지문으로 기존 봇 코멘트와 새 이슈를 비교하여 바뀐 것만 반영
+# - 새 이슈: 새 리뷰로 인라인 코멘트 생성, 같은 이슈: 본문이 달라졌을 때만 수정, 사라진 이슈: 스레드 해결
+# - 사용자가 해결한 스레드는 같은 이슈가 다시 발견되어도 다시 열거나 새로 게시하지 않음
+# - 요약은 하나의 요약 리뷰 본문을 갱신 (처음 실행이면 이전 방식의 봇 활동을 한 번 정리한 뒤 새로 생성)
+# 증분 리뷰에서는 다시 리뷰한 라인(touched_ranges)의 코멘트만 해결 대상
+def reconcile_review(commit_sha, issues, overall_comment, incremental_base=None, touched_ranges=None, position_index=None):
+    run = current_run()
+    activity = get_bot_activity()
+    summary_reviews = [review for review in activity['reviews'] if SUMMARY_MARKER in (review.get('body') or '')]
+    summary_review = max(summary_reviews, key=lambda review: review.get('submitted_at') or '', default=None)
+    
+    if summary_review is None:
+        log_info("No reconciled summary review found, cleaning up previous bot activity once")
+        with current_tracer().stage('cleanup'):
+            cleanup_previous_activity(touched_ranges)
+        existing_comments = []
+    else:
+        existing_comments = [comment for comment in activity['review_comments']
+                             if FINGERPRINT_PATTERN.search(comment.get('body') or '')]
     
-    # 각 이슈 정보 로깅
-    for i, issue in enumerate(issues):
-        log_debug(f"Issue {i+1}:")
-        log_debug(f"  File: {issue.get('file')}")
-        log_debug(f"  Line: {issue.get('line')}")
-        log_debug(f"  Type: {issue.get('type')}")
-        log_debug(f"  Description: {issue.get('description')[:100]}..." if issue.get('description') and len(issue.get('description')) > 100 else f"  Description: {issue.get('description')}")
-        log_debug(f"  Recommendation: {issue.get('recommendation')[:100]}..." if issue.get('recommendation') and len(issue.get('recommendation')) > 100 else f"  Recommendation: {issue.get('recommendation')}")
+    # 새 이슈의 지문 (같은 파일/코드/유형이 여러 번이면 순번을 붙여 구분)
+    position_index = position_index or {}
+    findings = {}
+    unplaced = []
+    for issue in issues:
+        # 파일/라인이 없는 이슈는 인라인으로 표시할 수 없으므로 요약 본문에 포함
+        if not issue.get('file') or not issue.get('line'):
+            unplaced.append(issue)
+            continue
+        if 'position' not in issue:
+            place_issue(issue, position_index)
+        if issue['position'] is None:
+            unplaced.append(issue)
+            continue
+        fingerprint = base = issue_fingerprint(issue)
+        occurrence = 1
+        while fingerprint in findings:
+            occurrence += 1
+            fingerprint = cache_key(base, occurrence)[:16]
+        findings[fingerprint] = issue
+    
+    # 기존 코멘트 분류 - outdated 코멘트는 현재 diff 위치가 없으므로 해결하고 새로 생성
+    # 사용자가 해결한 스레드의 이슈가 다시 발견되면 처리된 것으로 보고 새로 게시하지 않음 (outdated여도 동일)
+    current, stale, settled = {}, [], set()
+    for comment in existing_comments:
+        fingerprint = FINGERPRINT_PATTERN.search(comment['body']).group(1)
+        if fingerprint in findings and comment.get('position') is not None and fingerprint not in current:
+            current[fingerprint] = comment
+        elif comment.get('thread_resolved'):
+            if fingerprint in findings:
+                settled.add(fingerprint)
+        elif fingerprint in findings or touched_ranges is None or is_comment_in_touched_ranges(comment, touched_ranges):
+            stale.append(comment)
+    
+    created = [(fingerprint, issue) for fingerprint, issue in findings.items()
+               if fingerprint not in current and fingerprint not in settled]
+    updates = [(current[fingerprint], format_issue_comment(issue, fingerprint))
+               for fingerprint, issue in findings.items() if fingerprint in current]
+    
+    with current_tracer().stage('cleanup'):
+        resolved = [i for i in run_concurrently(resolve_stale_comment, stale, CLEANUP_CONCURRENCY) if i]
+    updated = set(i for i in run_concurrently(lambda item: update_issue_comment(*item), updates, CLEANUP_CONCURRENCY) if i)
+    # 실패한 수정 요청은 수정/유지 어느 쪽에도 세지 않음
+    changed = sum(1 for comment, body in updates if comment['id'] in updated and comment.get('body') != body)
+    failed = len(updates) - len(updated)
+    
+    def summary_body(unplaced_issues):
+        summary = generate_summary(issues, commit_sha, incremental_base, unplaced_issues)
+        if not issues and overall_comment:
+            summary += f"\n\n{overall_comment}"
+        return f"{SUMMARY_MARKER}\n{summary}"
+    
+    review_url = f"{GITHUB_API_URL}/repos/{run.repo}/pulls/{run.pr_number}/reviews"
+    comments = [
+        {'path': issue['path'], 'position': issue['position'], 'body': format_issue_comment(issue, fingerprint)}
+        for fingerprint, issue in created
+    ]
+    # 새 코멘트는 새 리뷰로 게시 (요약 리뷰가 없으면 요약을 본문으로 함께 게시)
+    if comments or summary_review is None:
+        body = summary_body(unplaced) if summary_review is None else BOT_SIGNATURE
+        review_data = {'commit_id': commit_sha, 'body': body, 'event': 'COMMENT', 'comments': comments}
+        response = github_request('POST', review_url, json=review_data)
+        log_info(f"Review posting result: {response.status_code}")
+        # 인라인 위치 문제로 거부되면(422) 새 이슈를 요약 본문으로 옮겨 결과 유실 방지
+        if response.status_code == 422:
+            log_error(f"Review with inline comments rejected: {response.text}")
+            unplaced = unplaced + [issue for _, issue in created]
+            created, comments = [], []
+            if summary_review is None:
+                review_data.update(body=summary_body(unplaced), comments=[])
+                response = github_request('POST', review_url, json=review_data)
+                log_info(f"Summary-only review posting result: {response.status_code}")
+        if response.status_code not in (200, 201):
+            log_error(f"Error details: {response.text}")
+    
+    if summary_review is not None:
+        body = summary_body(unplaced)
+        if body != summary_review.get('body'):
+            update_review_body(summary_review['id'], body)
+    
+    log_info(f"Reconciled review comments: {len(created)} created, {changed} updated, "
+             f"{len(updated) - changed} unchanged, {len(resolved)} resolved, {len(settled)} already resolved"
+             + (f", {failed} failed to update" if failed else ""))
+    return {'created': len(created), 'updated': changed, 'unchanged': len(updated) - changed,
+            'resolved': len(resolved), 'failed': failed}
+
+# 리뷰어 - 설정과 실행 상태를 가지고 파이프라인 단계를 메서드로 제공
+# 각 단계는 이 리뷰어의 실행 상태를 현재 컨텍스트로 설정한 뒤 실행되므로, 한 프로세스에서 여러 PR을 차례로(또는 스레드별로) 리뷰 가능
+# GitHub 세션, ETag 캐시, OpenAI 클라이언트, 디스크 캐시는 리뷰어 사이에 공유됨
+class CodeSage:
+    MODES = ('review', 'dry-run', 'parse-only', 'cleanup-only')
+    
+    def __init__(self, config=None):
+        self.config = config or CodeSageConfig.from_env()
+        self.state = RunState(self.config)
+    
+    @contextmanager
+    def activate(self):
+        token = current_run_var.set(self.state)
+        try:
+            yield self.state
+        finally:
+            current_run_var.reset(token)
+    
+    @contextmanager
+    def stage(self, name):
+        with self.activate(), self.state.tracer.stage(name):
+            yield
+    
+    def validate_token(self):
+        with self.stage('token_validation'):
+            if not validate_github_token():
+                raise Exception("GitHub token validation failed")
+    
+    def fetch_pr_info(self):
+        with self.stage('pr_info'):
+            pr_info = get_pr_info()
+        if not pr_info:
+            raise Exception("Failed to get PR info")
+        
+        # 상세 분석 컨텍스트는 워크스페이스 체크아웃 상태와 무관하게 head 커밋 기준으로 읽음
+        self.state.file_content_provider.close()
+        self.state.file_content_provider = FileContentProvider(pr_info['head_sha'], self.config.workspace, self.config.local_checkout)
+        return pr_info
+    
+    # diff를 스트리밍으로 받아 파일별 청크로 파싱 (수신과 파싱이 겹쳐 실행되므로 한 단계로 계측)
+    def fetch_review_diff(self, pr_info):
+        with self.stage('diff'):
+            file_changes, incremental_base = get_review_diff(pr_info)
+        if file_changes is None or (not file_changes and not incremental_base):
+            raise Exception("Failed to get diff")
+        log_debug(lambda: f"Review target files: {', '.join(file_changes)}")
+        return file_changes, incremental_base
+    
+    # 인라인 코멘트 위치 인덱스 구성 - 증분 리뷰에서도 position은 전체 PR diff 기준이어야 하므로 본문 없이 다시 파싱
+    def build_position_index(self, file_changes, incremental_base=None):
+        with self.stage('parse'):
+            position_diff = (self.state.pr_changes or get_diff(keep_text=False)) if incremental_base else file_changes
+            return build_position_index(position_diff or {})
+    
+    # OpenAI API로 청크 단위 코드 리뷰 요청 후 응답 파싱 및 병합, 각 이슈의 상세 분석과 위치 계산
+    def review(self, file_changes, position_index):
+        with self.stage('review'):
+            issues, review_comment = review_and_analyze(file_changes, position_index)
+        
+        # 각 이슈 정보 로깅
+        for i, issue in enumerate(issues if DEBUG_MODE else []):
+            log_debug(f"Issue {i+1}:")
+            log_debug(f"  File: {issue.get('file')}")
+            log_debug(f"  Line: {issue.get('line')}")
+            log_debug(f"  Type: {issue.get('type')}")
+            log_debug(f"  Description: {issue.get('description')[:100]}..." if issue.get('description') and len(issue.get('description')) > 100 else f"  Description: {issue.get('description')}")
+            log_debug(f"  Recommendation: {issue.get('recommendation')[:100]}..." if issue.get('recommendation') and len(issue.get('recommendation')) > 100 else f"  Recommendation: {issue.get('recommendation')}")
+        
+        # 상세 분석이 끝났으므로 git 객체 리더 종료
+        self.state.file_content_provider.close()
+        return issues, review_comment
     
-    # 리뷰 코멘트 게시
-    log_info("Posting review comments")
-    post_review_comments(pr_info['head_sha'], issues, review_comment)
+    def cleanup(self, touched_ranges=None):
+        log_info("Starting cleanup of previous bot comments and reviews")
+        with self.stage('cleanup'):
+            cleanup_previous_activity(touched_ranges)
     
-    log_info("Code review process completed successfully")
+    def post(self, commit_sha, issues, review_comment, incremental_base=None, position_index=None):
+        with self.stage('post'):
+            create_review(commit_sha, issues, review_comment, incremental_base, position_index)
     
-except Exception as e:
-    log_error(f"Error: {str(e)}")
+    # 기존 봇 코멘트와 비교하여 바뀐 이슈만 생성/수정/해결
+    def reconcile(self, commit_sha, issues, review_comment, incremental_base=None, touched_ranges=None, position_index=None):
+        with self.stage('post'):
+            return reconcile_review(commit_sha, issues, review_comment, incremental_base, touched_ranges, position_index)
     
     # 오류 발생 시, 기존 방식으로 일반 코멘트 게시 (fallback)
-    try:
-        log_info("Attempting to post fallback comment")
-        comment_url = f"https://api.github.com/repos/{repo}/issues/{pr_number}/comments"
-        comment_data = {'body': f"{BOT_SIGNATURE}\n\nCode review failed: {str(e)}\n\nIf available, here's the review:\n\n{review_comment if 'review_comment' in locals() else 'No review available'}"} 
-        response = requests.post(comment_url, headers=github_headers, json=comment_data)
-        log_info(f"Fallback comment posting result: {response.status_code}")
-    except Exception as fallback_e:
-        log_error(f"Fallback also failed: {str(fallback_e)}") 
\ No newline at end of file
+    def post_fallback_comment(self, error, review_comment=None):
+        try:
+            log_info("Attempting to post fallback comment")
+            comment_url = f"{GITHUB_API_URL}/repos/{self.config.repo}/issues/{self.config.pr_number}/comments"
+            comment_data = {'body': f"{BOT_SIGNATURE}\n\nCode review failed: {str(error)}\n\nIf available, here's the review:\n\n{review_comment or 'No review available'}"}
+            with self.stage('post'):
+                response = github_request('POST', comment_url, json=comment_data)
+            log_info(f"Fallback comment posting result: {response.status_code}")
+        except Exception as fallback_e:
+            log_error(f"Fallback also failed: {str(fallback_e)}")
+    
+    # 실행 중 연 git 객체 리더와 심볼 인덱스 연결 정리
+    def close(self):
+        self.state.file_content_provider.close()
+        if self.state.symbol_index:
+            self.state.symbol_index.close()
+            self.state.symbol_index = None
+    
+    # 파이프라인 실행 - mode: review(전체), dry-run(리뷰 결과를 게시하지 않고 출력),
+    # parse-only(diff 수신/파싱만), cleanup-only(이전 봇 코멘트/리뷰 정리만)
+    # 실행 리포트(dict)를 반환하며, 리포트 파일과 작업 요약에도 기록
+    def run(self, mode='review'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        
+        status = 'failed'
+        self.pr_info = self.issues = self.review_comment = None
+        self.state.deadline = Deadline.after(RUN_TIME_BUDGET)
+        self.state.budget_skipped = {}
+        try:
+            log_info(f"Starting code review process ({mode})")
+            log_info(f"Working with repository: {self.config.repo}")
+            log_info(f"Working with PR number: {self.config.pr_number}")
+            status = self.run_stages(mode)
+        except Exception as e:
+            log_error(f"Error: {str(e)}")
+            if mode == 'review':
+                self.post_fallback_comment(e, self.review_comment)
+        finally:
+            self.close()
+        
+        # 단계별 계측 결과를 실행 리포트와 작업 요약으로 남김
+        with self.activate():
+            return write_run_report(
+                status,
+                mode=mode,
+                repository=self.config.repo,
+                pr_number=self.config.pr_number,
+                head_sha=self.pr_info['head_sha'] if self.pr_info else None,
+                issues=len(self.issues) if self.issues is not None else None,
+                token_usage=self.state.token_usage,
+                model_tiers=self.state.model_usage,
+                time_budget={
+                    'budget_seconds': RUN_TIME_BUDGET or None,
+                    'exceeded': self.state.deadline.expired(),
+                    'skipped_llm_requests': self.state.budget_skipped
+                },
+                prescreen=self.state.prescreen_stats,
+                symbol_index=self.state.symbol_index_stats
+            )
+    
+    # 모드별 단계 실행 - 실행 결과 상태(success/skipped) 반환
+    def run_stages(self, mode):
+        self.validate_token()
+        
+        if mode == 'cleanup-only':
+            self.cleanup()
+            return 'success'
+        
+        self.pr_info = pr_info = self.fetch_pr_info()
+        file_changes, incremental_base = self.fetch_review_diff(pr_info)
+        
+        if mode == 'parse-only':
+            hunk_count = sum(len(changes['hunks']) for changes in file_changes.values())
+            print(f"{len(file_changes)} files, {hunk_count} hunks" +
+                  (f" (incremental since {incremental_base[:7]})" if incremental_base else ""))
+            for file_path, changes in file_changes.items():
+                reason = classify_skipped_file(file_path, changes)
+                print(f"  {file_path}: {len(changes['hunks'])} hunks" + (f" [skip: {reason}]" if reason else ""))
+            return 'success'
+        
+        if incremental_base and not file_changes:
+            log_info("No new changes since the last review, skipping")
+            return 'skipped'
+        
+        touched_ranges = get_touched_ranges(file_changes) if incremental_base else None
+        position_index = self.build_position_index(file_changes, incremental_base)
+        self.issues, self.review_comment = self.review(file_changes, position_index)
+        
+        # 오래된 캐시 항목 정리
+        evict_cache()
+        
+        if mode == 'dry-run':
+            placed = [issue for issue in self.issues if issue.get('position') is not None]
+            unplaced = [issue for issue in self.issues if issue.get('position') is None]
+            print(generate_summary(placed, pr_info['head_sha'], incremental_base, unplaced))
+            print()
+            print(self.review_comment)
+            return 'success'
+        
+        # 리뷰 코멘트 게시
+        log_info("Posting review comments")
+        if RECONCILE_COMMENTS:
+            self.reconcile(pr_info['head_sha'], self.issues, self.review_comment, incremental_base, touched_ranges, position_index)
+        else:
+            self.cleanup(touched_ranges)
+            self.post(pr_info['head_sha'], self.issues, self.review_comment, incremental_base, position_index)
+        
+        with self.activate():
+            log_token_usage_summary()
+        log_info("Code review process completed successfully")
+        return 'success'
+
+# 명령행 실행 - python -m code_review [--mode ...] (인자를 생략하면 GitHub Actions 환경 변수 사용)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CodeSage pull request reviewer")
+    parser.add_argument('--mode', choices=CodeSage.MODES, default='review')
+    parser.add_argument('--repo', help="owner/name (default: GITHUB_REPOSITORY)")
+    parser.add_argument('--pr', dest='pr_number', help="pull request number (default: from GITHUB_REF)")
+    parser.add_argument('--full', action='store_true', help="review the whole PR instead of changes since the last review")
+    parser.add_argument('--report', dest='report_path', help="run report path (default: CODESAGE_REPORT_PATH)")
+    args = parser.parse_args(argv)
+    
+    config = CodeSageConfig.from_env(
+        repo=args.repo,
+        pr_number=args.pr_number,
+        incremental=False if args.full else None,
+        report_path=args.report_path
+    )
+    report = CodeSage(config).run(args.mode)
+    
+    # 리뷰 모드는 실패해도 대체 코멘트를 게시하므로 워크플로를 실패시키지 않음
+    if report['status'] == 'failed' and args.mode != 'review':
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,406 @@
 from modelcontextprotocol import FastMCPServer
+import asyncio
+import bisect
+import hashlib
 import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import httpx
+
+from code_review import (
+    GITHUB_API_URL, GITHUB_DIFF_ACCEPT, GITHUB_MAX_RETRIES, github_headers, github_retry_delay,
+    CodeSage, CodeSageConfig, FileContentProvider, FileLines,
+    analyze_issues_by_file, build_position_index, parse_diff, place_issue, review_diff_in_chunks,
+    log_debug, log_info
+)
+
+# 리소스 호출에 저장소를 지정하지 않았을 때 사용할 기본 저장소
+DEFAULT_REPO = os.getenv('GITHUB_REPOSITORY')
+
+# diff 캐시 크기 상한 (diff 원문 기준 바이트) - 넘으면 가장 오래 사용하지 않은 diff부터 제거
+DIFF_CACHE_MAX_BYTES = int(os.getenv('CODESAGE_MCP_DIFF_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# 파일 내용 캐시 크기 상한 (바이트)
+FILE_CACHE_MAX_BYTES = int(os.getenv('CODESAGE_MCP_FILE_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+# 파일 내용 조회 한 번에 돌려주는 최대 라인 수
+MAX_FILE_LINES = 2000
+
+# 원문 그대로 받기 위한 Accept 헤더 (파일 내용 조회)
+GITHUB_RAW_ACCEPT = 'application/vnd.github.raw'
+
+# 청크 목록 한 번에 돌려주는 기본/최대 개수
+DEFAULT_HUNK_LIMIT = 50
+MAX_HUNK_LIMIT = 500
+
+# PR head SHA를 다시 확인하지 않고 재사용하는 시간(초) - 에이전트의 연속 호출은 GitHub 요청 없이 캐시에서 응답
+PR_HEAD_TTL_SECONDS = float(os.getenv('CODESAGE_MCP_HEAD_TTL', '10'))
+
+# 파싱된 diff 한 건 - 원문은 보관하지 않고 파일 헤더와 청크 레코드에서 필요한 부분만 다시 구성
+class CachedDiff:
+    def __init__(self, head_sha, file_changes, size):
+        self.head_sha = head_sha
+        self.file_changes = file_changes
+        self.size = size
+        self.position_index = None
+        self.hunk_list = None
+
+    def get_position_index(self):
+        if self.position_index is None:
+            self.position_index = build_position_index(self.file_changes)
+        return self.position_index
+
+    def file_text(self, file_path):
+        changes = self.file_changes[file_path]
+        return "\n".join(changes['header'] + [hunk.text() for hunk in changes['hunks']])
+
+    def text(self, files=None):
+        return "\n".join(self.file_text(file_path) for file_path in (files or self.file_changes))
+
+    # 모든 파일의 (청크, 파일 내 순번)을 diff 순서대로 (페이지 조회용으로 한 번만 구성)
+    def hunks(self):
+        if self.hunk_list is None:
+            self.hunk_list = [
+                (hunk, index)
+                for changes in self.file_changes.values()
+                for index, hunk in enumerate(changes['hunks'])
+            ]
+        return self.hunk_list
+
+# 커밋 기준 파일 내용 한 건 (같은 커밋의 파일 내용은 바뀌지 않으므로 만료 없이 캐시)
+class CachedFile:
+    def __init__(self, ref, lines, size):
+        self.ref = ref
+        self.lines = lines
+        self.size = size
+
+# 크기 상한이 있는 LRU 캐시 (diff는 (repo, pr, head_sha), 파일 내용은 (repo, ref, path) 키)
+# 같은 키를 동시에 요청하면 한 번만 가져옴
+class ResourceCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key, fetch):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if key not in self.pending:
+            self.misses += 1
+            self.pending[key] = asyncio.ensure_future(fetch())
+        task = self.pending[key]
+        try:
+            entry = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self.pending.pop(key, None)
+        self.put(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        if key in self.entries:
+            return
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            log_debug(f"Evicted {'/'.join(evicted_key)} from cache")
+
+# 응답용 청크 레코드
+def hunk_record(hunk, index):
+    return {
+        'file': hunk.file,
+        'index': index,
+        'header': hunk.header,
+        'old_start': hunk.old_start,
+        'old_count': hunk.old_count,
+        'new_start': hunk.new_start,
+        'new_count': hunk.new_count,
+        'position': hunk.position,
+        'text': hunk.text()
+    }
+
+# 페이지 크기 보정
+def page_limit(limit, maximum):
+    return max(1, min(int(limit), maximum))
 
 class CodeSageMCPServer(FastMCPServer):
-    async def get_diff(self, pr_number: str) -> str:
-        # get diff from github api (example)
-        diff = (
-            "diff --git a/file.py b/file.py\n"
-            "--- a/file.py\n"
-            "+++ b/file.py\n"
-            "@@ -1 +1 @@\n"
-            "- print('Hello')\n"
-            "+ print('Hello, World!')"
+    def __init__(self, *args, github_token=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.github_token = github_token or os.getenv('GITHUB_TOKEN')
+        self.http_client = None
+        self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.diff_cache = ResourceCache(DIFF_CACHE_MAX_BYTES)
+        self.file_cache = ResourceCache(FILE_CACHE_MAX_BYTES)
+        # PR head/base 조회 결과 (ETag 조건부 요청으로 변경 여부만 확인)
+        self.pr_heads = {}
+        self.pr_head_pending = {}
+
+    # 모든 리소스 호출이 공유하는 비동기 HTTP 클라이언트 (keep-alive 연결 재사용)
+    def client(self):
+        if self.http_client is None:
+            headers = dict(github_headers)
+            if self.github_token:
+                headers['Authorization'] = f'Bearer {self.github_token}'
+            self.http_client = httpx.AsyncClient(
+                base_url=GITHUB_API_URL,
+                headers=headers,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+            )
+        return self.http_client
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    # GitHub API 요청 (5xx/429 재시도는 code_review.py와 같은 규칙 사용)
+    async def github_get(self, path, **kwargs):
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            response = await self.client().get(path, **kwargs)
+            wait = github_retry_delay(response, attempt, True) if attempt < GITHUB_MAX_RETRIES else None
+            if wait is None:
+                return response
+            log_info(f"GitHub GET {path} returned {response.status_code}, retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    # PR의 현재 (head SHA, base SHA) (잠시 재사용하고, 이후에는 이전 응답의 ETag로 조건부 요청 - 변경이 없으면 304로 rate limit을 쓰지 않음)
+    # 같은 PR을 동시에 조회하면 요청 하나를 공유
+    async def get_pr_shas(self, repo, pr_number):
+        key = (repo, str(pr_number))
+        cached = self.pr_heads.get(key)
+        if cached and time.monotonic() - cached[3] < PR_HEAD_TTL_SECONDS:
+            return cached[1], cached[2]
+        if key not in self.pr_head_pending:
+            self.pr_head_pending[key] = asyncio.ensure_future(self.fetch_pr_shas(repo, pr_number, cached))
+        task = self.pr_head_pending[key]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self.pr_head_pending.pop(key, None)
+
+    async def fetch_pr_shas(self, repo, pr_number, cached):
+        key = (repo, str(pr_number))
+        headers = {'If-None-Match': cached[0]} if cached and cached[0] else {}
+        response = await self.github_get(f"/repos/{repo}/pulls/{pr_number}", headers=headers)
+        if response.status_code == 304 and cached:
+            self.pr_heads[key] = cached[:3] + (time.monotonic(),)
+            return cached[1], cached[2]
+        response.raise_for_status()
+        pull = response.json()
+        self.pr_heads[key] = (response.headers.get('ETag'), pull['head']['sha'], pull['base']['sha'], time.monotonic())
+        return pull['head']['sha'], pull['base']['sha']
+
+    # 지정한 head 커밋 기준 PR diff - PR diff 엔드포인트는 항상 최신 head를 돌려주므로
+    # (요청 사이에 push가 있거나 이전 head를 요청하면 캐시 키와 내용이 달라짐) base...head 비교 diff로 가져옴
+    async def fetch_diff(self, repo, pr_number, base_sha, head_sha):
+        response = await self.github_get(f"/repos/{repo}/compare/{base_sha}...{head_sha}", headers={'Accept': GITHUB_DIFF_ACCEPT})
+        response.raise_for_status()
+        file_changes = parse_diff(response.text)
+        log_info(f"Fetched diff for {repo}#{pr_number}@{head_sha[:7]}: {len(file_changes)} files, {len(response.content)} bytes")
+        return CachedDiff(head_sha, file_changes, len(response.content))
+
+    # 캐시된 diff 조회 - head_sha를 생략하면 PR의 현재 head 기준
+    async def load_diff(self, pr_number, repo=None, head_sha=None):
+        repo = repo or DEFAULT_REPO
+        if not repo:
+            raise ValueError("repo is required (or set GITHUB_REPOSITORY)")
+        current_head, base_sha = await self.get_pr_shas(repo, pr_number)
+        head_sha = head_sha or current_head
+        key = (repo, str(pr_number), head_sha)
+        return await self.diff_cache.get(key, lambda: self.fetch_diff(repo, pr_number, base_sha, head_sha))
+
+    # PR diff 원문 (file을 주면 해당 파일 부분만)
+    async def get_diff(self, pr_number: str, repo: str = None, head_sha: str = None, file: str = None) -> str:
+        diff = await self.load_diff(pr_number, repo, head_sha)
+        if file is not None:
+            if file not in diff.file_changes:
+                raise KeyError(f"{file} is not part of the diff")
+            return diff.file_text(file)
+        return diff.text()
+
+    # 변경 파일 목록과 파일별 청크 수
+    async def get_diff_files(self, pr_number: str, repo: str = None, head_sha: str = None) -> str:
+        diff = await self.load_diff(pr_number, repo, head_sha)
+        return json.dumps({
+            'head_sha': diff.head_sha,
+            'files': [
+                {'file': file_path, 'hunks': len(changes['hunks'])}
+                for file_path, changes in diff.file_changes.items()
+            ]
+        })
+
+    # 파일별 청크 일부 (cursor부터 limit개) - 다음 조회 위치는 next_cursor (마지막이면 None)
+    async def get_diff_hunks(self, pr_number: str, file: str, repo: str = None, head_sha: str = None,
+                             cursor: int = 0, limit: int = DEFAULT_HUNK_LIMIT) -> str:
+        diff = await self.load_diff(pr_number, repo, head_sha)
+        hunks = diff.file_changes[file]['hunks']
+        cursor = max(0, int(cursor))
+        end = min(cursor + page_limit(limit, MAX_HUNK_LIMIT), len(hunks))
+        return json.dumps({
+            'head_sha': diff.head_sha,
+            'file': file,
+            'total': len(hunks),
+            'hunks': [hunk_record(hunk, i) for i, hunk in enumerate(hunks[cursor:end], cursor)],
+            'next_cursor': end if end < len(hunks) else None
+        }, ensure_ascii=False)
+
+    # 파일의 새 파일 라인 번호 -> diff position 매핑 (start_line~end_line 범위만)
+    async def get_position_index(self, pr_number: str, file: str, repo: str = None, head_sha: str = None,
+                                 start_line: int = 1, end_line: int = None) -> str:
+        diff = await self.load_diff(pr_number, repo, head_sha)
+        index = diff.get_position_index().get(file)
+        if index is None:
+            return json.dumps({'head_sha': diff.head_sha, 'file': file, 'lines': []})
+        # 라인 번호 배열이 정렬되어 있으므로 범위 경계만 이진 탐색
+        lo = bisect.bisect_left(index.lines, max(1, int(start_line)))
+        hi = bisect.bisect_right(index.lines, int(end_line)) if end_line is not None else len(index.lines)
+        return json.dumps({
+            'head_sha': diff.head_sha,
+            'file': file,
+            'lines': [[index.lines[i], index.positions[i]] for i in range(lo, hi)]
+        })
+
+    # [도구] diff 파싱 - diff 원문을 주거나 PR을 지정, 모든 파일의 청크를 순서대로 cursor부터 limit개씩
+    # 같은 원문은 내용 해시로 캐시하므로 다음 페이지 요청에서 다시 파싱하지 않음
+    async def parse_pr_diff(self, diff: str = None, pr_number: str = None, repo: str = None, head_sha: str = None,
+                            cursor: int = 0, limit: int = DEFAULT_HUNK_LIMIT) -> str:
+        if diff is not None:
+            digest = hashlib.sha256(diff.encode('utf-8')).hexdigest()
+            parsed = await self.diff_cache.get(
+                ('inline', digest, ''),
+                lambda: self.parse_inline_diff(diff, digest)
+            )
+        elif pr_number is not None:
+            parsed = await self.load_diff(pr_number, repo, head_sha)
+        else:
+            raise ValueError("diff or pr_number is required")
+        
+        hunks = parsed.hunks()
+        cursor = max(0, int(cursor))
+        end = min(cursor + page_limit(limit, MAX_HUNK_LIMIT), len(hunks))
+        return json.dumps({
+            'head_sha': parsed.head_sha,
+            'files': len(parsed.file_changes),
+            'total': len(hunks),
+            'hunks': [hunk_record(hunk, index) for hunk, index in hunks[cursor:end]],
+            'next_cursor': end if end < len(hunks) else None
+        }, ensure_ascii=False)
+
+    async def parse_inline_diff(self, diff, digest):
+        return CachedDiff(None, parse_diff(diff), len(diff))
+
+    # [도구] 일부 파일만 리뷰 - 이슈가 나오는 대로 한 건씩 보내고, 마지막에 병합된 전체 결과를 보냄
+    # analyze를 주면 마지막 결과의 이슈에 상세 분석을 덧붙임 (head 커밋의 파일 내용 기준)
+    async def review_files(self, pr_number: str, files: list, repo: str = None, head_sha: str = None,
+                           analyze: bool = False):
+        repo = repo or DEFAULT_REPO
+        diff = await self.load_diff(pr_number, repo, head_sha)
+        missing = [file_path for file_path in files if file_path not in diff.file_changes]
+        if missing:
+            raise KeyError(f"Not part of the diff: {', '.join(missing)}")
+        file_changes = {file_path: diff.file_changes[file_path] for file_path in files}
+        position_index = {file_path: index for file_path, index in diff.get_position_index().items() if file_path in file_changes}
+        
+        # 서버의 작업 디렉터리는 대상 저장소의 체크아웃이 아니므로 파일 내용은 GitHub에서만 읽고 심볼 인덱스는 사용하지 않음
+        config = CodeSageConfig(repo, pr_number, self.github_token, self.openai_api_key, report_path=None, local_checkout=False)
+        reviewer = CodeSage(config)
+        reviewer.state.file_content_provider = FileContentProvider(diff.head_sha, local=False)
+        if analyze:
+            # 상세 분석 컨텍스트는 서버의 파일 캐시(GitHub 기준 head 커밋 내용)에서 미리 채워 둠
+            contents = await asyncio.gather(*(
+                self.file_cache.get((repo, diff.head_sha, file_path), lambda file_path=file_path: self.fetch_file(repo, diff.head_sha, file_path))
+                for file_path in files
+            ), return_exceptions=True)
+            for file_path, cached in zip(files, contents):
+                if isinstance(cached, CachedFile):
+                    reviewer.state.file_content_provider.files[file_path] = cached.lines
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        
+        # 리뷰 스레드에서 호출됨 - 이벤트 루프로 넘겨서 바로 전송
+        def on_issue(issue):
+            placed = dict(place_issue(dict(issue), position_index))
+            loop.call_soon_threadsafe(events.put_nowait, placed)
+        
+        def run_review():
+            try:
+                with reviewer.stage('review'):
+                    issues, review_comment = review_diff_in_chunks(file_changes, on_issue)
+                with reviewer.stage('analysis'):
+                    if analyze:
+                        issues = analyze_issues_by_file(issues, position_index)
+                    else:
+                        issues = [place_issue(issue, position_index) for issue in issues]
+                return issues, review_comment
+            finally:
+                reviewer.close()
+        
+        task = loop.run_in_executor(None, run_review)
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        while True:
+            issue = await events.get()
+            if issue is None:
+                break
+            yield json.dumps({'type': 'issue', 'issue': issue}, ensure_ascii=False)
+        
+        issues, review_comment = await task
+        yield json.dumps({
+            'type': 'result',
+            'head_sha': diff.head_sha,
+            'issues': issues,
+            'review': review_comment,
+            'token_usage': reviewer.state.token_usage
+        }, ensure_ascii=False)
+
+    # [도구] 커밋 기준 파일 내용 - start_line부터 최대 limit 라인, 다음 조회 시작 라인은 next_line (마지막이면 None)
+    async def get_file_content(self, path: str, ref: str, repo: str = None, start_line: int = 1,
+                               end_line: int = None, limit: int = MAX_FILE_LINES) -> str:
+        repo = repo or DEFAULT_REPO
+        if not repo:
+            raise ValueError("repo is required (or set GITHUB_REPOSITORY)")
+        cached = await self.file_cache.get((repo, ref, path), lambda: self.fetch_file(repo, ref, path))
+        lines = cached.lines
+        start = max(1, int(start_line))
+        end = min(len(lines), int(end_line) if end_line is not None else len(lines), start + page_limit(limit, MAX_FILE_LINES) - 1)
+        return json.dumps({
+            'path': path,
+            'ref': ref,
+            'total_lines': len(lines),
+            'start_line': start,
+            'end_line': end,
+            'text': "\n".join(lines[i] for i in range(start - 1, end)),
+            'next_line': end + 1 if end < len(lines) and (end_line is None or end < int(end_line)) else None
+        }, ensure_ascii=False)
+
+    async def fetch_file(self, repo, ref, path):
+        response = await self.github_get(
+            f"/repos/{repo}/contents/{quote(path)}",
+            params={'ref': ref},
+            headers={'Accept': GITHUB_RAW_ACCEPT}
         )
-        return diff
+        response.raise_for_status()
+        return CachedFile(ref, FileLines(response.text), len(response.content))
 
-server = CodeSageMCPServer()
-server.register_resource("get_diff", server.get_diff)
-server.run(host="localhost", port=8000) 
\ No newline at end of file
+if __name__ == '__main__':
+    server = CodeSageMCPServer()
+    server.register_resource("get_diff", server.get_diff)
+    server.register_resource("get_diff_files", server.get_diff_files)
+    server.register_resource("get_diff_hunks", server.get_diff_hunks)
+    server.register_resource("get_position_index", server.get_position_index)
+    server.register_tool("parse_diff", server.parse_pr_diff)
+    server.register_tool("review_files", server.review_files)
+    server.register_tool("get_file_content", server.get_file_content)
+    server.run(host="localhost", port=8000)
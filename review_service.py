@@ -0,0 +1,374 @@
+# CodeSage 상주 리뷰 서비스
+#
+# GitHub 웹훅(pull_request 이벤트)이나 명령행으로 받은 리뷰 작업을 로컬 SQLite 큐에 저장하고,
+# 워커 풀이 PR별로 하나씩 꺼내 CodeSage 리뷰를 실행. 프로세스가 계속 살아 있으므로
+# GitHub 세션, OpenAI 클라이언트, 디스크 캐시를 PR 사이에 재사용.
+#
+# 같은 PR에 대해 아직 시작하지 않은 작업이 있으면 새 작업을 추가하지 않고 기존 작업의 head만 갱신하므로
+# 연속 push(synchronize)가 몰려도 최신 head에 대해 한 번만 리뷰.
+#
+# 예시:
+#     python review_service.py serve --port 8080 --workers 4
+#     CODESAGE_WEBHOOK_SECRET=... python review_service.py serve --host 0.0.0.0
+#     python review_service.py submit --repo owner/name --pr 12
+#     python review_service.py status
+#
+# 로컬 대역 서버(bench/fake_server.py)를 대상으로 실행하려면 GITHUB_API_URL, GITHUB_GRAPHQL_URL,
+# OPENAI_BASE_URL 환경 변수를 대역 서버 주소로 지정.
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from code_review import CodeSage, CodeSageConfig, log_info, log_error
+
+# 큐 데이터베이스 경로, 워커 수, 웹훅 서명 검증용 비밀 값
+SERVICE_DB_PATH = os.getenv('CODESAGE_SERVICE_DB', os.path.join(os.getenv('CODESAGE_CACHE_DIR', '.codesage_cache'), 'service.db'))
+SERVICE_WORKERS = max(1, int(os.getenv('CODESAGE_SERVICE_WORKERS', '4')))
+WEBHOOK_SECRET = os.getenv('CODESAGE_WEBHOOK_SECRET')
+
+# 저장소별 로컬 체크아웃 루트 - <루트>/<owner>/<name> 이 있으면 상세 분석 컨텍스트와 심볼 인덱스를 그 체크아웃에서 만들고,
+# 없으면 파일 내용은 GitHub contents API로 읽고 심볼 인덱스는 사용하지 않음 (서비스 작업 디렉터리의 파일을 쓰지 않도록)
+SERVICE_WORKSPACE_ROOT = os.getenv('CODESAGE_SERVICE_WORKSPACE_ROOT')
+
+# 새 작업이 없을 때 큐를 다시 확인하는 간격(초) - 다른 프로세스(submit 명령)가 추가한 작업 감지용
+QUEUE_POLL_INTERVAL = float(os.getenv('CODESAGE_SERVICE_POLL_INTERVAL', '1'))
+
+# 리뷰를 시작하는 pull_request 이벤트 액션
+REVIEW_ACTIONS = ('opened', 'synchronize', 'reopened', 'ready_for_review')
+
+JOB_COLUMNS = ('id', 'repo', 'pr_number', 'head_sha', 'mode', 'event', 'status', 'coalesced',
+               'enqueued_at', 'updated_at', 'started_at', 'finished_at', 'error', 'report')
+
+
+# SQLite 기반 영속 작업 큐 (재시작 후에도 대기/실행 중이던 작업을 이어서 처리)
+class JobQueue:
+    def __init__(self, path=SERVICE_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.changed = threading.Condition()
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    repo TEXT NOT NULL,
+                    pr_number TEXT NOT NULL,
+                    head_sha TEXT,
+                    mode TEXT NOT NULL DEFAULT 'review',
+                    event TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    coalesced INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    error TEXT,
+                    report TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_pr ON jobs (repo, pr_number, status)")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    # 작업 추가 - 같은 PR/모드의 대기 중인 작업이 있으면 head만 갱신하고 그 작업 ID 반환 (큐 순서는 유지)
+    def enqueue(self, repo, pr_number, head_sha=None, mode='review', event=None):
+        now = time.time()
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE repo = ? AND pr_number = ? AND mode = ? AND status = 'queued'",
+                (repo, str(pr_number), mode)
+            ).fetchone()
+            if row:
+                job_id = row[0]
+                db.execute(
+                    "UPDATE jobs SET head_sha = COALESCE(?, head_sha), event = ?, coalesced = coalesced + 1, updated_at = ? WHERE id = ?",
+                    (head_sha, event, now, job_id)
+                )
+                log_info(f"Coalesced {repo}#{pr_number} ({event or mode}) into queued job {job_id}")
+            else:
+                job_id = db.execute(
+                    "INSERT INTO jobs (repo, pr_number, head_sha, mode, event, enqueued_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (repo, str(pr_number), head_sha, mode, event, now, now)
+                ).lastrowid
+                log_info(f"Queued job {job_id} for {repo}#{pr_number} ({event or mode})")
+            db.execute("COMMIT")
+        with self.changed:
+            self.changed.notify_all()
+        return job_id
+
+    # 가장 오래된 대기 작업을 실행 상태로 가져옴 - 같은 PR의 작업이 실행 중이면 건너뜀 (PR별 직렬 실행)
+    def claim(self):
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("""
+                SELECT * FROM jobs AS queued
+                WHERE status = 'queued' AND NOT EXISTS (
+                    SELECT 1 FROM jobs AS running
+                    WHERE running.status = 'running' AND running.repo = queued.repo AND running.pr_number = queued.pr_number
+                )
+                ORDER BY enqueued_at, id LIMIT 1
+            """).fetchone()
+            if row:
+                db.execute("UPDATE jobs SET status = 'running', started_at = ?, updated_at = ? WHERE id = ?",
+                           (time.time(), time.time(), row[0]))
+            db.execute("COMMIT")
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+    def complete(self, job_id, status, error=None, report=None):
+        with self.connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, report = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, json.dumps(report, ensure_ascii=False) if report else None, time.time(), time.time(), job_id)
+            )
+        with self.changed:
+            self.changed.notify_all()
+
+    # 이전 프로세스가 실행하다 중단된 작업을 다시 대기 상태로
+    def requeue_interrupted(self):
+        with self.connect() as db:
+            count = db.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'").rowcount
+        if count:
+            log_info(f"Requeued {count} interrupted jobs")
+        return count
+
+    def wait_for_change(self, timeout):
+        with self.changed:
+            self.changed.wait(timeout)
+
+    def jobs(self, limit=50):
+        with self.connect() as db:
+            rows = db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+    def counts(self):
+        with self.connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+# 작업 큐를 처리하는 워커 풀 - 워커는 작업마다 CodeSage 리뷰어를 만들어 실행
+class ReviewService:
+    def __init__(self, queue, workers=SERVICE_WORKERS, github_token=None, openai_api_key=None,
+                 workspace_root=SERVICE_WORKSPACE_ROOT):
+        self.queue = queue
+        self.workers = workers
+        self.workspace_root = workspace_root
+        self.github_token = github_token or os.getenv('GITHUB_TOKEN')
+        self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.queue.requeue_interrupted()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"codesage-worker-{i + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        log_info(f"Review service started with {self.workers} workers")
+        return self
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        with self.queue.changed:
+            self.queue.changed.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def work(self):
+        while not self.stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.queue.wait_for_change(QUEUE_POLL_INTERVAL)
+                continue
+            self.run_job(job)
+
+    def workspace_for(self, repo):
+        if not self.workspace_root:
+            return None
+        path = os.path.join(self.workspace_root, *repo.split('/'))
+        return path if os.path.isdir(path) else None
+
+    def run_job(self, job):
+        log_info(f"Starting job {job['id']}: {job['repo']}#{job['pr_number']} ({job['mode']}, head {(job['head_sha'] or 'latest')[:7]})")
+        workspace = self.workspace_for(job['repo'])
+        config = CodeSageConfig(
+            repo=job['repo'],
+            pr_number=job['pr_number'],
+            github_token=self.github_token,
+            openai_api_key=self.openai_api_key,
+            report_path=None,
+            workspace=workspace,
+            local_checkout=workspace is not None
+        )
+        try:
+            report = CodeSage(config).run(job['mode'])
+        except Exception as e:
+            log_error(f"Job {job['id']} crashed: {str(e)}")
+            self.queue.complete(job['id'], 'failed', error=str(e))
+            return
+        status = 'failed' if report['status'] == 'failed' else 'done'
+        self.queue.complete(job['id'], status, report=report)
+        log_info(f"Finished job {job['id']} ({report['status']}, {report['total_seconds']:.1f}s)")
+
+
+# GitHub 웹훅 서명(X-Hub-Signature-256) 검증 - 비밀 값이 설정되지 않았으면 검증하지 않음
+# (비밀 값 없이는 루프백 주소에서만 서비스를 시작하므로 같은 호스트의 요청만 받음)
+def verify_signature(body, signature, secret=WEBHOOK_SECRET):
+    if not secret:
+        return True
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+# 웹훅 이벤트를 작업으로 변환 (리뷰 대상이 아니면 None)
+def job_from_webhook(event, payload):
+    if event != 'pull_request' or payload.get('action') not in REVIEW_ACTIONS:
+        return None
+    pull_request = payload.get('pull_request') or {}
+    if pull_request.get('draft') and payload.get('action') != 'ready_for_review':
+        return None
+    return {
+        'repo': (payload.get('repository') or {}).get('full_name'),
+        'pr_number': payload.get('number') or pull_request.get('number'),
+        'head_sha': (pull_request.get('head') or {}).get('sha'),
+        'event': payload.get('action')
+    }
+
+
+def make_handler(queue):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, payload, status=200):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/healthz':
+                self.send_json({'status': 'ok', 'jobs': queue.counts()})
+            elif self.path == '/jobs':
+                self.send_json([{key: value for key, value in job.items() if key != 'report'} for job in queue.jobs()])
+            else:
+                self.send_json({'message': 'Not Found'}, 404)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.path == '/webhook':
+                if not verify_signature(body, self.headers.get('X-Hub-Signature-256')):
+                    return self.send_json({'message': 'Invalid signature'}, 401)
+                try:
+                    job = job_from_webhook(self.headers.get('X-GitHub-Event'), json.loads(body or b'{}'))
+                except ValueError:
+                    return self.send_json({'message': 'Invalid payload'}, 400)
+                if not job or not job['repo'] or not job['pr_number']:
+                    return self.send_json({'message': 'Ignored'}, 202)
+                job_id = queue.enqueue(job['repo'], job['pr_number'], job['head_sha'], event=job['event'])
+                self.send_json({'job_id': job_id}, 202)
+            elif self.path == '/jobs':
+                # 명령행/내부 도구용 작업 제출 (웹훅과 같은 비밀 값으로 서명)
+                if not verify_signature(body, self.headers.get('X-Hub-Signature-256')):
+                    return self.send_json({'message': 'Invalid signature'}, 401)
+                try:
+                    job = json.loads(body or b'{}')
+                    job_id = queue.enqueue(job['repo'], job['pr_number'], job.get('head_sha'),
+                                           job.get('mode', 'review'), job.get('event', 'manual'))
+                except (ValueError, KeyError):
+                    return self.send_json({'message': 'Invalid job'}, 400)
+                self.send_json({'job_id': job_id}, 202)
+            else:
+                self.send_json({'message': 'Not Found'}, 404)
+
+    return WebhookHandler
+
+
+# 루프백 주소인지 확인 (호스트 이름은 localhost만 인정)
+def is_loopback_host(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(args):
+    # 서명 검증 없이 외부에 열면 누구나 서비스의 GitHub/OpenAI 토큰으로 임의 저장소 리뷰를 실행할 수 있음
+    if not WEBHOOK_SECRET and not is_loopback_host(args.host):
+        log_error(f"Refusing to listen on {args.host} without CODESAGE_WEBHOOK_SECRET; set a secret or use a loopback --host")
+        return 1
+    queue = JobQueue(args.db)
+    service = ReviewService(queue, args.workers, workspace_root=args.workspace_root).start()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(queue))
+    httpd.daemon_threads = True
+    log_info(f"Listening for webhooks on http://{args.host}:{httpd.server_address[1]}/webhook")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop(timeout=30)
+    return 0
+
+
+def submit(args):
+    job_id = JobQueue(args.db).enqueue(args.repo, args.pr_number, args.head_sha, args.mode, 'manual')
+    print(job_id)
+    return 0
+
+
+def status(args):
+    queue = JobQueue(args.db)
+    print(json.dumps(queue.counts()))
+    for job in queue.jobs(args.limit):
+        duration = f"{job['finished_at'] - job['started_at']:.1f}s" if job['finished_at'] and job['started_at'] else '-'
+        print(f"{job['id']:>6} {job['status']:>8} {job['repo']}#{job['pr_number']} {job['mode']} "
+              f"head={(job['head_sha'] or '-')[:7]} coalesced={job['coalesced']} {duration} {job['error'] or ''}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CodeSage long-running review service")
+    parser.add_argument('--db', default=SERVICE_DB_PATH, help="queue database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the webhook server and worker pool")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="listen address (non-loopback requires CODESAGE_WEBHOOK_SECRET)")
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--workers', type=int, default=SERVICE_WORKERS)
+    serve_parser.add_argument('--workspace-root', default=SERVICE_WORKSPACE_ROOT, help="directory of <owner>/<name> checkouts")
+    serve_parser.set_defaults(func=serve)
+
+    submit_parser = commands.add_parser('submit', help="queue a review job")
+    submit_parser.add_argument('--repo', required=True)
+    submit_parser.add_argument('--pr', dest='pr_number', required=True)
+    submit_parser.add_argument('--head', dest='head_sha')
+    submit_parser.add_argument('--mode', choices=CodeSage.MODES, default='review')
+    submit_parser.set_defaults(func=submit)
+
+    status_parser = commands.add_parser('status', help="show recent jobs")
+    status_parser.add_argument('--limit', type=int, default=20)
+    status_parser.set_defaults(func=status)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# 저장소 루트의 code_review 모듈을 테스트에서 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_review
+
+
+def make_diff(path, *hunks):
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n" + "".join(hunks)
+
+
+# 테스트마다 새 실행 상태를 현재 컨텍스트로 설정 (GitHub/OpenAI 호출 없음)
+@pytest.fixture
+def run():
+    state = code_review.RunState(code_review.CodeSageConfig('owner/repo', 1, github_token='token', report_path=None))
+    token = code_review.current_run_var.set(state)
+    try:
+        yield state
+    finally:
+        code_review.current_run_var.reset(token)
+        state.file_content_provider.close()
+
+
+# head 파일 내용 - {경로: 내용 문자열}을 채우면 get_file_lines가 그 내용을 반환
+@pytest.fixture
+def file_lines(monkeypatch):
+    files = {}
+    monkeypatch.setattr(code_review, 'get_file_lines',
+                        lambda path: code_review.FileLines(files[path]) if path in files else None)
+    return files
+
+
+# 디스크 캐시를 테스트별 임시 디렉터리로 사용
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(code_review, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(code_review, 'CACHE_ENABLED', True)
+    return tmp_path / 'cache'
@@ -0,0 +1,36 @@
+from code_review import LINE_ADDED, LINE_CONTEXT, LINE_DELETED, LINE_META, PositionIndex, parse_diff
+
+from conftest import make_diff
+
+
+def test_missing_hunk_counts_default_to_one():
+    diff = make_diff('one.py', "@@ -1 +1 @@\n-old\n+new\n") + make_diff('new.py', "@@ -0,0 +1 @@\n+created\n")
+    changes = parse_diff(diff)
+
+    hunk = changes['one.py']['hunks'][0]
+    assert (hunk.old_start, hunk.old_count, hunk.new_start, hunk.new_count) == (1, 1, 1, 1)
+    assert list(hunk.kinds) == [LINE_DELETED, LINE_ADDED]
+    assert PositionIndex([hunk]).position_for_line(1) == 2
+
+    created = changes['new.py']['hunks'][0]
+    assert (created.old_start, created.old_count, created.new_start, created.new_count) == (0, 0, 1, 1)
+    assert PositionIndex([created]).position_for_line(1) == 1
+
+
+def test_no_newline_marker_takes_a_position_but_not_a_line():
+    diff = make_diff(
+        'tail.py',
+        "@@ -1,2 +1,2 @@\n"
+        " a\n"
+        "-b\n"
+        "\\ No newline at end of file\n"
+        "+b\n"
+        "\\ No newline at end of file\n"
+    )
+    hunk = parse_diff(diff)['tail.py']['hunks'][0]
+    assert list(hunk.kinds) == [LINE_CONTEXT, LINE_DELETED, LINE_META, LINE_ADDED, LINE_META]
+    assert [new_line for _, _, _, new_line in hunk.iter_lines()] == [1, None, None, 2, None]
+
+    index = PositionIndex([hunk])
+    assert index.position_for_line(2) == 4
+    assert index.line_for_position(3) is None
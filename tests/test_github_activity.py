@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+import code_review
+from code_review import BOT_SIGNATURE
+
+BOT = {'login': 'github-actions[bot]'}
+
+
+def thread(comment_id, review_id, line, outdated=False):
+    return {
+        'id': f"PRRT_{comment_id}",
+        'isResolved': False,
+        'comments': {'nodes': [{
+            'databaseId': comment_id, 'body': f"{BOT_SIGNATURE}\n\n**품질**", 'path': 'app.py', 'line': line,
+            'outdated': outdated, 'createdAt': '2025-01-01T00:00:00Z', 'author': BOT,
+            'pullRequestReview': {'databaseId': review_id}
+        }]}
+    }
+
+
+def review(review_id, state='CHANGES_REQUESTED'):
+    return {'databaseId': review_id, 'body': BOT_SIGNATURE, 'state': state,
+            'submittedAt': '2025-01-01T00:00:00Z', 'author': BOT}
+
+
+def page(nodes):
+    return {'pageInfo': {'hasNextPage': False, 'endCursor': None}, 'nodes': nodes}
+
+
+# PR 활동을 GraphQL 응답 형태로 돌려주고, 정리 요청(DELETE/PUT)을 기록하는 GitHub 대역
+@pytest.fixture
+def github(monkeypatch, run):
+    calls = []
+    state = {'threads': [], 'reviews': []}
+
+    def request(method, url, **kwargs):
+        calls.append((method, url))
+        if method == 'POST' and url == code_review.GITHUB_GRAPHQL_URL:
+            pull = {'headRefOid': 'h' * 40, 'baseRefOid': 'b' * 40,
+                    'comments': page([]), 'reviewThreads': page(state['threads']), 'reviews': page(state['reviews'])}
+            return SimpleNamespace(status_code=200, json=lambda: {'data': {'repository': {'pullRequest': pull}}})
+        return SimpleNamespace(status_code=204 if method == 'DELETE' else 200, text='')
+
+    monkeypatch.setattr(code_review, 'github_request', request)
+    monkeypatch.setattr(code_review, 'wait_for_cleanup', lambda *args: True)
+    state['calls'] = calls
+    return state
+
+
+def test_graphql_review_comments_carry_their_review_id(github):
+    github['threads'] = [thread(11, 1, 5), thread(12, 2, 40, outdated=True)]
+    activity = code_review.fetch_bot_activity_graphql()
+    assert [(c['id'], c['pull_request_review_id'], c['position']) for c in activity['review_comments']] == [
+        (11, 1, 5), (12, 2, None)
+    ]
+
+
+def test_incremental_cleanup_dismisses_only_fully_cleared_reviews(github):
+    # 리뷰 1: 코멘트가 모두 변경 범위 안 -> 삭제 후 dismiss
+    # 리뷰 2: 범위 밖 코멘트가 남음 -> dismiss하지 않음
+    # 리뷰 3: 인라인 코멘트가 없는 요약 리뷰 -> 유지
+    github['threads'] = [thread(11, 1, 5), thread(21, 2, 6), thread(22, 2, 90)]
+    github['reviews'] = [review(1), review(2), review(3)]
+
+    code_review.cleanup_previous_activity({'app.py': [(1, 10)]})
+
+    calls = github['calls']
+    assert sorted(url.rsplit('/', 1)[-1] for method, url in calls if method == 'DELETE') == ['11', '21']
+    assert [url.split('/reviews/')[1] for method, url in calls if method == 'PUT'] == ['1/dismissals']
+    # 증분 정리는 이전 요약 코멘트를 Outdated로 바꾸지 않음
+    assert not any(method == 'PATCH' for method, _ in calls)
+
+
+def test_full_cleanup_dismisses_every_bot_review(github):
+    github['threads'] = [thread(11, 1, 5), thread(22, 2, 90)]
+    github['reviews'] = [review(1), review(2), review(3, state='COMMENTED')]
+
+    code_review.cleanup_previous_activity()
+
+    dismissed = sorted(url.split('/reviews/')[1] for method, url in github['calls'] if method == 'PUT')
+    assert dismissed == ['1/dismissals', '2/dismissals']
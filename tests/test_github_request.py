@@ -0,0 +1,81 @@
+import requests
+import pytest
+
+import code_review
+from code_review import EtagCache
+
+
+def make_response(status_code, body=b'', etag=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.encoding = 'utf-8'
+    if etag:
+        response.headers['ETag'] = etag
+    return response
+
+
+# 요청 헤더를 기록하고, If-None-Match가 현재 ETag와 같으면 304를 돌려주는 GitHub 대역
+@pytest.fixture
+def session(monkeypatch):
+    server = {'etag': '"v1"', 'body': b'{"secret": 1}', 'requests': []}
+
+    def request(method, url, headers=None, **kwargs):
+        server['requests'].append(dict(headers or {}))
+        if (headers or {}).get('If-None-Match') == server['etag']:
+            return make_response(304)
+        return make_response(200, server['body'], server['etag'])
+
+    monkeypatch.setattr(code_review.github_session, 'request', request)
+    monkeypatch.setattr(code_review, 'github_etag_cache', EtagCache(8, 1024))
+    return server
+
+
+def use_token(run, token):
+    run.config.github_token = token
+
+
+def test_not_modified_returns_the_cached_body(run, session):
+    first = code_review.github_request('GET', 'https://api.test/repos/o/r')
+    second = code_review.github_request('GET', 'https://api.test/repos/o/r')
+    assert session['requests'][1]['If-None-Match'] == '"v1"'
+    assert second.status_code == 200
+    assert second.json() == first.json() == {'secret': 1}
+
+
+def test_cache_is_not_shared_between_tokens(run, session):
+    use_token(run, 'token-a')
+    code_review.github_request('GET', 'https://api.test/repos/o/r')
+    use_token(run, 'token-b')
+    code_review.github_request('GET', 'https://api.test/repos/o/r')
+    # 다른 토큰의 요청은 조건부 요청을 보내지 않으므로 서버가 권한을 다시 확인
+    assert 'If-None-Match' not in session['requests'][1]
+    assert session['requests'][1]['Authorization'] == 'Bearer token-b'
+
+
+def test_cache_evicts_by_bytes_and_entries():
+    cache = EtagCache(max_entries=3, max_bytes=10)
+    for key, body in (('a', b'1234'), ('b', b'1234'), ('c', b'1234')):
+        cache.put(key, ('"e"', 200, {}, body, 'utf-8'))
+    # 12바이트가 되어 가장 오래된 항목 제거
+    assert cache.get('a') is None
+    assert cache.total_bytes == 8
+
+    cache.get('b')
+    cache.put('d', ('"e"', 200, {}, b'12', 'utf-8'))
+    cache.put('e', ('"e"', 200, {}, b'1', 'utf-8'))
+    assert len(cache) == 3
+    assert cache.get('c') is None and cache.get('b') is not None
+
+    # 한도보다 큰 본문은 저장하지 않음
+    cache.put('big', ('"e"', 200, {}, b'x' * 11, 'utf-8'))
+    assert cache.get('big') is None
+    assert cache.total_bytes <= 10
+
+
+def test_replacing_an_entry_updates_the_byte_count():
+    cache = EtagCache(max_entries=3, max_bytes=10)
+    cache.put('a', ('"1"', 200, {}, b'123456', 'utf-8'))
+    cache.put('a', ('"2"', 200, {}, b'12', 'utf-8'))
+    assert cache.total_bytes == 2
+    assert cache.get('a')[0] == '"2"'
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import code_review
+from code_review import get_hunk_triage_scores, parse_diff, review_diff_in_chunks, route_review_hunks
+
+from conftest import make_diff
+
+
+def hunk(start, name):
+    return f"@@ -{start},0 +{start},1 @@\n+{name} = compute()\n"
+
+
+CHANGES_DIFF = make_diff('a.py', hunk(1, 'risky'), hunk(20, 'simple')) + make_diff('b.py', hunk(1, 'unscored'), hunk(20, 'typo'))
+
+
+@pytest.fixture
+def scores(monkeypatch, run):
+    monkeypatch.setattr(code_review, 'ESCALATION_THRESHOLD', 0.5)
+    monkeypatch.setattr(code_review, 'TRIAGE_SKIP_THRESHOLD', 0.1)
+    state = {'scores': {}, 'requests': 0}
+
+    def triage(hunks):
+        state['requests'] += 1
+        return [state['scores'].get(h.lines[0][1:].split()[0]) for _, h in hunks]
+
+    monkeypatch.setattr(code_review, 'get_hunk_triage_scores', triage)
+    return state
+
+
+def routed(changes):
+    return {path: [h.new_start for h in c['hunks']] for path, c in changes.items()}
+
+
+def test_hunks_are_routed_by_score(scores):
+    scores['scores'] = {'risky': 0.9, 'simple': 0.2, 'typo': 0.05}
+    tiers, low_risk = route_review_hunks(parse_diff(CHANGES_DIFF))
+    # 점수가 없는 hunk는 큰 모델로 리뷰
+    assert routed(tiers['large']) == {'a.py': [1], 'b.py': [1]}
+    assert routed(tiers['fast']) == {'a.py': [20]}
+    assert [(path, h.new_start) for path, h in low_risk] == [('b.py', 20)]
+
+
+def test_failed_triage_sends_every_hunk_to_the_large_model(monkeypatch, scores):
+    monkeypatch.setattr(code_review, 'get_hunk_triage_scores', lambda hunks: 1 / 0)
+    tiers, low_risk = route_review_hunks(parse_diff(CHANGES_DIFF))
+    assert routed(tiers['large']) == {'a.py': [1, 20], 'b.py': [1, 20]}
+    assert tiers['fast'] == {} and low_risk == []
+
+
+def test_triage_scores_are_clamped_and_matched_by_id(monkeypatch, run):
+    content = json.dumps({'scores': [{'id': 2, 'score': 1.7}, {'id': 1, 'score': -1}, {'id': 9, 'score': 0.5}, {'id': 3, 'score': 'high'}]})
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+    monkeypatch.setattr(code_review, 'create_chat_completion', lambda **kwargs: response)
+    hunks = [(path, h) for path, c in parse_diff(CHANGES_DIFF).items() for h in c['hunks']][:3]
+    assert get_hunk_triage_scores(hunks) == [0.0, 1.0, None]
+
+
+def test_low_risk_hunk_stays_skipped_on_the_next_run(monkeypatch, scores, cache_dir):
+    monkeypatch.setattr(code_review, 'REVIEW_OUTPUT_MODE', 'json')
+    monkeypatch.setattr(code_review, 'PRESCREEN_ENABLED', False)
+    monkeypatch.setattr(code_review, 'MODEL_ROUTING', True)
+    reviews = []
+    monkeypatch.setattr(code_review, 'get_code_review',
+                        lambda diff, on_issue=None, tier='large': (reviews.append(tier) or '{"issues": []}', False))
+    scores['scores'] = {'typo': 0.05}
+    diff = make_diff('b.py', hunk(20, 'typo'))
+
+    issues, text = review_diff_in_chunks(parse_diff(diff))
+    assert (issues, reviews, scores['requests']) == ([], [], 1)
+    assert "low risk (1 hunks)" in text
+
+    # 생략 표시가 캐시되어 다시 평가하지 않고, 리뷰한 것으로도 보고하지 않음
+    issues, text = review_diff_in_chunks(parse_diff(diff))
+    assert (issues, reviews, scores['requests']) == ([], [], 1)
+    assert text.startswith("리뷰할 코드 변경 사항이 없습니다.") and "low risk (1 hunks)" in text
@@ -0,0 +1,40 @@
+from code_review import PositionIndex, parse_diff
+
+from conftest import make_diff
+
+MULTI_HUNK_DIFF = make_diff(
+    'app.py',
+    "@@ -1,3 +1,4 @@\n"
+    " a\n"
+    "+b\n"
+    " c\n"
+    " d\n",
+    "@@ -10,3 +11,3 @@ def f():\n"
+    " x\n"
+    "-y\n"
+    "+Y\n"
+    " z\n"
+)
+
+
+def test_position_continues_across_hunks():
+    hunks = parse_diff(MULTI_HUNK_DIFF)['app.py']['hunks']
+    assert [(h.new_start, h.new_count, h.position) for h in hunks] == [(1, 4, 0), (11, 3, 5)]
+
+    index = PositionIndex(hunks)
+    # 두 번째 청크의 @@ 헤더도 position 하나를 차지
+    assert [index.position_for_line(line) for line in (1, 2, 3, 4)] == [1, 2, 3, 4]
+    assert [index.position_for_line(line) for line in (11, 12, 13)] == [6, 8, 9]
+    assert index.position_for_line(5) is None
+
+    assert index.line_for_position(8) == 12
+    # 삭제 라인과 청크 헤더에는 코멘트할 수 없음
+    assert index.line_for_position(7) is None
+    assert index.line_for_position(5) is None
+
+
+def test_nearest_position_respects_max_distance():
+    index = PositionIndex(parse_diff(MULTI_HUNK_DIFF)['app.py']['hunks'])
+    assert index.nearest_position(6) == (4, 4)
+    assert index.nearest_position(9) == (6, 11)
+    assert index.nearest_position(30, max_distance=10) == (None, None)
@@ -0,0 +1,78 @@
+from code_review import prescreen_changes, parse_diff
+
+from conftest import make_diff
+
+
+def prescreen(file_lines, path, head, *hunks):
+    file_lines[path] = head
+    return prescreen_changes(parse_diff(make_diff(path, *hunks)))
+
+
+def test_reformatting_is_skipped(run, file_lines):
+    remaining, issues, skipped = prescreen(
+        file_lines, 'a.py',
+        "def f(a, b):\n    return a + b\n",
+        "@@ -1,2 +1,2 @@\n-def f(a,b):\n-    return a+b\n+def f(a, b):\n+    return a + b\n"
+    )
+    assert remaining == {}
+    assert issues == []
+    assert skipped == [('a.py', 'no semantic change (1 hunks)')]
+
+
+def test_comment_and_docstring_edits_are_skipped(run, file_lines):
+    remaining, _, _ = prescreen(
+        file_lines, 'a.py',
+        'def f():\n    """New docstring."""\n    # new comment\n    return 1\n',
+        '@@ -1,4 +1,4 @@\n def f():\n-    """Old docstring."""\n-    # old comment\n+    """New docstring."""\n+    # new comment\n     return 1\n'
+    )
+    assert remaining == {}
+
+
+def test_module_level_decorator_change_is_reviewed(run, file_lines):
+    # 청크가 def 라인 앞에서 끝나도 데코레이터 변경은 의미 있는 변경
+    remaining, _, skipped = prescreen(
+        file_lines, 'a.py',
+        '@app.route("/admin")\ndef index():\n    return render()\n',
+        '@@ -1 +1 @@\n-@app.route("/public")\n+@app.route("/admin")\n'
+    )
+    assert list(remaining) == ['a.py']
+    assert skipped == []
+
+
+def test_method_decorator_change_is_reviewed(run, file_lines):
+    remaining, _, _ = prescreen(
+        file_lines, 'a.py',
+        'class View:\n    @login_required\n    def get(self):\n        return 1\n',
+        '@@ -1,2 +1,2 @@\n class View:\n-    @cached\n+    @login_required\n'
+    )
+    assert list(remaining) == ['a.py']
+
+
+def test_behavior_change_is_reviewed(run, file_lines):
+    remaining, _, skipped = prescreen(
+        file_lines, 'a.py',
+        "def f(a, b):\n    return a - b\n",
+        "@@ -1,2 +1,2 @@\n def f(a, b):\n-    return a + b\n+    return a - b\n"
+    )
+    assert [hunk.new_start for hunk in remaining['a.py']['hunks']] == [1]
+    assert skipped == []
+
+
+def test_hazards_on_added_lines_are_reported(run, file_lines):
+    _, issues, _ = prescreen(
+        file_lines, 'a.py',
+        "import subprocess\n\ndef f(cmd):\n    try:\n        subprocess.run(cmd, shell=True)\n    except:\n        eval(cmd)\n",
+        "@@ -1,2 +1,7 @@\n import subprocess\n \n+def f(cmd):\n+    try:\n+        subprocess.run(cmd, shell=True)\n+    except:\n+        eval(cmd)\n"
+    )
+    assert sorted((issue['line'], issue['type']) for issue in issues) == [(5, '보안'), (6, '품질'), (7, '보안')]
+    assert all(issue['source'] == 'prescreen' for issue in issues)
+
+
+def test_unparsable_file_goes_to_model_review(run, file_lines):
+    remaining, issues, skipped = prescreen(
+        file_lines, 'a.py',
+        "def f(:\n    pass\n",
+        "@@ -1,2 +1,2 @@\n-def f():\n+def f(:\n     pass\n"
+    )
+    assert list(remaining) == ['a.py']
+    assert issues == [] and skipped == []
@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+
+import pytest
+
+import code_review
+from code_review import (
+    BOT_SIGNATURE, FINGERPRINT_MARKER, SUMMARY_MARKER,
+    format_issue_comment, issue_fingerprint, reconcile_review
+)
+
+HEAD = 'c' * 40
+SOURCE = "def run(data):\n    eval(data)\n    exec(data)\n    return data\n"
+
+
+def placed_issue(line, issue_type='보안', description='unsafe'):
+    return {'file': 'app.py', 'line': line, 'type': issue_type, 'description': description,
+            'recommendation': 'fix it', 'path': 'app.py', 'position': line, 'position_line': line}
+
+
+def existing_comment(comment_id, issue, resolved=False, outdated=False, body=None):
+    fingerprint = issue_fingerprint(issue)
+    return {
+        'id': comment_id, 'body': body or format_issue_comment(issue, fingerprint), 'path': 'app.py',
+        'line': issue['line'], 'position': None if outdated else issue['line'],
+        'thread_id': f"PRRT_{comment_id}", 'thread_resolved': resolved, 'user': {'login': 'github-actions[bot]'}
+    }
+
+
+# 이전 요약 리뷰와 인라인 코멘트가 있는 PR - GitHub 쓰기 요청과 스레드 해결을 기록
+@pytest.fixture
+def pr(monkeypatch, run, file_lines):
+    file_lines['app.py'] = SOURCE
+    state = {'comments': [], 'requests': [], 'resolved_threads': [], 'failing_patches': set()}
+    summary = {'id': 9, 'body': f"{SUMMARY_MARKER}\n{BOT_SIGNATURE}", 'submitted_at': '2025-01-01T00:00:00Z'}
+    monkeypatch.setattr(code_review, 'get_bot_activity',
+                        lambda: {'reviews': [summary], 'review_comments': state['comments'], 'comments': []})
+
+    def request(method, url, json=None, **kwargs):
+        state['requests'].append((method, url, json))
+        failed = method == 'PATCH' and int(url.rsplit('/', 1)[-1]) in state['failing_patches']
+        return SimpleNamespace(status_code=500 if failed else 200, text='')
+
+    def resolve(thread_id):
+        state['resolved_threads'].append(thread_id)
+        return True
+
+    monkeypatch.setattr(code_review, 'github_request', request)
+    monkeypatch.setattr(code_review, 'resolve_review_thread', resolve)
+    return state
+
+
+def posted_reviews(pr):
+    return [body for method, url, body in pr['requests'] if method == 'POST' and url.endswith('/reviews')]
+
+
+def summary_updates(pr):
+    return [body['body'] for method, url, body in pr['requests'] if method == 'PUT' and url.endswith('/reviews/9')]
+
+
+def test_unchanged_finding_keeps_its_comment(pr):
+    issue = placed_issue(2)
+    pr['comments'] = [existing_comment(1, issue)]
+    result = reconcile_review(HEAD, [dict(issue)], "")
+    assert result == {'created': 0, 'updated': 0, 'unchanged': 1, 'resolved': 0, 'failed': 0}
+    assert posted_reviews(pr) == []
+    assert not any(method == 'PATCH' for method, _, _ in pr['requests'])
+
+
+def test_changed_text_updates_the_comment(pr):
+    pr['comments'] = [existing_comment(1, placed_issue(2, description='old text'))]
+    result = reconcile_review(HEAD, [placed_issue(2, description='new text')], "")
+    assert result['updated'] == 1
+    assert [url.rsplit('/', 1)[-1] for method, url, _ in pr['requests'] if method == 'PATCH'] == ['1']
+
+
+def test_failed_update_is_not_counted_as_updated(pr):
+    pr['comments'] = [existing_comment(1, placed_issue(2, description='old text'))]
+    pr['failing_patches'] = {1}
+    result = reconcile_review(HEAD, [placed_issue(2, description='new text')], "")
+    assert (result['updated'], result['unchanged'], result['failed']) == (0, 0, 1)
+
+
+def test_fixed_finding_resolves_its_thread(pr):
+    pr['comments'] = [existing_comment(1, placed_issue(2)), existing_comment(2, placed_issue(3))]
+    result = reconcile_review(HEAD, [placed_issue(2)], "")
+    assert result['resolved'] == 1
+    assert pr['resolved_threads'] == ['PRRT_2']
+
+
+def test_new_finding_is_posted_inline(pr):
+    result = reconcile_review(HEAD, [placed_issue(3)], "")
+    assert result['created'] == 1
+    [review] = posted_reviews(pr)
+    assert [(c['path'], c['position']) for c in review['comments']] == [('app.py', 3)]
+
+
+@pytest.mark.parametrize('outdated', [False, True])
+def test_finding_on_a_resolved_thread_is_not_posted_again(pr, outdated):
+    issue = placed_issue(2)
+    pr['comments'] = [existing_comment(1, issue, resolved=True, outdated=outdated)]
+    result = reconcile_review(HEAD, [dict(issue)], "")
+    assert result['created'] == 0
+    assert posted_reviews(pr) == []
+    assert pr['resolved_threads'] == []
+
+
+def test_outdated_comment_is_resolved_and_reposted(pr):
+    issue = placed_issue(2)
+    pr['comments'] = [existing_comment(1, issue, outdated=True)]
+    result = reconcile_review(HEAD, [dict(issue)], "")
+    assert (result['created'], result['resolved']) == (1, 1)
+
+
+def test_issue_without_location_is_listed_in_the_summary(pr):
+    general = {'file': None, 'line': None, 'type': '품질', 'description': 'missing tests', 'recommendation': 'add tests'}
+    no_line = {'file': 'app.py', 'line': None, 'type': '성능', 'description': 'slow module', 'recommendation': 'cache'}
+    reconcile_review(HEAD, [general, no_line], "")
+    [body] = summary_updates(pr)
+    assert "missing tests" in body and "slow module" in body
+    assert "`None`" not in body
+
+
+def test_incremental_run_keeps_comments_outside_touched_ranges(pr):
+    pr['comments'] = [existing_comment(1, placed_issue(2)), existing_comment(2, placed_issue(3))]
+    result = reconcile_review(HEAD, [], "", incremental_base='b' * 40, touched_ranges={'app.py': [(3, 3)]})
+    assert result['resolved'] == 1
+    assert pr['resolved_threads'] == ['PRRT_2']
+
+
+# 이슈 지문
+
+def test_fingerprint_is_stable_when_lines_shift(run, file_lines):
+    file_lines['app.py'] = "import os\n\ndef run():\n    eval(data)\n"
+    before = issue_fingerprint({'file': 'app.py', 'line': 4, 'type': '보안'})
+
+    file_lines['app.py'] = "import os\nimport sys\n\n\ndef run():\n        eval(data)\n"
+    after = issue_fingerprint({'file': 'app.py', 'line': 6, 'type': 'Security'})
+    assert before == after
+
+
+def test_fingerprint_changes_with_code_or_type(run, file_lines):
+    file_lines['app.py'] = SOURCE
+    base = issue_fingerprint({'file': 'app.py', 'line': 2, 'type': '보안'})
+    assert issue_fingerprint({'file': 'app.py', 'line': 3, 'type': '보안'}) != base
+    assert issue_fingerprint({'file': 'app.py', 'line': 2, 'type': '성능'}) != base
+    assert issue_fingerprint({'file': 'other.py', 'line': 2, 'type': '보안'}) != base
+
+
+def test_fingerprint_prefers_the_placed_line(run, file_lines):
+    file_lines['app.py'] = "a = 1\nb = 2\n"
+    placed = issue_fingerprint({'file': 'app.py', 'path': 'app.py', 'line': 9, 'position_line': 2, 'type': '품질'})
+    assert placed == issue_fingerprint({'file': 'app.py', 'line': 2, 'type': '품질'})
+
+
+def test_fingerprint_marker_round_trips(run, file_lines):
+    file_lines['app.py'] = SOURCE
+    fingerprint = issue_fingerprint(placed_issue(2))
+    body = format_issue_comment(placed_issue(2), fingerprint)
+    assert FINGERPRINT_MARKER.format(fingerprint=fingerprint) in body
+    assert code_review.FINGERPRINT_PATTERN.search(body).group(1) == fingerprint
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import code_review
+from code_review import hunk_cache_key, parse_diff, restore_cached_issues, review_diff_in_chunks
+
+from conftest import make_diff
+
+
+def diff_at(start, body="+    return eval(data)\n"):
+    return make_diff('app.py', f"@@ -{start},1 +{start},2 @@\n def run(data):\n" + body)
+
+
+def only_hunk(diff):
+    return parse_diff(diff)['app.py']['hunks'][0]
+
+
+def test_cache_key_ignores_line_numbers_and_trailing_whitespace():
+    key = hunk_cache_key('app.py', only_hunk(diff_at(1)))
+    assert hunk_cache_key('app.py', only_hunk(diff_at(40))) == key
+    assert hunk_cache_key('app.py', only_hunk(diff_at(1, "+    return eval(data)   \n"))) == key
+
+
+def test_cache_key_changes_with_content_or_file():
+    key = hunk_cache_key('app.py', only_hunk(diff_at(1)))
+    assert hunk_cache_key('app.py', only_hunk(diff_at(1, "+    return exec(data)\n"))) != key
+    assert hunk_cache_key('other.py', only_hunk(diff_at(1))) != key
+
+
+def test_restore_places_issues_relative_to_the_current_hunk():
+    cached = [{'type': '보안', 'description': 'eval', 'line_offset': 1}, {'type': '품질', 'line_offset': None}]
+    restored = restore_cached_issues('app.py', only_hunk(diff_at(40)), cached)
+    assert [(issue['file'], issue['line']) for issue in restored] == [('app.py', 41), ('app.py', None)]
+    assert 'line_offset' not in restored[0] and cached[0]['line_offset'] == 1
+
+
+# 모델 리뷰 호출을 기록하고 정해진 응답을 돌려주는 대역 (JSON 출력, 사전 검사와 모델 라우팅 없음)
+@pytest.fixture
+def reviewer(monkeypatch, run, cache_dir):
+    monkeypatch.setattr(code_review, 'REVIEW_OUTPUT_MODE', 'json')
+    monkeypatch.setattr(code_review, 'PRESCREEN_ENABLED', False)
+    monkeypatch.setattr(code_review, 'MODEL_ROUTING', False)
+    state = {'calls': 0, 'response': None}
+
+    def review(diff, on_issue=None, tier='large'):
+        state['calls'] += 1
+        return state['response'], False
+
+    monkeypatch.setattr(code_review, 'get_code_review', review)
+    return state
+
+
+def eval_issue(line):
+    return {'file': 'app.py', 'line': line, 'type': '보안', 'description': 'eval', 'recommendation': 'avoid eval'}
+
+
+def test_moved_hunk_reuses_the_cached_review(reviewer):
+    reviewer['response'] = json.dumps({'issues': [eval_issue(2)]})
+    issues, _ = review_diff_in_chunks(parse_diff(diff_at(1)))
+    assert [issue['line'] for issue in issues] == [2]
+
+    issues, text = review_diff_in_chunks(parse_diff(diff_at(30)))
+    assert reviewer['calls'] == 1
+    assert [(issue['file'], issue['line']) for issue in issues] == [('app.py', 31)]
+    assert "eval" in text
+
+
+def test_undecoded_review_is_not_cached(reviewer):
+    reviewer['response'] = json.dumps({'issues': [eval_issue(2)]})[:20]
+    review_diff_in_chunks(parse_diff(diff_at(1)))
+    review_diff_in_chunks(parse_diff(diff_at(1)))
+    assert reviewer['calls'] == 2
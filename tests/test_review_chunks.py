@@ -0,0 +1,57 @@
+from code_review import build_review_chunks, estimate_tokens, merge_review_issues, parse_diff
+
+from conftest import make_diff
+
+
+def hunk(start, count):
+    return f"@@ -{start},0 +{start},{count} @@\n" + "".join(f"+value_{i} = compute({i})\n" for i in range(count))
+
+
+def changes_tokens(changes, path):
+    return estimate_tokens("\n".join(changes[path]['header'])) + sum(estimate_tokens(h.text()) for h in changes[path]['hunks'])
+
+
+def test_small_files_share_one_chunk():
+    changes = parse_diff(make_diff('a.py', hunk(1, 2)) + make_diff('b.py', hunk(1, 2)))
+    [chunk] = build_review_chunks(changes, token_budget=1000)
+    assert chunk['files'] == ['a.py', 'b.py']
+    assert [path for path, _ in chunk['hunks']] == ['a.py', 'b.py']
+    assert "+++ b/a.py" in chunk['text'] and "+++ b/b.py" in chunk['text']
+
+
+def test_files_over_the_budget_start_a_new_chunk():
+    changes = parse_diff(make_diff('a.py', hunk(1, 10)) + make_diff('b.py', hunk(1, 10)))
+    budget = max(changes_tokens(changes, path) for path in changes) + 5
+    chunks = build_review_chunks(changes, token_budget=budget)
+    assert [chunk['files'] for chunk in chunks] == [['a.py'], ['b.py']]
+    assert all(chunk['tokens'] <= budget for chunk in chunks)
+
+
+def test_large_file_is_split_by_hunk_with_its_header_repeated():
+    changes = parse_diff(make_diff('big.py', hunk(1, 10), hunk(50, 10), hunk(100, 10)))
+    one_hunk = estimate_tokens("\n".join(changes['big.py']['header'])) + estimate_tokens(changes['big.py']['hunks'][0].text())
+    chunks = build_review_chunks(changes, token_budget=one_hunk + 5)
+    assert [[h.new_start for _, h in chunk['hunks']] for chunk in chunks] == [[1], [50], [100]]
+    assert all(chunk['text'].startswith("diff --git a/big.py b/big.py") for chunk in chunks)
+
+
+def test_oversized_hunk_is_truncated_to_the_budget():
+    changes = parse_diff(make_diff('huge.py', hunk(1, 400)))
+    [chunk] = build_review_chunks(changes, token_budget=500)
+    assert "줄 생략)" in chunk['text']
+    assert chunk['tokens'] <= 500 + 10
+
+
+def test_merge_drops_duplicates_and_orders_by_priority():
+    first = [{'file': 'a.py', 'line': 1, 'type': '품질'}, {'file': 'a.py', 'line': 2, 'type': 'Security'}]
+    second = [{'file': 'a.py', 'line': 2, 'type': '보안'}, {'file': 'b.py', 'line': 7, 'type': '논리'}]
+    merged = merge_review_issues([first, None, second])
+    assert [(issue['file'], issue['line'], issue['type']) for issue in merged] == [
+        ('a.py', 2, 'Security'), ('b.py', 7, '논리'), ('a.py', 1, '품질')
+    ]
+
+
+def test_merge_keeps_the_most_important_issues_within_the_limit():
+    issues = [{'file': 'a.py', 'line': line, 'type': '품질'} for line in range(5)] + [{'file': 'a.py', 'line': 9, 'type': '성능'}]
+    merged = merge_review_issues([issues], limit=3)
+    assert [issue['line'] for issue in merged] == [9, 0, 1]
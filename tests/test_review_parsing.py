@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import code_review
+from code_review import IncrementalJsonIssueParser, parse_review_response, recover_json_issues
+
+ISSUES = [
+    {'file': 'app.py', 'line': 3, 'type': '보안', 'description': 'braces } and ] in text', 'recommendation': 'fix {it}'},
+    {'file': 'app.py', 'line': 12, 'type': '성능', 'description': 'slow loop', 'recommendation': 'cache it'},
+]
+
+
+@pytest.fixture
+def json_mode(monkeypatch):
+    monkeypatch.setattr(code_review, 'REVIEW_OUTPUT_MODE', 'json')
+
+
+def test_parse_review_response_decodes_complete_json(json_mode):
+    issues, decoded = parse_review_response(json.dumps({'issues': ISSUES}), {})
+    assert decoded
+    assert [(issue['file'], issue['line'], issue['type']) for issue in issues] == [('app.py', 3, '보안'), ('app.py', 12, '성능')]
+
+
+def test_parse_review_response_recovers_completed_items_from_truncated_json(json_mode):
+    text = json.dumps({'issues': ISSUES})
+    truncated = text[:text.index('slow loop')]
+    issues, decoded = parse_review_response(truncated, {})
+    # 잘린 응답은 완성된 이슈만 복원하고, 전체를 해석한 것으로 보지 않음
+    assert not decoded
+    assert [issue['line'] for issue in issues] == [3]
+    assert issues[0]['description'] == 'braces } and ] in text'
+
+
+def test_parse_review_response_does_not_report_undecodable_json_as_clean(json_mode):
+    issues, decoded = parse_review_response('{"issues": [', {})
+    assert issues == []
+    assert not decoded
+
+
+@pytest.mark.parametrize('cut', [0, 5, 20, 60, 100])
+def test_recover_json_issues_never_returns_partial_objects(cut):
+    text = json.dumps({'issues': ISSUES})[:cut]
+    assert all(issue['line'] in (3, 12) for issue in recover_json_issues(text))
+
+
+def test_incremental_parser_emits_each_issue_once_when_fed_char_by_char():
+    received = []
+    parser = IncrementalJsonIssueParser(received.append)
+    text = json.dumps({'summary': 'ok', 'issues': ISSUES})
+    for char in text:
+        parser.feed(char)
+    assert [issue['line'] for issue in received] == [3, 12]
+    assert parser.done
+    assert parser.close() == text
+
+
+def test_incremental_parser_skips_items_without_a_file():
+    received = []
+    parser = IncrementalJsonIssueParser(received.append)
+    parser.feed('{"issues": [{"line": 1, "type": "품질"}, ' + json.dumps(ISSUES[1]) + ']}')
+    assert [issue['line'] for issue in received] == [12]
+
@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+
+import pytest
+
+from review_service import JobQueue, job_from_webhook, verify_signature
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'service.db'))
+
+
+def test_pushes_to_a_queued_pr_are_coalesced_into_one_job(queue):
+    first = queue.enqueue('o/r', 1, 'a' * 40, event='opened')
+    second = queue.enqueue('o/r', 1, 'b' * 40, event='synchronize')
+    assert first == second
+    [job] = queue.jobs()
+    assert (job['head_sha'], job['event'], job['coalesced']) == ('b' * 40, 'synchronize', 1)
+
+
+def test_other_modes_and_prs_get_their_own_jobs(queue):
+    review = queue.enqueue('o/r', 1)
+    assert queue.enqueue('o/r', 1, mode='cleanup') != review
+    assert queue.enqueue('o/r', 2) != review
+    assert queue.counts() == {'queued': 3}
+
+
+def test_push_during_a_running_review_queues_a_new_job(queue):
+    running = queue.enqueue('o/r', 1, 'a' * 40)
+    assert queue.claim()['id'] == running
+    follow_up = queue.enqueue('o/r', 1, 'b' * 40)
+    assert follow_up != running
+
+
+def test_claim_runs_one_job_per_pr_at_a_time(queue):
+    first = queue.enqueue('o/r', 1)
+    queue.claim()
+    later = queue.enqueue('o/r', 1)
+    other = queue.enqueue('o/r', 2)
+
+    # 같은 PR의 작업이 실행 중이므로 먼저 들어온 작업이라도 건너뜀
+    assert queue.claim()['id'] == other
+    assert queue.claim() is None
+
+    queue.complete(first, 'success')
+    assert queue.claim()['id'] == later
+
+
+def test_interrupted_jobs_are_queued_again(queue):
+    job_id = queue.enqueue('o/r', 1)
+    queue.claim()
+    assert queue.requeue_interrupted() == 1
+    assert queue.claim()['id'] == job_id
+
+
+def pull_request_event(action, draft=False):
+    return {'action': action, 'number': 7, 'repository': {'full_name': 'o/r'},
+            'pull_request': {'draft': draft, 'head': {'sha': 'c' * 40}}}
+
+
+def test_webhook_events_that_start_a_review():
+    assert job_from_webhook('pull_request', pull_request_event('synchronize')) == {
+        'repo': 'o/r', 'pr_number': 7, 'head_sha': 'c' * 40, 'event': 'synchronize'
+    }
+    assert job_from_webhook('pull_request', pull_request_event('ready_for_review', draft=True))['pr_number'] == 7
+    assert job_from_webhook('pull_request', pull_request_event('opened', draft=True)) is None
+    assert job_from_webhook('pull_request', pull_request_event('closed')) is None
+    assert job_from_webhook('push', pull_request_event('opened')) is None
+
+
+def test_signature_must_match_the_secret():
+    body = b'{"action": "opened"}'
+    signature = 'sha256=' + hmac.new(b'secret', body, hashlib.sha256).hexdigest()
+    assert verify_signature(body, signature, secret='secret')
+    assert not verify_signature(body, signature, secret='other')
+    assert not verify_signature(body, None, secret='secret')
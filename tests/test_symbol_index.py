@@ -0,0 +1,72 @@
+import subprocess
+
+import pytest
+
+import code_review
+from code_review import FileLines, SymbolIndex, extract_symbols, related_definitions_section
+
+FILES = {
+    'src/pkg/a.py': "def helper(value):\n    return value * 2\n\n\nclass Store:\n    pass\n",
+    'src/pkg/b.py': "from .a import helper\n\n\ndef total(values):\n    return sum(helper(v) for v in values)\n",
+    'src/pkg/c.py': "from pkg import a\n\nSCALE = a.helper(3)\n",
+    'other/a.py': "def Store():\n    return None\n",
+}
+
+
+# src/pkg 패키지가 있는 git 저장소와 그 저장소의 심볼 인덱스
+@pytest.fixture
+def index(tmp_path, monkeypatch, run):
+    repo = tmp_path / 'repo'
+    for path, text in FILES.items():
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(text)
+    subprocess.run(['git', 'init', '-q'], cwd=repo, check=True)
+    subprocess.run(['git', 'add', '.'], cwd=repo, check=True)
+
+    symbols = SymbolIndex(path=str(tmp_path / 'symbols.db'), workspace=str(repo))
+    symbols.refresh()
+    monkeypatch.setattr(code_review, 'get_symbol_index', lambda: symbols)
+    yield symbols
+    symbols.close()
+
+
+def test_extract_symbols_records_loaded_names_and_attributes():
+    definitions, references, imports = extract_symbols(FILES['src/pkg/c.py'])
+    assert ('SCALE', 'SCALE', 'variable', 3, 3) in definitions
+    assert ('a', 3) in references and ('helper', 3) in references
+    assert imports == [('pkg', 'a', None, 1)]
+    assert extract_symbols("def broken(:\n") == ([], [], [])
+
+
+def test_references_list_every_use_site(index):
+    assert [(path, line) for path, _, line in index.references('helper')] == [('src/pkg/b.py', 5), ('src/pkg/c.py', 3)]
+
+
+def test_changed_definition_lists_its_callers(index):
+    lines = FileLines(FILES['src/pkg/a.py'])
+    section = related_definitions_section('src/pkg/a.py', lines, [(0, 2)])
+    assert "# src/pkg/b.py:5 (helper)\nreturn sum(helper(v) for v in values)" in section
+    assert "# src/pkg/c.py:3 (helper)\nSCALE = a.helper(3)" in section
+
+
+def test_ambiguous_definition_has_no_callers(index):
+    # Store는 다른 파일에도 정의되어 있으므로 어느 정의의 사용인지 알 수 없음
+    lines = FileLines(FILES['src/pkg/a.py'])
+    assert related_definitions_section('src/pkg/a.py', lines, [(4, 6)]) == ""
+
+
+def test_used_name_shows_the_imported_definition(index):
+    lines = FileLines(FILES['src/pkg/b.py'])
+    section = related_definitions_section('src/pkg/b.py', lines, [(4, 5)])
+    assert "# src/pkg/a.py:1 (function helper)" in section
+
+
+def test_index_without_a_refs_table_is_rebuilt(index, tmp_path):
+    index.db.execute("DROP TABLE refs")
+    index.db.commit()
+    reopened = SymbolIndex(path=str(tmp_path / 'symbols.db'), workspace=index.workspace)
+    try:
+        assert reopened.refresh() == (4, 4)
+        assert reopened.references('helper')
+    finally:
+        reopened.close()
@@ -0,0 +1,105 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import code_review
+from code_review import Deadline, TimeBudgetExceeded, use_deadline
+
+
+def test_deadline_without_budget_never_expires():
+    deadline = Deadline.after(0)
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+    assert deadline.split(0.5, reserve=10).remaining() is None
+
+
+def test_deadline_split_reserves_then_shares():
+    deadline = Deadline(time.time() + 100)
+    part = deadline.split(0.25, reserve=20)
+    assert 19 < part.remaining() <= 20
+    assert deadline.split(reserve=200).expired()
+    assert Deadline(time.time() - 1).expired()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(code_review.time, 'sleep', recorded.append)
+    return recorded
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    monkeypatch.setitem(code_review.github_rate_limit, 'remaining', 1)
+    monkeypatch.setitem(code_review.github_rate_limit, 'reset', time.time() + 3600)
+
+
+def test_throttle_sleep_is_capped_by_the_budget_minus_post_reserve(run, sleeps, rate_limited):
+    code_review.throttle_github_requests(Deadline(time.time() + code_review.POST_RESERVE_SECONDS + 3))
+    assert len(sleeps) == 1 and 2 < sleeps[0] <= 3
+
+
+def test_throttle_does_not_sleep_inside_the_post_reserve(run, sleeps, rate_limited):
+    code_review.throttle_github_requests(Deadline(time.time() + code_review.POST_RESERVE_SECONDS - 1))
+    assert sleeps == []
+
+
+def test_throttle_without_budget_uses_the_max_wait(run, sleeps, rate_limited):
+    code_review.throttle_github_requests(Deadline())
+    assert sleeps == [code_review.GITHUB_MAX_WAIT_SECONDS]
+
+
+def test_github_request_fails_fast_after_the_deadline(run, monkeypatch):
+    sent = []
+    monkeypatch.setattr(code_review.github_session, 'request', lambda *args, **kwargs: sent.append(args))
+    run.deadline = Deadline(time.time() - 1)
+    with pytest.raises(TimeBudgetExceeded):
+        code_review.github_request('GET', 'https://api.test/repos/o/r')
+    assert sent == []
+    assert run.budget_skipped == {'github': 1}
+
+
+def test_llm_request_is_not_sent_without_budget(run, monkeypatch):
+    monkeypatch.setattr(code_review, 'get_openai_client', lambda: pytest.fail("request sent"))
+    with use_deadline(Deadline(time.time() + 0.5)):
+        with pytest.raises(TimeBudgetExceeded):
+            code_review.create_chat_completion(model='m', messages=[])
+
+
+# 첫 이슈를 보낸 뒤 멈추었다가 timeout으로 끊기는 스트림
+class StalledStream:
+    def __init__(self, first_delta, stall):
+        self.first_delta = first_delta
+        self.stall = stall
+        self.closed = False
+
+    def __iter__(self):
+        delta = SimpleNamespace(content=self.first_delta)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+        time.sleep(self.stall)
+        raise TimeoutError("stream stalled")
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_stalled_past_the_deadline_keeps_completed_issues(run, monkeypatch):
+    stream = StalledStream('{"issues": [{"file": "a.py", "line": 2, "type": "보안", "description": "d", "recommendation": "r"}, ', 0.3)
+    monkeypatch.setattr(code_review, 'create_chat_completion', lambda **kwargs: stream)
+    monkeypatch.setattr(code_review, 'REVIEW_OUTPUT_MODE', 'json')
+    received = []
+    with use_deadline(Deadline(time.time() + 0.2)):
+        with pytest.raises(TimeBudgetExceeded):
+            code_review.get_code_review("diff", received.append)
+    assert stream.closed
+    assert [issue['line'] for issue in received] == [2]
+
+
+def test_stream_failure_before_the_deadline_is_not_a_budget_stop(run, monkeypatch):
+    stream = StalledStream('{"issues": [', 0)
+    monkeypatch.setattr(code_review, 'create_chat_completion', lambda **kwargs: stream)
+    with use_deadline(Deadline(time.time() + 60)):
+        with pytest.raises(TimeoutError):
+            code_review.get_code_review("diff", lambda issue: None)
+    assert stream.closed